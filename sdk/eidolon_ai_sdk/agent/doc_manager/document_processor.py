@@ -1,15 +1,22 @@
+import hashlib
+import itertools
+import json
 import logging
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
 
 from opentelemetry import trace
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from eidolon_ai_sdk.agent.doc_manager.loaders.base_loader import (
     FileInfo,
 )
 from eidolon_ai_sdk.agent.doc_manager.parsers.base_parser import DocumentParser, DataBlob
+from eidolon_ai_sdk.agent.doc_manager.process_pool import DocumentProcessPool
 from eidolon_ai_sdk.agent.doc_manager.transformer.document_transformer import DocumentTransformer
 from eidolon_ai_sdk.agent_os import AgentOS
-from eidolon_ai_sdk.system.reference_model import Specable, AnnotatedReference
+from eidolon_ai_sdk.memory.document import Document
+from eidolon_ai_sdk.memory.lexical_index import LexicalIndex
+from eidolon_ai_sdk.system.reference_model import Specable, AnnotatedReference, Reference
 from eidolon_ai_sdk.util.async_wrapper import make_async
 
 tracer = trace.get_tracer(__name__)
@@ -18,6 +25,29 @@ tracer = trace.get_tracer(__name__)
 class DocumentProcessorSpec(BaseModel):
     parser: AnnotatedReference[DocumentParser]
     splitter: AnnotatedReference[DocumentTransformer]
+    incremental_updates: bool = Field(
+        default=True,
+        description="When a file changes, only re-index the chunks whose content changed instead of the whole file. "
+        "Unchanged chunks that moved within the file keep their vector ids but are re-indexed, so their start_index "
+        "metadata stays accurate.",
+    )
+    lexical_index: Optional[Reference[LexicalIndex]] = Field(
+        default=None, description="Also index chunks by their words, for searching with a HybridRetriever."
+    )
+    execution: Literal["thread", "process"] = Field(
+        default="thread",
+        description="Where files are parsed and split. Use process for CPU bound parsers (pdf, code) so indexing "
+        "scales with cores. The parser and splitter must then be picklable.",
+    )
+    processes: Optional[int] = Field(
+        default=None, ge=1, description="The size of the process pool. Defaults to the number of cores."
+    )
+    stream_batch_size: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Parse, split, embed, and store files this many chunks at a time, so the memory used for a file "
+        "does not grow with its length (e.g. the pages of a pdf). Only applies to thread execution.",
+    )
 
 
 class DocumentProcessor(Specable[DocumentProcessorSpec]):
@@ -28,6 +58,10 @@ class DocumentProcessor(Specable[DocumentProcessorSpec]):
         Specable.__init__(self, **kwargs)
         self.parser = self.spec.parser.instantiate()
         self.splitter = self.spec.splitter.instantiate()
+        self.lexical_index = self.spec.lexical_index.instantiate() if self.spec.lexical_index else None
+        if self.spec.execution == "process":
+            self.components = DocumentProcessPool.components(self.parser, self.splitter)
+            DocumentProcessPool.get(self.spec.processes)
         self.logger = logging.getLogger("eidolon")
 
     @make_async
@@ -38,43 +72,176 @@ class DocumentProcessor(Specable[DocumentProcessorSpec]):
     def split(self, docs):
         return self.splitter.transform_documents(docs)
 
+    async def _parse_and_split(self, file_info: FileInfo) -> List[Document]:
+        if self.spec.execution == "process":
+            with tracer.start_as_current_span("parsing and transforming"):
+                with file_info.data.as_bytes() as f:
+                    data = f.read()
+                chunks = await DocumentProcessPool.parse_and_split(
+                    self.spec.processes,
+                    self.components,
+                    data,
+                    file_info.data.mimetype,
+                    file_info.data.path,
+                    file_info.data.encoding,
+                )
+            return [Document(id=doc_id, page_content=content, metadata=metadata) for doc_id, content, metadata in chunks]
+        with tracer.start_as_current_span("parsing"):
+            parsedDocs = await make_async(lambda d: list(self.parser.parse(d)))(file_info.data)
+        with tracer.start_as_current_span("transforming"):
+            return await make_async(lambda pd: list(self.splitter.transform_documents(pd)))(parsedDocs)
+
+    async def _chunk_batches(self, file_info: FileInfo) -> AsyncIterator[List[Document]]:
+        if self.spec.stream_batch_size is None or self.spec.execution == "process":
+            yield await self._parse_and_split(file_info)
+            return
+        chunks = iter(self.splitter.transform_documents(self.parser.parse(file_info.data)))
+        next_batch = make_async(lambda: list(itertools.islice(chunks, self.spec.stream_batch_size)))
+        while True:
+            with tracer.start_as_current_span("parsing and transforming"):
+                batch = await next_batch()
+            if not batch:
+                return
+            yield batch
+
+    async def _index(self, collection_name: str, docs: List[Document]):
+        if docs:
+            with tracer.start_as_current_span("record similarity"):
+                await AgentOS.similarity_memory.add(collection_name, docs)
+            if self.lexical_index:
+                with tracer.start_as_current_span("record lexical"):
+                    await self.lexical_index.add(collection_name, docs)
+
+    async def _unindex(self, collection_name: str, doc_ids: List[str]):
+        if doc_ids:
+            with tracer.start_as_current_span("remove similarity"):
+                await AgentOS.similarity_memory.delete(collection_name, doc_ids)
+            if self.lexical_index:
+                with tracer.start_as_current_span("remove lexical"):
+                    await self.lexical_index.delete(collection_name, doc_ids)
+
+    async def _discard(self, collection_name: str, file_info: FileInfo, doc_ids: List[str], remove_record=False):
+        """
+        Removes the chunks indexed for a file that failed part way, and its record if asked. Errors are logged rather
+        than raised, so the failure reported is the one that stopped the file.
+        """
+        try:
+            await self._unindex(collection_name, doc_ids)
+            if remove_record:
+                await self.removeFile(collection_name, file_info.path)
+        except Exception as e:
+            self.logger.warning(f"Failed to remove the chunks of {file_info.path} from {collection_name} ({e})")
+
+    @staticmethod
+    def chunk_hash(doc: Document) -> str:
+        # start_index is left out so chunks that only moved within the file keep their vector ids
+        metadata = {k: v for k, v in doc.metadata.items() if k != "start_index"}
+        canonical = json.dumps([doc.page_content, metadata], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _log_failure(self, file_info: FileInfo, e: Exception):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.warning(f"Failed to parse file {file_info.path}", exc_info=True)
+        else:
+            self.logger.warning(f"Failed to parse file {file_info.path} ({e})")
+
     async def addFile(self, collection_name: str, file_info: FileInfo):
         with tracer.start_as_current_span("add file"):
+            doc_ids = []
+            chunk_hashes = []
+            chunk_starts = []
             try:
-                with tracer.start_as_current_span("parsing"):
-                    parsedDocs = await make_async(lambda d: list(self.parser.parse(d)))(file_info.data)
-                with tracer.start_as_current_span("transforming"):
-                    docs = await make_async(lambda pd: list(self.splitter.transform_documents(pd)))(parsedDocs)
-                with tracer.start_as_current_span("record symbolic"):
-                    await AgentOS.symbolic_memory.insert_one(
-                        collection_name,
-                        {
-                            "file_path": file_info.path,
-                            "data": file_info.metadata,
-                            "doc_ids": [doc.id for doc in docs],
-                        },
-                    )
-                if len(docs) == 0:
-                    self.logger.debug(f"File contained no text {file_info.path}")
-                    return
-                with tracer.start_as_current_span("record similarity"):
-                    await AgentOS.similarity_memory.add(collection_name, docs)
-                self.logger.debug(f"Added file {file_info.path}")
+                async for docs in self._chunk_batches(file_info):
+                    doc_ids.extend(doc.id for doc in docs)
+                    chunk_hashes.extend(self.chunk_hash(doc) for doc in docs)
+                    chunk_starts.extend(doc.metadata.get("start_index") for doc in docs)
+                    await self._index(collection_name, docs)
             except Exception as e:
-                if self.logger.isEnabledFor(logging.DEBUG):
-                    self.logger.warning(f"Failed to parse file {file_info.path}", exc_info=True)
-                else:
-                    self.logger.warning(f"Failed to parse file {file_info.path} ({e})")
+                self._log_failure(file_info, e)
+                await self._discard(collection_name, file_info, doc_ids)
+                return
+            with tracer.start_as_current_span("record symbolic"):
+                await AgentOS.symbolic_memory.insert_one(
+                    collection_name,
+                    {
+                        "file_path": file_info.path,
+                        "data": file_info.metadata,
+                        "doc_ids": doc_ids,
+                        "chunk_hashes": chunk_hashes,
+                        "chunk_starts": chunk_starts,
+                    },
+                )
+            if len(doc_ids) == 0:
+                self.logger.debug(f"File contained no text {file_info.path}")
+            else:
+                self.logger.debug(f"Added file {file_info.path}")
 
     async def removeFile(self, collection_name: str, path: str):
         with tracer.start_as_current_span("remove file"):
             file_info = await AgentOS.symbolic_memory.find_one(collection_name, {"file_path": path})
             if file_info is not None:
-                doc_ids = file_info["doc_ids"]
-                await AgentOS.similarity_memory.delete(collection_name, doc_ids)
+                await self._unindex(collection_name, file_info["doc_ids"])
                 await AgentOS.symbolic_memory.delete(collection_name, {"file_path": path})
 
     async def replaceFile(self, collection_name: str, file_info: FileInfo):
         with tracer.start_as_current_span("replace file"):
-            await self.removeFile(collection_name, file_info.path)
-            await self.addFile(collection_name, file_info)
+            existing = None
+            if self.spec.incremental_updates:
+                existing = await AgentOS.symbolic_memory.find_one(collection_name, {"file_path": file_info.path})
+            if existing is None or "chunk_hashes" not in existing:
+                await self.removeFile(collection_name, file_info.path)
+                await self.addFile(collection_name, file_info)
+                return
+
+            # reuse the vector id of each stored chunk whose content is unchanged, matching duplicates one to one.
+            # records written before starts were kept report none, so their chunks are re-indexed once if they have one
+            stored: Dict[str, List[Tuple[str, Optional[int]]]] = {}
+            starts = existing.get("chunk_starts") or [None] * len(existing["doc_ids"])
+            for doc_id, chunk_hash, start in zip(existing["doc_ids"], existing["chunk_hashes"], starts):
+                stored.setdefault(chunk_hash, []).append((doc_id, start))
+            doc_ids = []
+            chunk_hashes = []
+            chunk_starts = []
+            added_ids = []
+            moved = 0
+            try:
+                async for docs in self._chunk_batches(file_info):
+                    added = []
+                    for doc in docs:
+                        chunk_hash = self.chunk_hash(doc)
+                        chunk_hashes.append(chunk_hash)
+                        chunk_starts.append(doc.metadata.get("start_index"))
+                        if stored.get(chunk_hash):
+                            doc.id, start = stored[chunk_hash].pop(0)
+                            if start != chunk_starts[-1]:
+                                # same content at a new offset, re-indexed under its id to update its metadata
+                                added.append(doc)
+                                moved += 1
+                        else:
+                            added.append(doc)
+                            added_ids.append(doc.id)
+                        doc_ids.append(doc.id)
+                    await self._index(collection_name, added)
+            except Exception as e:
+                self._log_failure(file_info, e)
+                await self._discard(collection_name, file_info, added_ids, remove_record=True)
+                return
+            removed = [doc_id for ids in stored.values() for doc_id, _ in ids]
+            await self._unindex(collection_name, removed)
+
+            with tracer.start_as_current_span("record symbolic"):
+                await AgentOS.symbolic_memory.upsert_one(
+                    collection_name,
+                    {
+                        "file_path": file_info.path,
+                        "data": file_info.metadata,
+                        "doc_ids": doc_ids,
+                        "chunk_hashes": chunk_hashes,
+                        "chunk_starts": chunk_starts,
+                    },
+                    {"file_path": file_info.path},
+                )
+            self.logger.debug(
+                f"Replaced file {file_info.path} ({len(added_ids)} chunks added, {len(removed)} removed, {moved} moved, "
+                f"{len(doc_ids) - len(added_ids) - moved} unchanged)"
+            )
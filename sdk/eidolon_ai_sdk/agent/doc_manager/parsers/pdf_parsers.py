@@ -65,6 +65,10 @@ class PyPDFParser(DocumentParser, Specable[PyPDFParserSpec]):
         self.password = spec.password
 
     def parse(self, blob: DataBlob) -> Iterable[Document]:
+        """
+        Yields one document per page as it is extracted. PDFs on disk are opened from their path, so pages are read
+        from the file as they are reached rather than loading the whole file first.
+        """
         if isinstance(blob.data, bytes):
             pdf_reader = pymupdf.open(stream=blob.data)
         elif not blob.data and blob.path:
@@ -72,12 +76,16 @@ class PyPDFParser(DocumentParser, Specable[PyPDFParserSpec]):
         else:
             with blob.as_bytes() as data:
                 pdf_reader = pymupdf.open(stream=data.read())
-        if self.password:
-            pdf_reader.authenticate(self.password)
-        yield from [
-            Document(
-                page_content=page.get_text(),
-                metadata={"source": blob.path, "page": page_number, "mime_type": blob.mimetype},
-            )
-            for page_number, page in enumerate(pdf_reader.pages())
-        ]
+        try:
+            if self.password:
+                pdf_reader.authenticate(self.password)
+            for page_number in range(pdf_reader.page_count):
+                page = pdf_reader.load_page(page_number)
+                text = page.get_text()
+                del page
+                yield Document(
+                    page_content=text,
+                    metadata={"source": blob.path, "page": page_number, "mime_type": blob.mimetype},
+                )
+        finally:
+            pdf_reader.close()
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from eidolon_ai_sdk.agent.doc_manager.parsers.base_parser import DataBlob
+
+# (id, page_content, metadata) of each chunk, cheaper to send back between processes than Documents
+Chunk = Tuple[str, str, dict]
+
+_worker_components: Dict[str, tuple] = {}
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _parse_and_split(
+    key: str, components: Optional[bytes], data: bytes, mimetype: Optional[str], path: str, encoding: str
+) -> Optional[List[Chunk]]:
+    if components is not None:
+        _worker_components[key] = pickle.loads(components)
+    elif key not in _worker_components:
+        return None  # the caller resends the task with the parser and splitter this worker has not seen yet
+    parser, splitter = _worker_components[key]
+    blob = DataBlob.from_bytes(data=data, mimetype=mimetype, path=path, encoding=encoding)
+    docs = splitter.transform_documents(parser.parse(blob))
+    return [(doc.id, doc.page_content, doc.metadata) for doc in docs]
+
+
+class DocumentProcessPool:
+    """
+    Process pools that parse and split documents, so CPU bound parsers and splitters are not serialized by the GIL.
+
+    Pools are shared by size, started (and their workers spawned) when the first processor using them is built, and
+    shut down when the machine stops. Tasks only carry the file; a worker that has not seen a processor's parser and
+    splitter yet gets them once, by the task being resent with them.
+    """
+
+    _pools: Dict[int, ProcessPoolExecutor] = {}
+    _warming: Dict[int, List[Future]] = {}
+
+    @classmethod
+    def get(cls, processes: Optional[int] = None) -> ProcessPoolExecutor:
+        processes = processes or os.cpu_count() or 1
+        if processes not in cls._pools:
+            pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+            cls._warming[processes] = [pool.submit(_warm_up) for _ in range(processes)]
+            cls._pools[processes] = pool
+        return cls._pools[processes]
+
+    @classmethod
+    async def ready(cls, processes: Optional[int] = None):
+        """
+        Waits until every worker of the pool has started.
+        """
+        cls.get(processes)
+        await asyncio.gather(*[asyncio.wrap_future(f) for f in cls._warming[processes or os.cpu_count() or 1]])
+
+    @classmethod
+    def shutdown_all(cls):
+        for pool in cls._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        cls._pools = {}
+        cls._warming = {}
+
+    @staticmethod
+    def components(parser, splitter) -> Tuple[str, bytes]:
+        components = pickle.dumps((parser, splitter))
+        return hashlib.sha256(components).hexdigest(), components
+
+    @classmethod
+    async def parse_and_split(
+        cls,
+        processes: Optional[int],
+        components: Tuple[str, bytes],
+        data: bytes,
+        mimetype: Optional[str],
+        path: str,
+        encoding: str = "utf-8",
+    ) -> List[Chunk]:
+        key, pickled = components
+        pool = cls.get(processes)
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(pool, _parse_and_split, key, None, data, mimetype, path, encoding)
+        if chunks is None:
+            chunks = await loop.run_in_executor(pool, _parse_and_split, key, pickled, data, mimetype, path, encoding)
+        return chunks
@@ -1,10 +1,12 @@
-from typing import List, AsyncIterable
+from typing import Dict, List, AsyncIterable, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from eidolon_ai_sdk.agent.retriever_agent.document_reranker import RAGFusionReranker
 from eidolon_ai_sdk.agent_os import AgentOS
 from eidolon_ai_sdk.memory.document import Document
-from eidolon_ai_sdk.system.reference_model import Specable
+from eidolon_ai_sdk.memory.lexical_index import LexicalIndex
+from eidolon_ai_sdk.system.reference_model import Specable, AnnotatedReference
 
 
 class DocumentRetrieverSpec(BaseModel):
@@ -12,9 +14,18 @@ class DocumentRetrieverSpec(BaseModel):
 
 
 class DocumentRetriever(Specable[DocumentRetrieverSpec]):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        Specable.__init__(self, **kwargs)
+    async def search(
+        self, vector_collection_name: str, questions: List[str], num_results: int
+    ) -> List[Dict[str, float]]:
+        """
+        Finds the documents closest to each question by vector similarity.
+
+        Returns:
+            For each question, the ids of the documents found mapped to their score.
+        """
+        embedded_qs = await AgentOS.similarity_memory.embed_texts(questions)
+        results = await AgentOS.similarity_memory.raw_query_many(vector_collection_name, embedded_qs, num_results)
+        return [{doc.id: doc.score for doc in docs} for docs in results]
 
     async def get_docs(self, vector_collection_name: str, doc_ids: List[str]) -> AsyncIterable[Document]:
         pass
@@ -23,3 +34,43 @@ class DocumentRetriever(Specable[DocumentRetrieverSpec]):
 class SimilarityMemoryRetriever(DocumentRetriever):
     async def get_docs(self, vector_collection_name: str, doc_ids: List[str]) -> AsyncIterable[Document]:
         return AgentOS.similarity_memory.get_docs(vector_collection_name, doc_ids)
+
+
+class HybridRetrieverSpec(DocumentRetrieverSpec):
+    lexical_index: AnnotatedReference[LexicalIndex] = Field(
+        description="The lexical index to search. It must be the index the document processor keeps up to date."
+    )
+    fusion: AnnotatedReference[RAGFusionReranker] = Field(
+        description="Fuses the vector and lexical results of each question into one ranking."
+    )
+    lexical_results: Optional[int] = Field(
+        None, description="The number of lexical results to fuse per question. Defaults to the number of vector results."
+    )
+
+
+class HybridRetriever(SimilarityMemoryRetriever, Specable[HybridRetrieverSpec]):
+    """
+    Searches both by vector similarity and by the exact words of each question, so identifiers, SKUs, and error codes
+    that embeddings blur are still found.
+    """
+
+    def __init__(self, spec: HybridRetrieverSpec):
+        super().__init__(spec)
+        self.lexical_index = self.spec.lexical_index.instantiate()
+        self.fusion = self.spec.fusion.instantiate()
+
+    async def search(
+        self, vector_collection_name: str, questions: List[str], num_results: int
+    ) -> List[Dict[str, float]]:
+        vector_results = await super().search(vector_collection_name, questions, num_results)
+        lexical_results = await self.lexical_index.search_many(
+            vector_collection_name, questions, self.spec.lexical_results or num_results
+        )
+        results = []
+        for vector, lexical in zip(vector_results, lexical_results):
+            # vector scores are distances, so they are negated to rank like the lexical scores, higher first
+            fused = await self.fusion.rerank(
+                dict(vector={doc_id: -score for doc_id, score in vector.items()}, lexical=dict(lexical))
+            )
+            results.append(dict(fused[:num_results]))
+        return results
@@ -1,4 +1,3 @@
-import asyncio
 from typing import AsyncIterable
 
 from pydantic import BaseModel, Field
@@ -7,7 +6,6 @@ from eidolon_ai_sdk.agent.retriever_agent.document_reranker import DocumentReran
 from eidolon_ai_sdk.agent.retriever_agent.document_retriever import DocumentRetriever
 from eidolon_ai_sdk.agent.retriever_agent.question_transformer import QuestionTransformer
 from eidolon_ai_sdk.agent.retriever_agent.result_summarizer import ResultSummarizer, DocSummary
-from eidolon_ai_sdk.agent_os import AgentOS
 from eidolon_ai_sdk.apu.apu import APU
 from eidolon_ai_sdk.system.reference_model import Specable, AnnotatedReference
 
@@ -37,7 +35,9 @@ class Retriever(Specable[RetrieverSpec]):
         self.document_retriever = self.spec.document_retriever.instantiate()
         self.result_summarizer = self.spec.result_summarizer.instantiate()
 
-    async def do_search(self, vector_collection_name: str, apu: APU, process_id: str, question: str) -> AsyncIterable[DocSummary]:
+    async def do_search(
+        self, vector_collection_name: str, apu: APU, process_id: str, question: str
+    ) -> AsyncIterable[DocSummary]:
         """
         Process the question by searching the document store.
         :param process_id:
@@ -50,11 +50,8 @@ class Retriever(Specable[RetrieverSpec]):
             questions = await self.question_transformer.transform(apu, process_id, question)
         else:
             questions = [question]
-        _docs = await asyncio.gather(*(self._embed_question(vector_collection_name, question) for question in questions))
-        question_to_docs = {tu[0]: tu[1] for tu in zip(questions, _docs)}
-        rerank_questions = {}
-        for question, docs in question_to_docs.items():
-            rerank_questions[question] = {doc.id: doc.score for doc in docs}
+        _docs = await self.document_retriever.search(vector_collection_name, questions, self.spec.max_num_results)
+        rerank_questions = {question: docs for question, docs in zip(questions, _docs)}
 
         reranked_docs = await self.document_reranker.rerank(rerank_questions)
 
@@ -64,10 +61,3 @@ class Retriever(Specable[RetrieverSpec]):
         docs = await self.document_retriever.get_docs(vector_collection_name, [doc[0] for doc in reranked_docs])
 
         return self.result_summarizer.summarize(docs)
-
-    async def _embed_question(self, vector_collection_name, question):
-        embedded_q = await AgentOS.similarity_memory.embed_text(question)
-        results_ = await AgentOS.similarity_memory.raw_query(
-            vector_collection_name, embedded_q, self.spec.max_num_results
-        )
-        return results_
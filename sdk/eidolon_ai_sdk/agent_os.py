@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from typing import TYPE_CHECKING
 
 from eidolon_ai_client.util.request_context import RequestContext
 from eidolon_ai_sdk.agent_os_interfaces import (
@@ -12,6 +13,9 @@ from eidolon_ai_sdk.agent_os_interfaces import (
 )
 from eidolon_ai_sdk.security.user import User
 
+if TYPE_CHECKING:
+    from eidolon_ai_sdk.apu.llm.rate_limiter import LLMRateLimiter
+
 
 class AgentOS:
     file_memory: FileMemory = ...  # noqa: F821
@@ -19,6 +23,7 @@ class AgentOS:
     similarity_memory: SimilarityMemory = ...  # noqa: F821
     security_manager: SecurityManager = ...  # noqa: F821
     process_file_system: ProcessFileSystem = ...  # noqa: F821
+    llm_rate_limiter: LLMRateLimiter = ...  # noqa: F821
     machine_name: str = ...
 
     @staticmethod
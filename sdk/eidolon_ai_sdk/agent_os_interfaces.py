@@ -271,6 +271,17 @@ class SimilarityMemory(ABC):
         """
         raise NotImplementedError("not implemented")
 
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        """Create embeddings for several pieces of text.
+
+        Args:
+            texts: The texts to be encoded.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        return [await self.embed_text(text, **kwargs) for text in texts]
+
     def embed(self, documents: Sequence[Document], **kwargs: Any) -> AsyncGenerator[EmbeddedDocument, None]:
         """
         Create embeddings for a list of documents.
@@ -309,6 +320,19 @@ class SimilarityMemory(ABC):
     ) -> List[QueryItem]:
         raise NotImplementedError("not implemented")
 
+    async def raw_query_many(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[QueryItem]]:
+        """Run several raw queries against a collection, returning one result list per query in the same order."""
+        return [
+            await self.raw_query(collection, query, num_results, metadata_where, include_embeddings) for query in queries
+        ]
+
     @abstractmethod
     def get_docs(self, collection: str, doc_ids: List[str]) -> AsyncIterable[Document]:
         raise NotImplementedError("not implemented")
@@ -355,3 +379,11 @@ class SecurityManager(ABC):
         Called when a process is created. Should propagate any state needed for future resource checks.
         """
         raise NotImplementedError("not implemented")
+
+    @abstractmethod
+    async def authorized_processes(self, permissions: Set[Permission], processes: Dict[str, str]) -> Set[str]:
+        """
+        Returns the ids of the given processes (process id -> agent) the authenticated user has the specified
+        permission(s) to, so a page of processes can be checked at once.
+        """
+        raise NotImplementedError("not implemented")
@@ -1,8 +1,12 @@
-from typing import Optional, List, AsyncIterator
+from typing import Optional, List, AsyncIterator, Dict
 
 from pydantic import BaseModel
 
 from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.index_registry import register_index
+
+register_index("agent_logic_unit", "parent_process_id", "parent_thread_id")
+register_index("agent_logic_unit", "remote_process_id")
 
 
 class AgentCallHistory(BaseModel):
@@ -42,6 +46,22 @@ class AgentCallHistory(BaseModel):
             )
         }
 
+    @classmethod
+    async def get_parent_pids(cls, process_ids: List[str]) -> Dict[str, str]:
+        """
+        Returns a mapping of process id to parent process id for the given processes that have a parent.
+        """
+        if not process_ids:
+            return {}
+        return {
+            o["remote_process_id"]: o["parent_process_id"]
+            async for o in AgentOS.symbolic_memory.find(
+                "agent_logic_unit",
+                {"remote_process_id": {"$in": list(process_ids)}},
+                projection={"remote_process_id": 1, "parent_process_id": 1},
+            )
+        }
+
     @classmethod
     async def get_children(cls, parent_process_id: str) -> AsyncIterator[str]:
         async for record in AgentOS.symbolic_memory.find(
@@ -5,9 +5,12 @@ from eidolon_ai_sdk.agent_os import AgentOS
 from eidolon_ai_sdk.apu.call_context import CallContext
 from eidolon_ai_sdk.apu.llm_message import LLMMessage
 from eidolon_ai_sdk.apu.memory_unit import MemoryUnit, MemoryUnitConfig
+from eidolon_ai_sdk.memory.index_registry import register_index
 from eidolon_ai_sdk.system.reference_model import Specable
 from eidolon_ai_client.util.logger import logger
 
+register_index("conversation_memory", "process_id", "thread_id", "is_boot_message")
+
 
 class RawMemoryUnit(MemoryUnit, Specable[MemoryUnitConfig]):
     async def writeMessages(self, call_context: CallContext, messages: List[LLMMessage]):
@@ -134,6 +134,7 @@ class MistralGPT(LLMUnit, Specable[MistralGPTSpec]):
     async def execute_llm(self, messages: List[LLMMessage], tools: List[LLMCallFunction],
                           output_format: Union[Literal["str"], Dict[str, Any]]) -> AsyncIterator[AssistantMessage]:
         can_stream_message, request = await self._build_request(messages, tools, output_format)
+        await self.acquire_rate_limit(messages, tools, request.get("max_tokens"))
 
         logger.info("executing mistral llm request", extra=request)
         if logger.isEnabledFor(logging.DEBUG):
@@ -63,6 +63,7 @@ class OllamaLLMUnit(LLMUnit, Specable[OllamaLLMUnitSpec]):
     async def execute_llm(self, messages: List[LLMMessage], tools: List[LLMCallFunction],
                           output_format: Union[Literal["str"], Dict[str, Any]]) -> AsyncIterator[AssistantMessage]:
         can_stream_message, request = await self._build_request(messages, output_format)
+        await self.acquire_rate_limit(messages, tools, self.spec.max_tokens)
 
         logger.info("executing ollama llm request")
         if logger.isEnabledFor(logging.DEBUG):
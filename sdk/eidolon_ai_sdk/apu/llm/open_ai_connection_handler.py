@@ -1,35 +1,122 @@
+import asyncio
+import importlib.util
 import os
-from typing import Optional, cast, List
-
-from azure.identity import get_bearer_token_provider, EnvironmentCredential
-from openai import AsyncOpenAI, AsyncStream
+import time
+import weakref
+from typing import Optional, cast, List, ClassVar
+
+import httpx
+from azure.core.credentials import AccessToken, TokenCredential
+from azure.identity import EnvironmentCredential
+from openai import AsyncOpenAI, AsyncStream, DefaultAsyncHttpxClient
 from openai.lib.azure import AsyncAzureOpenAI
 from openai.types import ImagesResponse
 from openai.types.chat import ChatCompletionChunk, ChatCompletion
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
+from eidolon_ai_client.util.logger import logger
 from eidolon_ai_sdk.system.reference_model import Specable, Reference
 from eidolon_ai_sdk.util.replay import replayable
+from eidolon_ai_sdk.util.single_flight import SingleFlight, request_key
+
+_completions_in_flight = SingleFlight("llm_completions")
 
 
 class OpenAIConnectionHandlerSpec(BaseModel, extra="allow"):
-    pass
+    """
+    Extra fields are passed through to the openai client. The remaining fields configure the connection pool of the
+    client, which is shared by every request made through the handler.
+    """
+
+    max_connections: int = Field(100, ge=1, description="The maximum number of concurrent connections to the api.")
+    max_keepalive_connections: int = Field(
+        20, ge=0, description="The maximum number of idle connections kept open for reuse."
+    )
+    keepalive_expiry: float = Field(30.0, description="Seconds an idle connection is kept open before it is closed.")
+    http2: bool = Field(False, description="Use HTTP/2. Requires the h2 package (httpx[http2]).")
+
+    @field_validator("http2")
+    @classmethod
+    def _h2_installed(cls, http2: bool) -> bool:
+        if http2 and importlib.util.find_spec("h2") is None:
+            raise ValueError("http2 requires the h2 package, install it with `pip install httpx[http2]`")
+        return http2
 
 
 class OpenAIConnectionHandler(Specable[OpenAIConnectionHandlerSpec]):
+    _open_handlers: ClassVar[weakref.WeakSet] = weakref.WeakSet()
+
+    def __init__(self, spec: OpenAIConnectionHandlerSpec):
+        super().__init__(spec)
+        self._client: Optional[AsyncOpenAI] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __getstate__(self):
+        # replay points pickle the handler, the client is rebuilt on first use after unpickling
+        state = self.__dict__.copy()
+        state["_client"] = state["_client_loop"] = None
+        return state
+
+    def _http_client(self) -> httpx.AsyncClient:
+        return DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.spec.max_connections,
+                max_keepalive_connections=self.spec.max_keepalive_connections,
+                keepalive_expiry=self.spec.keepalive_expiry,
+            ),
+            http2=self.spec.http2,
+        )
+
     def makeClient(self) -> AsyncOpenAI:
-        return AsyncOpenAI(**self.spec.model_extra)
+        return AsyncOpenAI(**self.spec.model_extra, http_client=self._http_client())
+
+    def client(self) -> AsyncOpenAI:
+        """
+        The client shared by every request made through this handler, so requests reuse pooled connections rather
+        than paying for a new connection and TLS handshake each time.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # pooled connections are bound to the loop that opened them
+            self._client = self.makeClient()
+            self._client_loop = loop
+            OpenAIConnectionHandler._open_handlers.add(self)
+        return self._client
+
+    async def close(self):
+        client, self._client, self._client_loop = self._client, None, None
+        OpenAIConnectionHandler._open_handlers.discard(self)
+        if client is not None:
+            await client.close()
+
+    @classmethod
+    async def close_all(cls):
+        """
+        Closes the clients of every handler. Called when the machine stops.
+        """
+        for handler in list(OpenAIConnectionHandler._open_handlers):
+            try:
+                await handler.close()
+            except Exception as e:
+                logger.warning(f"Error closing openai client: {e}")
 
     async def completion(self, **kwargs) -> ChatCompletion | AsyncStream[ChatCompletionChunk]:
+        if not kwargs.get("stream"):
+            # identical concurrent requests share one response, a stream can only be read by one caller
+            key = request_key(self.__class__.__name__, self.spec.model_dump(mode="json"), kwargs)
+            return await _completions_in_flight.do(key, lambda: self._completion(**kwargs))
+        return await self._completion(**kwargs)
+
+    async def _completion(self, **kwargs) -> ChatCompletion | AsyncStream[ChatCompletionChunk]:
         return await replayable(
-            fn=lambda **_kwargs: self.makeClient().chat.completions.create(**_kwargs),
+            fn=lambda **_kwargs: self.client().chat.completions.create(**_kwargs),
             parser=_replay_parser,
             name_override="openai_completion",
         )(**kwargs)
 
     async def generate_image(self, **kwargs) -> ImagesResponse:
         # todo, image generation should be repayable, but needs custom parser
-        return await self.makeClient().images.generate(**kwargs)
+        return await self.client().images.generate(**kwargs)
 
 
 def get_default_token_provider():
@@ -38,6 +125,24 @@ def get_default_token_provider():
     return None
 
 
+class CachedTokenProvider:
+    """
+    An azure ad token provider that reuses a token until shortly before it expires instead of requesting one from the
+    credential for every call.
+    """
+
+    def __init__(self, credential: TokenCredential, scopes: List[str], refresh_margin: float = 300):
+        self.credential = credential
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self._token: Optional[AccessToken] = None
+
+    def __call__(self) -> str:
+        if self._token is None or self._token.expires_on - self.refresh_margin <= time.time():
+            self._token = self.credential.get_token(*self.scopes)
+        return self._token.token
+
+
 class AzureOpenAIConnectionHandlerSpec(OpenAIConnectionHandlerSpec):
     """
     Automatically infers the values from environment variables for:
@@ -54,14 +159,24 @@ class AzureOpenAIConnectionHandlerSpec(OpenAIConnectionHandlerSpec):
 
 
 class AzureOpenAIConnectionHandler(OpenAIConnectionHandler, Specable[AzureOpenAIConnectionHandlerSpec]):
+    def __init__(self, spec: AzureOpenAIConnectionHandlerSpec):
+        super().__init__(spec)
+        self._token_provider: Optional[CachedTokenProvider] = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["_token_provider"] = None
+        return state
+
     def makeClient(self):
-        params = self.spec.model_extra
+        params = dict(self.spec.model_extra)
         if self.spec.azure_ad_token_provider:
-            provider = self.spec.azure_ad_token_provider.instantiate()
-            token_provider = get_bearer_token_provider(provider, *self.spec.token_provider_scopes)
-            params["azure_ad_token_provider"] = token_provider
+            if self._token_provider is None:
+                credential = self.spec.azure_ad_token_provider.instantiate()
+                self._token_provider = CachedTokenProvider(credential, self.spec.token_provider_scopes)
+            params["azure_ad_token_provider"] = self._token_provider
         params["api_version"] = self.spec.api_version
-        return AsyncAzureOpenAI(**params)
+        return AsyncAzureOpenAI(**params, http_client=self._http_client())
 
 
 async def _replay_parser(resp):
@@ -108,6 +108,7 @@ class OpenAIGPT(LLMUnit, Specable[OpenAiGPTSpec]):
                           output_format: Union[Literal["str"], Dict[str, Any]]) -> AsyncIterator[AssistantMessage]:
         can_stream_message, request = await self._build_request(messages, tools, output_format)
         request["stream"] = True
+        await self.acquire_rate_limit(messages, tools, request.get("max_tokens"))
 
         logger.info("executing open ai llm request", extra=request)
         if logger.isEnabledFor(logging.DEBUG):
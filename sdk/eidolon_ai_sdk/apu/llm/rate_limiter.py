@@ -0,0 +1,162 @@
+import asyncio
+import json
+import math
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.apu.llm_message import LLMMessage, UserMessage, UserMessageText, UserMessageImage
+from eidolon_ai_sdk.system.reference_model import Specable
+
+
+class RateLimit(BaseModel):
+    requests_per_minute: Optional[int] = Field(None, ge=1, description="The number of requests allowed per minute.")
+    tokens_per_minute: Optional[int] = Field(
+        None, ge=1, description="The number of tokens (estimated prompt tokens plus max_tokens) allowed per minute."
+    )
+
+
+class LLMRateLimiterSpec(BaseModel):
+    limits: Dict[str, RateLimit] = Field(
+        {},
+        description="Budgets keyed by model name, or by the rate_limit_key shared by the llm units drawing from one deployment.",
+    )
+    default_limit: Optional[RateLimit] = Field(
+        None, description="The budget of keys without an entry in limits. Calls are not limited when unset."
+    )
+    max_wait: float = Field(60.0, ge=0, description="Seconds a call may wait for budget before it fails with a 429.")
+    chars_per_token: float = Field(4.0, gt=0, description="Characters per token used to estimate prompt tokens.")
+    tokens_per_image: int = Field(765, ge=0, description="Estimated prompt tokens of an image.")
+
+
+class _Bucket:
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # a call larger than the whole budget waits for a full bucket rather than forever
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class _Budget:
+    def __init__(self, limit: RateLimit):
+        self.requests = _Bucket(limit.requests_per_minute) if limit.requests_per_minute else None
+        self.tokens = _Bucket(limit.tokens_per_minute) if limit.tokens_per_minute else None
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+
+    def wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        if self.requests:
+            self.requests.refill(now)
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens:
+            self.tokens.refill(now)
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def take(self, tokens: int):
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+
+
+class LLMRateLimiter(Specable[LLMRateLimiterSpec]):
+    """
+    Budgets the llm calls of every agent on the machine with token buckets of requests and tokens per minute, so the
+    machine uses its provider quota without tripping the provider's own rate limits.
+
+    Callers of one key wait in first come, first served order. A call that cannot get budget within `max_wait` seconds
+    fails with a 429 rather than being sent.
+    """
+
+    def __init__(self, spec: LLMRateLimiterSpec):
+        super().__init__(spec)
+        self._budgets: Dict[str, Optional[_Budget]] = {}
+
+    def _budget(self, key: str) -> Optional[_Budget]:
+        if key not in self._budgets:
+            limit = self.spec.limits.get(key, self.spec.default_limit)
+            self._budgets[key] = (
+                _Budget(limit) if limit and (limit.requests_per_minute or limit.tokens_per_minute) else None
+            )
+        return self._budgets[key]
+
+    def estimate_tokens(self, messages: List[LLMMessage], tools: List[BaseModel] = ()) -> int:
+        chars = 0
+        images = 0
+        for message in messages:
+            if isinstance(message, UserMessage) and not isinstance(message.content, str):
+                for part in message.content:
+                    if isinstance(part, UserMessageText):
+                        chars += len(part.text)
+                    elif isinstance(part, UserMessageImage):
+                        images += 1
+                    else:
+                        chars += len(part.model_dump_json())
+            else:
+                chars += len(message.model_dump_json())
+        for tool in tools:
+            chars += len(tool.name) + len(tool.description) + len(json.dumps(tool.parameters))
+        return math.ceil(chars / self.spec.chars_per_token) + images * self.spec.tokens_per_image
+
+    async def acquire(self, key: str, tokens: int):
+        """
+        Waits until the budget of `key` allows a request of `tokens` tokens and takes it from the budget.
+        """
+        budget = self._budget(key)
+        if budget is None:
+            return
+        deadline = time.monotonic() + self.spec.max_wait
+        budget.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(budget.lock.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                self._raise_exceeded(key, budget.wait_time(tokens))
+            try:
+                while (wait := budget.wait_time(tokens)) > 0:
+                    if time.monotonic() + wait > deadline:
+                        self._raise_exceeded(key, wait)
+                    await asyncio.sleep(wait)
+                budget.take(tokens)
+            finally:
+                budget.lock.release()
+        finally:
+            budget.waiting -= 1
+
+    def _raise_exceeded(self, key: str, wait: float):
+        logger.warning(f"LLM rate limit for {key} exceeded, {self.queue_depths().get(key, 0)} calls waiting")
+        raise HTTPException(
+            429, f"LLM Rate Limit Exceeded for {key}", headers={"Retry-After": str(math.ceil(wait) or 1)}
+        )
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {key: budget.waiting for key, budget in self._budgets.items() if budget}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        ret = {}
+        for key, budget in self._budgets.items():
+            if budget:
+                budget.wait_time(0)  # refill the buckets
+                ret[key] = dict(queue_depth=budget.waiting)
+                if budget.requests:
+                    ret[key]["available_requests"] = math.floor(budget.requests.level)
+                if budget.tokens:
+                    ret[key]["available_tokens"] = math.floor(budget.tokens.level)
+        return ret
@@ -0,0 +1,230 @@
+import asyncio
+import random
+import time
+from typing import AsyncIterator, List, Optional
+
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+from pydantic import BaseModel, Field
+
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import OpenAIConnectionHandler
+from eidolon_ai_sdk.system.reference_model import Specable, Reference
+
+_EMPTY = object()
+
+
+class RoutingConnectionHandlerSpec(BaseModel):
+    handlers: List[Reference[OpenAIConnectionHandler]] = Field(
+        min_length=1, description="The connection handlers of the endpoints to spread requests across."
+    )
+    cooldown: float = Field(
+        30.0, ge=0, description="Seconds an endpoint is left out of rotation after it fails or throttles a request."
+    )
+    hedge_after: Optional[float] = Field(
+        None,
+        gt=0,
+        description="If the first endpoint has not started streaming after this many seconds, the request is also sent to a second endpoint and the first to respond is used. Hedging is disabled when unset.",
+    )
+    smoothing: float = Field(
+        0.2,
+        gt=0,
+        le=1,
+        description="The weight of the newest observation in the time to first token and error rate averages.",
+    )
+
+
+class _Endpoint:
+    def __init__(self, index: int, handler: OpenAIConnectionHandler):
+        self.index = index
+        self.handler = handler
+        self.time_to_first_token: Optional[float] = None
+        self.error_rate = 0.0
+        self.ejected_until = 0.0
+
+    def __repr__(self):
+        return f"endpoint {self.index}"
+
+
+def _is_endpoint_failure(e: BaseException) -> bool:
+    # request errors (bad request, auth, ...) would fail on every endpoint, so they are not held against this one
+    return isinstance(e, (APIConnectionError, RateLimitError, InternalServerError))
+
+
+async def _close(response):
+    close = getattr(response, "close", None)
+    if close:
+        try:
+            await close()
+        except Exception as e:
+            logger.debug(f"Error closing abandoned completion: {e}")
+
+
+class _StartedStream:
+    """
+    A completion stream whose first chunk has already been read.
+    """
+
+    def __init__(self, router: "RoutingConnectionHandler", endpoint: _Endpoint, first, iterator: AsyncIterator, stream):
+        self._router = router
+        self._endpoint = endpoint
+        self._first = first
+        self._iterator = iterator
+        self._stream = stream
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            if self._first is not _EMPTY:
+                yield self._first
+            async for chunk in self._iterator:
+                yield chunk
+        except Exception as e:
+            if _is_endpoint_failure(e):
+                self._router._record_failure(self._endpoint, e)
+            raise
+        finally:
+            await self.close()
+
+    async def close(self):
+        await _close(self._stream)
+
+
+class RoutingConnectionHandler(OpenAIConnectionHandler, Specable[RoutingConnectionHandlerSpec]):
+    """
+    Spreads completions across a pool of connection handlers, such as deployments of the same model in several
+    regions.
+
+    Each call picks an endpoint at random, weighted towards endpoints with a low time to first token and a low error
+    rate. An endpoint that fails or throttles a request is left out of rotation for `cooldown` seconds and the request
+    is retried on another endpoint. With `hedge_after` set, a request that is slow to start streaming is also sent to a
+    second endpoint and whichever starts first is used.
+    """
+
+    endpoints: List[_Endpoint]
+
+    def __init__(self, spec: RoutingConnectionHandlerSpec):
+        super().__init__(spec)
+        self.endpoints = [_Endpoint(i, ref.instantiate()) for i, ref in enumerate(self.spec.handlers)]
+
+    def _choose(self, exclude: List[_Endpoint] = ()) -> Optional[_Endpoint]:
+        candidates = [e for e in self.endpoints if e not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        available = [e for e in candidates if e.ejected_until <= now]
+        if not available:
+            # every endpoint is cooling down, the one that will be back soonest is the best bet
+            return min(candidates, key=lambda e: e.ejected_until)
+        observed = [e.time_to_first_token for e in available if e.time_to_first_token is not None]
+        # endpoints without observations are weighted as the fastest so they are tried early
+        default_ttft = min(observed) if observed else 1.0
+        weights = [
+            max(0.01, 1 - e.error_rate)
+            / max(0.001, default_ttft if e.time_to_first_token is None else e.time_to_first_token)
+            for e in available
+        ]
+        return random.choices(available, weights)[0]
+
+    def _record_latency(self, endpoint: _Endpoint, latency: float):
+        alpha = self.spec.smoothing
+        previous = endpoint.time_to_first_token
+        endpoint.time_to_first_token = latency if previous is None else alpha * latency + (1 - alpha) * previous
+
+    def _record_success(self, endpoint: _Endpoint, latency: float):
+        self._record_latency(endpoint, latency)
+        endpoint.error_rate *= 1 - self.spec.smoothing
+
+    def _record_failure(self, endpoint: _Endpoint, e: BaseException):
+        alpha = self.spec.smoothing
+        endpoint.error_rate = alpha + (1 - alpha) * endpoint.error_rate
+        cooldown = self.spec.cooldown
+        if isinstance(e, RateLimitError):
+            try:
+                cooldown = max(cooldown, float(e.response.headers.get("retry-after", 0)))
+            except ValueError:
+                pass
+        endpoint.ejected_until = time.monotonic() + cooldown
+        logger.warning(f"Ejecting {endpoint} for {cooldown}s after {e.__class__.__name__}: {e}")
+
+    async def _start(self, endpoint: _Endpoint, kwargs):
+        """
+        Sends the request to one endpoint. Streams are started by waiting for their first chunk so the time to first
+        token is measured and failures surface before the stream is handed to the caller.
+        """
+        start = time.monotonic()
+        response = None
+        try:
+            response = await endpoint.handler.completion(**kwargs)
+            if kwargs.get("stream"):
+                iterator = response.__aiter__()
+                try:
+                    first = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first = _EMPTY
+                response = _StartedStream(self, endpoint, first, iterator, response)
+        except asyncio.CancelledError:
+            # lost a hedge, the time it had spent is a lower bound on its time to first token
+            self._record_latency(endpoint, time.monotonic() - start)
+            await _close(response)
+            raise
+        except Exception as e:
+            if _is_endpoint_failure(e):
+                self._record_failure(endpoint, e)
+            await _close(response)
+            raise
+        self._record_success(endpoint, time.monotonic() - start)
+        return response
+
+    async def _hedged(self, endpoint: _Endpoint, tried: List[_Endpoint], kwargs):
+        pending = {asyncio.create_task(self._start(endpoint, kwargs))}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.spec.hedge_after)
+            if not done:
+                backup = self._choose(tried)
+                if backup:
+                    logger.info(f"{endpoint} is slow to respond, hedging with {backup}")
+                    tried.append(backup)
+                    pending.add(asyncio.create_task(self._start(backup, kwargs)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                for extra in winners[1:]:
+                    await _close(extra.result())
+                if winners:
+                    return winners[0].result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def completion(self, **kwargs):
+        tried = []
+        while True:
+            endpoint = self._choose(tried)
+            tried.append(endpoint)
+            try:
+                if self.spec.hedge_after:
+                    return await self._hedged(endpoint, tried, kwargs)
+                return await self._start(endpoint, kwargs)
+            except Exception as e:
+                if not _is_endpoint_failure(e) or len(tried) >= len(self.endpoints):
+                    raise
+                logger.info(f"Retrying completion on another endpoint after {e.__class__.__name__}")
+
+    async def generate_image(self, **kwargs):
+        return await self._choose().handler.generate_image(**kwargs)
+
+    def makeClient(self) -> AsyncOpenAI:
+        return self._choose().handler.makeClient()
+
+    def client(self) -> AsyncOpenAI:
+        return self._choose().handler.client()
+
+    async def close(self):
+        for endpoint in self.endpoints:
+            await endpoint.handler.close()
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+from eidolon_ai_client.events import BaseStreamEvent, StreamEvent, StringOutputEvent, ToolCall
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.apu.call_context import CallContext
+from eidolon_ai_sdk.apu.llm_message import LLMMessage
+from eidolon_ai_sdk.apu.llm_unit import LLMCallFunction, LLMCapabilities, LLMUnit
+from eidolon_ai_sdk.apu.processing_unit import ProcessingUnit
+from eidolon_ai_sdk.memory.index_registry import register_index
+from eidolon_ai_sdk.system.reference_model import AnnotatedReference, Specable
+from eidolon_ai_sdk.util.class_utils import fqn
+
+
+class LLMResponseCache(ABC):
+    """
+    Stores the events of llm responses, keyed by a hash of the request.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        pass
+
+    @abstractmethod
+    async def put(self, key: str, events: List[Dict[str, Any]]):
+        pass
+
+
+class InMemoryLLMResponseCacheSpec(BaseModel):
+    max_entries: int = Field(
+        1000, ge=1, description="The number of responses kept. The least recently used are evicted."
+    )
+    ttl: Optional[float] = Field(
+        3600.0, gt=0, description="Seconds a response is kept. Responses never expire when unset."
+    )
+
+
+class InMemoryLLMResponseCache(LLMResponseCache, Specable[InMemoryLLMResponseCacheSpec]):
+    def __init__(self, spec: InMemoryLLMResponseCacheSpec):
+        super().__init__(spec)
+        self._entries: OrderedDict[str, Tuple[Optional[float], List[Dict[str, Any]]]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, events = entry
+        if expires is not None and expires <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return events
+
+    async def put(self, key: str, events: List[Dict[str, Any]]):
+        self._entries[key] = (time.time() + self.spec.ttl if self.spec.ttl else None, events)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.spec.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SymbolicMemoryLLMResponseCacheSpec(BaseModel):
+    collection: str = Field(
+        "llm_response_cache", description="The symbolic memory collection the responses are stored in."
+    )
+    max_entries: Optional[int] = Field(
+        10_000,
+        ge=1,
+        description="The number of responses kept. The least recently used are evicted. Unbounded when unset.",
+    )
+    ttl: Optional[float] = Field(
+        24 * 3600.0, gt=0, description="Seconds a response is kept. Responses never expire when unset."
+    )
+    eviction_interval: int = Field(
+        100,
+        ge=1,
+        description="The number of responses stored between checks for entries beyond max_entries, so the collection "
+        "is not counted on every write. It may hold up to this many extra entries in between.",
+    )
+
+
+class SymbolicMemoryLLMResponseCache(LLMResponseCache, Specable[SymbolicMemoryLLMResponseCacheSpec]):
+    """
+    Keeps responses in the machine's symbolic memory so they are shared by every replica of the machine and survive
+    restarts.
+    """
+
+    def __init__(self, spec: SymbolicMemoryLLMResponseCacheSpec):
+        super().__init__(spec)
+        register_index(self.spec.collection, "key")
+        register_index(self.spec.collection, "last_used")
+        self._puts = 0
+
+    async def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        now = time.time()
+        entry = await AgentOS.symbolic_memory.find_one(self.spec.collection, {"key": key})
+        if entry is None or entry.get("events") is None:
+            return None
+        if entry.get("expires") is not None and entry["expires"] <= now:
+            await AgentOS.symbolic_memory.delete(self.spec.collection, {"key": key})
+            return None
+        await AgentOS.symbolic_memory.upsert_one(self.spec.collection, dict(key=key, last_used=now), {"key": key})
+        return entry["events"]
+
+    async def put(self, key: str, events: List[Dict[str, Any]]):
+        now = time.time()
+        document = dict(key=key, events=events, last_used=now, expires=now + self.spec.ttl if self.spec.ttl else None)
+        await AgentOS.symbolic_memory.upsert_one(self.spec.collection, document, {"key": key})
+        self._puts += 1
+        if self.spec.max_entries and self._puts % self.spec.eviction_interval == 0:
+            await self._evict()
+
+    async def _evict(self):
+        excess = await AgentOS.symbolic_memory.count(self.spec.collection, {}) - self.spec.max_entries
+        if excess > 0:
+            evicted = []
+            async for entry in AgentOS.symbolic_memory.find(
+                self.spec.collection, {}, projection={"key": 1}, sort={"last_used": 1}
+            ):
+                evicted.append(entry["key"])
+                if len(evicted) >= excess:
+                    break
+            await AgentOS.symbolic_memory.delete(self.spec.collection, {"key": {"$in": evicted}})
+
+
+class CachingLLMUnitSpec(BaseModel):
+    llm_unit: AnnotatedReference[LLMUnit]
+    cache: AnnotatedReference[LLMResponseCache]
+
+
+class CachingLLMUnit(LLMUnit, Specable[CachingLLMUnitSpec]):
+    """
+    Wraps an llm unit and replays the events of earlier responses to identical requests instead of calling the llm.
+
+    Requests are identical when their messages, tools, output format, and the configuration of the wrapped unit (model,
+    temperature, ...) are. Only responses that streamed to completion are cached.
+    """
+
+    llm_unit: LLMUnit
+    cache: LLMResponseCache
+
+    def __init__(self, **kwargs):
+        ProcessingUnit.__init__(self, **kwargs)
+        Specable.__init__(self, **kwargs)
+        self.llm_unit = self.spec.llm_unit.instantiate(processing_unit_locator=self.processing_unit_locator)
+        self.cache = self.spec.cache.instantiate()
+        self.model = self.llm_unit.model
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(
+        self,
+        messages: List[LLMMessage],
+        tools: List[LLMCallFunction],
+        output_format: Union[Literal["str"], Dict[str, Any]],
+    ) -> str:
+        request = dict(
+            unit=fqn(self.llm_unit.__class__),
+            config=self.llm_unit.spec.model_dump(mode="json"),
+            model=self.model.name if self.model else None,
+            temperature=getattr(self.llm_unit, "temperature", None),
+            messages=[m.model_dump(mode="json") for m in messages],
+            tools=[t.model_dump(mode="json") for t in tools],
+            output_format=output_format,
+        )
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def execute_llm(
+        self,
+        messages: List[LLMMessage],
+        tools: List[LLMCallFunction],
+        output_format: Union[Literal["str"], Dict[str, Any]],
+    ) -> AsyncIterator[StreamEvent]:
+        key = self.cache_key(messages, tools, output_format)
+        try:
+            cached = await self.cache.get(key)
+        except Exception as e:
+            logger.warning(f"Error reading llm response cache: {e}")
+            cached = None
+        if cached is not None:
+            self.hits += 1
+            logger.debug(f"llm response cache hit {key}")
+            for event in cached:
+                yield BaseStreamEvent.from_dict(dict(event))
+            return
+
+        self.misses += 1
+        events = []
+        async for event in self.llm_unit.execute_llm(messages, tools, output_format):
+            if (
+                isinstance(event, StringOutputEvent)
+                and events
+                and events[-1]["event_type"] == "string"
+                and events[-1]["stream_context"] == event.stream_context
+            ):
+                events[-1]["content"] += event.content
+            else:
+                events.append(event.model_dump(mode="json"))
+            yield event
+        try:
+            await self.cache.put(key, events)
+        except Exception as e:
+            logger.warning(f"Error writing llm response cache: {e}")
+
+    def get_llm_capabilities(self) -> LLMCapabilities:
+        return self.llm_unit.get_llm_capabilities()
+
+    def create_assistant_message(self, call_context: CallContext, contents: str, tool_call_events) -> LLMMessage:
+        return self.llm_unit.create_assistant_message(call_context, contents, tool_call_events)
+
+    def create_tool_response_message(self, logic_unit_name: str, tc: ToolCall, content: str) -> LLMMessage:
+        return self.llm_unit.create_tool_response_message(logic_unit_name, tc, content)
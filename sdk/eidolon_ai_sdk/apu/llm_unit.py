@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import List, Any, Dict, Literal, Union, AsyncIterator
+from typing import List, Any, Dict, Literal, Union, AsyncIterator, Optional
 
 from pydantic import BaseModel, Field
 
 from eidolon_ai_client.events import StreamEvent, ToolCall
+from eidolon_ai_sdk.agent_os import AgentOS
 from eidolon_ai_sdk.apu.call_context import CallContext
 from eidolon_ai_sdk.apu.llm_message import LLMMessage, AssistantMessage, ToolResponseMessage
 from eidolon_ai_sdk.apu.processing_unit import ProcessingUnit
@@ -51,6 +52,10 @@ class LLMUnitSpec(BaseModel):
     """
 
     model: Reference[LLMModel]
+    rate_limit_key: Optional[str] = Field(
+        None,
+        description="The budget of the machine's llm rate limiter this unit draws from. Defaults to the name of the model.",
+    )
 
 
 class LLMUnit(ProcessingUnit, Specable[LLMUnitSpec], ABC):
@@ -70,6 +75,17 @@ class LLMUnit(ProcessingUnit, Specable[LLMUnitSpec], ABC):
             supports_audio_input=self.model.supports_audio_input,
         )
 
+    async def acquire_rate_limit(
+        self, messages: List[LLMMessage], tools: List[LLMCallFunction], max_tokens: Optional[int]
+    ):
+        """
+        Waits for budget from the machine's llm rate limiter before a call is sent to the llm.
+        """
+        limiter = AgentOS.llm_rate_limiter
+        if limiter is not ...:
+            key = self.spec.rate_limit_key or (self.model.name if self.model else self.__class__.__name__)
+            await limiter.acquire(key, limiter.estimate_tokens(messages, tools) + (max_tokens or 0))
+
     def create_assistant_message(self, call_context: CallContext, contents: str, tool_call_events) -> LLMMessage:
         return AssistantMessage(
             type="assistant",
@@ -38,6 +38,7 @@ from eidolon_ai_sdk.system.resources.reference_resource import ReferenceResource
 from eidolon_ai_sdk.system.resources.resources_base import Resource
 from eidolon_ai_sdk.util.posthog import report_server_started
 from eidolon_ai_sdk.util.replay import ReplayConfig
+from eidolon_ai_sdk.util.single_flight import SingleFlight
 
 dotenv.load_dotenv()
 
@@ -68,6 +69,15 @@ class MachineStatus(BaseModel):
     machine_version: str = Field(description="The version of the machine.")
     resources: typing.Dict[str, ResourceStatus] = Field(description="Resources available on this machine.")
     agents: typing.Dict[str, ResourceStatus] = Field(description="Agents running on this machine.")
+    symbolic_memory_pool: typing.Optional[typing.Dict[str, typing.Any]] = Field(
+        default=None, description="Connection pool statistics of the symbolic memory, if it maintains a pool."
+    )
+    single_flight: typing.Dict[str, typing.Dict[str, int]] = Field(
+        default={}, description="Calls made and duplicate in flight calls saved by each single-flight group."
+    )
+    llm_rate_limits: typing.Dict[str, typing.Dict[str, typing.Any]] = Field(
+        default={}, description="Queue depth and remaining budget of each rate limited llm key."
+    )
 
 
 @asynccontextmanager
@@ -126,12 +136,18 @@ async def start_os(app: FastAPI, resource_generator, machine_name, log_level=log
             agent_status[res] = ResourceStatus(
                 resource_name=res, resource_status="error" if errors else "running", errors=errors
             )
+        pool_stats = None
+        if hasattr(AgentOS.symbolic_memory, "pool_stats"):
+            pool_stats = AgentOS.symbolic_memory.pool_stats()
         return MachineStatus(
             machine_status=_status,
             machine_name=machine_name,
             machine_version=EIDOLON_SDK_VERSION,
             resources=resource_status,
             agents=agent_status,
+            symbolic_memory_pool=pool_stats,
+            single_flight=SingleFlight.all_stats(),
+            llm_rate_limits=AgentOS.llm_rate_limiter.stats() if AgentOS.llm_rate_limiter is not ... else {},
         )
 
     # noinspection PyShadowingNames
@@ -27,7 +27,11 @@ from eidolon_ai_sdk.agent.doc_manager.transformer.auto_transformer import AutoTr
 from eidolon_ai_sdk.agent.doc_manager.transformer.document_transformer import DocumentTransformer
 from eidolon_ai_sdk.agent.generic_agent import GenericAgent
 from eidolon_ai_sdk.agent.retriever_agent.document_reranker import RAGFusionReranker, DocumentReranker
-from eidolon_ai_sdk.agent.retriever_agent.document_retriever import SimilarityMemoryRetriever, DocumentRetriever
+from eidolon_ai_sdk.agent.retriever_agent.document_retriever import (
+    SimilarityMemoryRetriever,
+    DocumentRetriever,
+    HybridRetriever,
+)
 from eidolon_ai_sdk.agent.retriever_agent.multi_question_transformer import MultiQuestionTransformer
 from eidolon_ai_sdk.agent.retriever_agent.question_transformer import QuestionTransformer, NoopQuestionTransformer
 from eidolon_ai_sdk.agent.retriever_agent.result_summarizer import ResultSummarizer
@@ -53,12 +57,20 @@ from eidolon_ai_sdk.apu.llm.anthropic_llm_unit import AnthropicLLMUnit
 from eidolon_ai_sdk.apu.llm.mistral_llm_unit import MistralGPT
 from eidolon_ai_sdk.apu.llm.ollama_llm_unit import OllamaLLMUnit
 from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import OpenAIConnectionHandler, AzureOpenAIConnectionHandler
+from eidolon_ai_sdk.apu.llm.rate_limiter import LLMRateLimiter
+from eidolon_ai_sdk.apu.llm.routing_connection_handler import RoutingConnectionHandler
 from eidolon_ai_sdk.apu.llm.open_ai_image_unit import OpenAIImageUnit
 from eidolon_ai_sdk.apu.llm.open_ai_llm_unit import OpenAIGPT
 from eidolon_ai_sdk.apu.llm.open_ai_speech import OpenAiSpeech
 from eidolon_ai_sdk.apu.llm_unit import LLMUnit, LLMModel
 from eidolon_ai_sdk.apu.memory_unit import MemoryUnit
 from eidolon_ai_sdk.apu.tool_call_unit import ToolCallLLMWrapper
+from eidolon_ai_sdk.apu.llm_cache import (
+    CachingLLMUnit,
+    LLMResponseCache,
+    InMemoryLLMResponseCache,
+    SymbolicMemoryLLMResponseCache,
+)
 from eidolon_ai_sdk.memory.azure_file_memory import AzureFileMemory
 from eidolon_ai_sdk.memory.s3_file_memory import S3FileMemory
 from eidolon_ai_sdk.security.azure_authorizer import AzureJWTProcessor
@@ -73,11 +85,15 @@ except ImportError:
     logger.warning("Error, ChromaVectorStore is not available")
     ChromaVectorStore = None
 
+from eidolon_ai_sdk.memory.embedding_cache import CachingEmbedding
 from eidolon_ai_sdk.memory.embeddings import NoopEmbedding, Embedding, OpenAIEmbedding
+from eidolon_ai_sdk.memory.file_symbolic_memory import FileSymbolicMemory
+from eidolon_ai_sdk.memory.lexical_index import LexicalIndex
 from eidolon_ai_sdk.memory.local_file_memory import LocalFileMemory
 from eidolon_ai_sdk.memory.local_symbolic_memory import LocalSymbolicMemory
 from eidolon_ai_sdk.memory.mongo_symbolic_memory import MongoSymbolicMemory
 from eidolon_ai_sdk.memory.noop_memory import NoopVectorStore
+from eidolon_ai_sdk.memory.numpy_vector_store import NumpyVectorStore
 from eidolon_ai_sdk.memory.similarity_memory import SimilarityMemoryImpl
 from eidolon_ai_sdk.memory.vector_store import VectorStore
 from eidolon_ai_sdk.security.security_manager import SecurityManagerImpl
@@ -169,6 +185,7 @@ def named_builtins() -> List[ReferenceResource]:
         (SymbolicMemory, MongoSymbolicMemory),
         MongoSymbolicMemory,
         LocalSymbolicMemory,
+        FileSymbolicMemory,
         (FileMemory, LocalFileMemory),
         LocalFileMemory,
         S3FileMemory,
@@ -178,9 +195,11 @@ def named_builtins() -> List[ReferenceResource]:
         (Embedding, OpenAIEmbedding),
         NoopEmbedding,
         OpenAIEmbedding,
+        CachingEmbedding,
         (VectorStore, ChromaVectorStore),
         NoopVectorStore,
         ChromaVectorStore,
+        NumpyVectorStore,
         # middleware
         (Middleware, MultiMiddleware),
         MultiMiddleware,
@@ -212,6 +231,8 @@ def named_builtins() -> List[ReferenceResource]:
         RAGFusionReranker,
         (DocumentRetriever, SimilarityMemoryRetriever),
         SimilarityMemoryRetriever,
+        HybridRetriever,
+        LexicalIndex,
         ResultSummarizer,
         (DocumentLoader, FilesystemLoader),
         DocumentProcessor,
@@ -228,8 +249,14 @@ def named_builtins() -> List[ReferenceResource]:
         UsageClient,
         OpenAIConnectionHandler,
         AzureOpenAIConnectionHandler,
+        RoutingConnectionHandler,
+        LLMRateLimiter,
         OpenAIImageUnit,
         ToolCallLLMWrapper,
+        CachingLLMUnit,
+        (LLMResponseCache, InMemoryLLMResponseCache),
+        InMemoryLLMResponseCache,
+        SymbolicMemoryLLMResponseCache,
         DefaultAzureCredential,
         EnvironmentCredential,
         # config objects
@@ -14,15 +14,22 @@ from chromadb import Include, QueryResult
 from chromadb.api.models.Collection import Collection
 from pathlib import Path
 from pydantic import Field, field_validator
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, TypeVar
 from urllib.parse import urlparse, parse_qs
 
+try:
+    from chromadb.errors import InvalidCollectionException
+except ImportError:  # chromadb before 0.5.1 reports a missing collection with a ValueError
+    InvalidCollectionException = ValueError
+
 from eidolon_ai_sdk.memory.document import EmbeddedDocument
 from eidolon_ai_sdk.memory.file_system_vector_store import FileSystemVectorStore, FileSystemVectorStoreSpec, tracer
 from eidolon_ai_sdk.memory.vector_store import QueryItem
 from eidolon_ai_sdk.system.reference_model import Specable
 from eidolon_ai_sdk.util.str_utils import replace_env_var_in_string
 
+T = TypeVar("T")
+
 
 class ChromaVectorStoreConfig(FileSystemVectorStoreSpec):
     url: str = Field(
@@ -69,6 +76,7 @@ class ChromaVectorStore(FileSystemVectorStore, Specable[ChromaVectorStoreConfig]
         super().__init__(spec)
         self.spec = spec
         self.client = None
+        self._collections: Dict[str, Collection] = {}
 
     async def start(self):
         pass
@@ -92,36 +100,84 @@ class ChromaVectorStore(FileSystemVectorStore, Specable[ChromaVectorStoreConfig]
         pass
 
     def _get_collection(self, name: str) -> Collection:
+        # collection handles are cached so only the first use of a collection (and connecting) takes the lock
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
         with ChromaVectorStore.lock:
             if not self.client:
                 self.connect()
+            collection = self._collections.get(name)
+            if collection is None:
+                try:
+                    collection = self.client.get_or_create_collection(name=name)
+                except BaseException as e:
+                    raise RuntimeError(f"Failed to get collection {name}") from e
+                self._collections[name] = collection
+            return collection
+
+    def _with_collection(self, name: str, fn: Callable[[Collection], T]) -> T:
+        try:
+            return fn(self._get_collection(name))
+        except InvalidCollectionException as e:
+            # older chromadb raises a plain ValueError for any bad argument, so only retry a missing collection
+            if InvalidCollectionException is ValueError and "does not exist" not in str(e):
+                raise
+            # the collection was deleted since its handle was cached, so fetch (or recreate) it once
+            self._collections.pop(name, None)
+            return fn(self._get_collection(name))
 
-            try:
-                return self.client.get_or_create_collection(name=name)
-            except BaseException as e:
-                raise RuntimeError(f"Failed to get collection {name}") from e
+    @make_async
+    def delete_collection(self, name: str):
+        self._collections.pop(name, None)
+        with ChromaVectorStore.lock:
+            if not self.client:
+                self.connect()
+        try:
+            self.client.delete_collection(name=name)
+        except ValueError:
+            pass
 
     @make_async
     def add_embedding(self, collection: str, docs: List[EmbeddedDocument], **add_kwargs: Any):
         with tracer.start_as_current_span("add embedding"):
-            collection = self._get_collection(name=collection)
             doc_ids = [doc.id for doc in docs]
             embeddings = [doc.embedding for doc in docs]
             metadata = [doc.metadata for doc in docs]
-            collection.upsert(embeddings=embeddings, ids=doc_ids, metadatas=metadata, **add_kwargs)
+            self._with_collection(
+                collection, lambda c: c.upsert(embeddings=embeddings, ids=doc_ids, metadatas=metadata, **add_kwargs)
+            )
 
     @make_async
     def delete_embedding(self, collection: str, doc_ids: List[str], **delete_kwargs: Any):
-        collection = self._get_collection(name=collection)
-        collection.delete(ids=doc_ids, **delete_kwargs)
+        self._with_collection(collection, lambda c: c.delete(ids=doc_ids, **delete_kwargs))
 
     @make_async
     def get_metadata(self, collection: str, doc_ids: List[str]):
-        collection = self._get_collection(name=collection)
-        return collection.get(ids=doc_ids, include=["metadatas"])["metadatas"]
+        return self._with_collection(collection, lambda c: c.get(ids=doc_ids, include=["metadatas"])["metadatas"])
 
     @make_async
-    def query_embedding(
+    def get_contents(self, collection: str, doc_ids: List[str]) -> List[Optional[str]]:
+        results = self._with_collection(collection, lambda c: c.get(ids=doc_ids, include=["documents"]))
+        contents = dict(zip(results["ids"], results["documents"]))
+        return [contents.get(doc_id) for doc_id in doc_ids]
+
+    @make_async
+    def set_contents(self, collection: str, doc_ids: List[str], contents: List[str]):
+        def update(c: Collection):
+            # chroma embeds documents written without embeddings, so the stored embeddings are written back with them
+            existing = c.get(ids=doc_ids, include=["embeddings"])
+            by_id = dict(zip(doc_ids, contents))
+            if existing["ids"]:
+                c.update(
+                    ids=existing["ids"],
+                    embeddings=existing["embeddings"],
+                    documents=[by_id[doc_id] for doc_id in existing["ids"]],
+                )
+
+        self._with_collection(collection, update)
+
+    async def query_embedding(
         self,
         collection: str,
         query: List[float],
@@ -129,28 +185,44 @@ class ChromaVectorStore(FileSystemVectorStore, Specable[ChromaVectorStoreConfig]
         metadata_where: Optional[Dict[str, str]] = None,
         include_embeddings=False,
     ) -> List[QueryItem]:
-        collection = self._get_collection(name=collection)
+        return (await self.query_embeddings(collection, [query], num_results, metadata_where, include_embeddings))[0]
+
+    @make_async
+    def query_embeddings(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings=False,
+    ) -> List[List[QueryItem]]:
         thingsToInclude: Include = ["metadatas", "distances"]
         if include_embeddings:
             thingsToInclude.append("embeddings")
 
-        results: QueryResult = collection.query(
-            query_embeddings=[query],
-            n_results=num_results,
-            where=metadata_where,
-            include=thingsToInclude,
+        results: QueryResult = self._with_collection(
+            collection,
+            lambda c: c.query(
+                query_embeddings=queries,
+                n_results=num_results,
+                where=metadata_where,
+                include=thingsToInclude,
+            ),
         )
 
         ret = []
-        for i, doc_id in enumerate(results["ids"][0]):
-            embedding = results["embeddings"][0][i] if include_embeddings else None
-            ret.append(
-                QueryItem(
-                    id=doc_id,
-                    score=results["distances"][0][i],
-                    embedding=embedding,
-                    metadata=results["metadatas"][0][i],
+        for q, ids in enumerate(results["ids"]):
+            items = []
+            for i, doc_id in enumerate(ids):
+                embedding = results["embeddings"][q][i] if include_embeddings else None
+                items.append(
+                    QueryItem(
+                        id=doc_id,
+                        score=results["distances"][q][i],
+                        embedding=embedding,
+                        metadata=results["metadatas"][q][i],
+                    )
                 )
-            )
+            ret.append(items)
 
         return ret
@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Sequence
+
+from pydantic import Field
+
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.embeddings import Embedding, EmbeddingSpec
+from eidolon_ai_sdk.memory.index_registry import register_index
+from eidolon_ai_sdk.system.reference_model import AnnotatedReference, Specable
+from eidolon_ai_sdk.util.class_utils import fqn
+
+
+class CachingEmbeddingSpec(EmbeddingSpec):
+    embedder: AnnotatedReference[Embedding]
+    max_entries: int = Field(
+        10_000, ge=1, description="The number of embeddings kept in process. The least recently used are evicted."
+    )
+    persistent: bool = Field(
+        True, description="Also keep embeddings in the machine's symbolic memory, shared by replicas and restarts."
+    )
+    collection: str = Field("embedding_cache", description="The symbolic memory collection embeddings are stored in.")
+    max_concurrent_writes: int = Field(
+        16, ge=1, description="The maximum number of embeddings written to symbolic memory at once."
+    )
+
+
+class CachingEmbedding(Embedding, Specable[CachingEmbeddingSpec]):
+    """
+    Wraps an embedder and reuses the embeddings of text it has already embedded instead of embedding it again.
+
+    Embeddings are content addressed by the embedder implementation, its model, and a hash of the text, so unchanged
+    chunks of a re-synced document and repeated questions are not re-embedded. Lookups check an in process LRU first,
+    then the machine's symbolic memory.
+    """
+
+    embedder: Embedding
+
+    def __init__(self, spec: CachingEmbeddingSpec):
+        super().__init__(spec)
+        self.embedder = self.spec.embedder.instantiate()
+        if self.spec.persistent:
+            register_index(self.spec.collection, "key")
+        self._entries: OrderedDict[str, List[float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self):
+        await self.embedder.start()
+
+    async def stop(self):
+        await self.embedder.stop()
+
+    def cache_key(self, text: str) -> str:
+        model = getattr(self.embedder.spec, "model", None)
+        text_hash = hashlib.sha256(text.encode()).hexdigest()
+        return hashlib.sha256(f"{fqn(self.embedder.__class__)}:{model}:{text_hash}".encode()).hexdigest()
+
+    async def embed_text(self, text: str, **kwargs: Any) -> List[float]:
+        return (await self.embed_texts([text], **kwargs))[0]
+
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        keys = [self.cache_key(text) for text in texts]
+        found = self._get_local(keys)
+        if self.spec.persistent and len(found) < len(set(keys)):
+            persisted = await self._get_persisted([k for k in set(keys) if k not in found])
+            for key, embedding in persisted.items():
+                self._put_local(key, embedding)
+            found.update(persisted)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            embeddings = await self.embedder.embed_texts(list(missing.values()), **kwargs)
+            created = dict(zip(missing.keys(), embeddings))
+            for key, embedding in created.items():
+                self._put_local(key, embedding)
+            if self.spec.persistent:
+                await self._put_persisted(created)
+            found.update(created)
+        return [found[key] for key in keys]
+
+    def _get_local(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        for key in keys:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                found[key] = embedding
+        return found
+
+    def _put_local(self, key: str, embedding: List[float]):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.spec.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_persisted(self, keys: List[str]) -> Dict[str, List[float]]:
+        try:
+            return {
+                entry["key"]: entry["embedding"]
+                async for entry in AgentOS.symbolic_memory.find(
+                    self.spec.collection, {"key": {"$in": keys}}, projection={"key": 1, "embedding": 1}
+                )
+            }
+        except Exception as e:
+            logger.warning(f"Error reading embedding cache: {e}")
+            return {}
+
+    async def _put_persisted(self, embeddings: Dict[str, List[float]]):
+        semaphore = asyncio.Semaphore(self.spec.max_concurrent_writes)
+
+        async def put(key: str, embedding: List[float]):
+            async with semaphore:
+                await AgentOS.symbolic_memory.upsert_one(
+                    self.spec.collection, dict(key=key, embedding=list(embedding)), {"key": key}
+                )
+
+        try:
+            await asyncio.gather(*[put(key, embedding) for key, embedding in embeddings.items()])
+        except Exception as e:
+            logger.warning(f"Error writing embedding cache: {e}")
@@ -2,19 +2,42 @@ import asyncio
 from abc import ABC, abstractmethod
 from typing import Sequence, Any, AsyncGenerator, Optional, List
 
-from openai import AsyncOpenAI
+import httpx
+import openai
 from opentelemetry import trace
 from pydantic import BaseModel, Field
 
+from eidolon_ai_client.util.logger import logger
 from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import OpenAIConnectionHandler
 from eidolon_ai_sdk.system.reference_model import Specable, AnnotatedReference
 from eidolon_ai_sdk.memory.document import Document, EmbeddedDocument
+from eidolon_ai_sdk.util.single_flight import SingleFlight, request_key
 
 tracer = trace.get_tracer("memory wrapper loader")
+_embeddings_in_flight = SingleFlight("embeddings")
 
 
 class EmbeddingSpec(BaseModel):
-    pass
+    batch_size: int = Field(256, ge=1, description="The maximum number of documents embedded in one request.")
+    max_batch_tokens: int = Field(
+        100_000, ge=1, description="The maximum number of estimated tokens embedded in one request."
+    )
+    max_concurrency: int = Field(4, ge=1, description="The maximum number of embedding requests in flight at once.")
+    max_retries: int = Field(3, ge=0, description="The number of times a failed embedding request is retried.")
+    chars_per_token: float = Field(4.0, gt=0, description="Characters per token used to estimate the size of a request.")
+
+
+def _is_retryable(e: Exception) -> bool:
+    """
+    Whether a failed embedding request may succeed when retried: rate limits, timeouts, connection errors, and server
+    errors. Other errors, such as invalid requests or authentication failures, fail the same way every time.
+    """
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return isinstance(
+        e,
+        (openai.APIConnectionError, httpx.TimeoutException, httpx.NetworkError, ConnectionError, asyncio.TimeoutError),
+    )
 
 
 class Embedding(ABC, Specable[EmbeddingSpec]):
@@ -33,32 +56,76 @@ class Embedding(ABC, Specable[EmbeddingSpec]):
             An embedding for the text.
         """
 
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        """Create embeddings for several pieces of text. Implementations that can embed several texts in one request
+        should override this.
+
+        Args:
+            texts: The texts to be encoded.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        return list(await asyncio.gather(*[self.embed_text(text, **kwargs) for text in texts]))
+
     async def embed(self, documents: Sequence[Document], **kwargs: Any) -> AsyncGenerator[EmbeddedDocument, None]:
         """Create embeddings for a list of documents.
 
+        Documents are packed into batches of at most `batch_size` documents and `max_batch_tokens` estimated tokens,
+        and at most `max_concurrency` batches are embedded at once.
+
         Args:
             documents: A sequence of Documents to be encoded.
 
         Returns:
-            A sequence of EmbeddedDocuments.
+            A sequence of EmbeddedDocuments, in the order their batches complete.
         """
         with tracer.start_as_current_span("embed documents"):
-            tasks = set()
-            for doc in documents:
-                tasks.add(asyncio.create_task(self._embed(doc, kwargs)))
-            while tasks:
-                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-                for task in done:
-                    yield task.result()
-
-    async def _embed(self, document, kwargs):
-        with tracer.start_as_current_span("embed text"):
-            text = await self.embed_text(document.page_content, **kwargs)
-            return EmbeddedDocument(
-                id=document.id,
-                embedding=text,
-                metadata=document.metadata,
-        )
+            semaphore = asyncio.Semaphore(self.spec.max_concurrency)
+            tasks = {
+                asyncio.create_task(self._embed_batch(batch, semaphore, kwargs)) for batch in self._batches(documents)
+            }
+            try:
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        for embedded in task.result():
+                            yield embedded
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def _batches(self, documents: Sequence[Document]) -> List[List[Document]]:
+        batches = []
+        batch, batch_tokens = [], 0
+        for doc in documents:
+            tokens = len(doc.page_content) / self.spec.chars_per_token
+            if batch and (len(batch) >= self.spec.batch_size or batch_tokens + tokens > self.spec.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(doc)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _embed_batch(self, batch: List[Document], semaphore: asyncio.Semaphore, kwargs) -> List[EmbeddedDocument]:
+        async with semaphore:
+            with tracer.start_as_current_span("embed batch"):
+                for attempt in range(self.spec.max_retries + 1):
+                    try:
+                        embeddings = await self.embed_texts([doc.page_content for doc in batch], **kwargs)
+                        break
+                    except Exception as e:
+                        if attempt == self.spec.max_retries or not _is_retryable(e):
+                            raise
+                        delay = 0.5 * 2**attempt
+                        logger.warning(f"Error embedding batch of {len(batch)} documents, retrying in {delay}s: {e}")
+                        await asyncio.sleep(delay)
+        return [
+            EmbeddedDocument(id=doc.id, embedding=embedding, metadata=doc.metadata)
+            for doc, embedding in zip(batch, embeddings)
+        ]
 
     async def start(self):
         pass
@@ -78,7 +145,7 @@ class OpenAIEmbeddingSpec(EmbeddingSpec):
 
 
 class OpenAIEmbedding(Embedding, Specable[OpenAIEmbeddingSpec]):
-    llm: Optional[AsyncOpenAI] = None
+    connection_handler: Optional[OpenAIConnectionHandler] = None
 
     def __init__(self, spec: OpenAIEmbeddingSpec):
         super().__init__(spec)
@@ -86,21 +153,38 @@ class OpenAIEmbedding(Embedding, Specable[OpenAIEmbeddingSpec]):
 
     async def start(self):
         await super().start()
-        conn_handler: OpenAIConnectionHandler = self.spec.connection_handler.instantiate()
-        self.llm = conn_handler.makeClient()
+        # requests go through the handler's pooled client, which is closed with the other clients when the machine stops
+        self.connection_handler = self.spec.connection_handler.instantiate()
 
     async def stop(self):
         await super().stop()
-        await self.llm.close()
-        self.llm = None
+        self.connection_handler = None
 
     async def embed_text(self, text: str, **kwargs: Any) -> Sequence[float]:
-        if not self.llm:
+        if not self.connection_handler:
             await self.start()
-        response = await self.llm.embeddings.create(
+        key = request_key(self.spec.connection_handler.model_dump(mode="json"), self.spec.model, text)
+        return await _embeddings_in_flight.do(key, lambda: self._create_embedding(text))
+
+    async def _create_embedding(self, text: str) -> Sequence[float]:
+        response = await self.connection_handler.client().embeddings.create(
             input=text,
             model=self.spec.model,  # Choose the model as per your requirement
         )
 
         embedding_vector = response.data[0].embedding
         return embedding_vector
+
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        if not self.connection_handler:
+            await self.start()
+        batches = [texts[i : i + self.spec.batch_size] for i in range(0, len(texts), self.spec.batch_size)]
+        embedded = await asyncio.gather(*[self._create_embeddings(batch) for batch in batches])
+        return [embedding for batch in embedded for embedding in batch]
+
+    async def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) == 1:
+            # a lone text is sent as a plain string, the request embed_text makes, so identical ones in flight share it
+            return [await self.embed_text(texts[0])]
+        response = await self.connection_handler.client().embeddings.create(input=texts, model=self.spec.model)
+        return [e.embedding for e in sorted(response.data, key=lambda e: e.index)]
@@ -0,0 +1,242 @@
+import asyncio
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, BinaryIO, List
+
+import bson
+from pydantic import BaseModel, Field
+from pymongo.errors import DuplicateKeyError
+
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.memory.local_symbolic_memory import LocalSymbolicMemory, IndexedCollection
+from eidolon_ai_sdk.system.reference_model import Specable
+from eidolon_ai_sdk.util.async_wrapper import make_async
+from eidolon_ai_sdk.util.str_utils import replace_env_var_in_string
+
+_SNAPSHOT_FILE = "snapshot.bson"
+_RECORD_HEADER = struct.Struct("<I")  # crc32 of the bson payload that follows
+
+
+class FileSymbolicMemoryConfig(BaseModel):
+    root_dir: str = Field("/tmp/eidolon/symbolic_memory", description="The directory to store the snapshot and log in.")
+    snapshot_interval: int = Field(
+        10_000, ge=1, description="The number of logged operations after which the log is compacted into a new snapshot."
+    )
+    fsync: bool = Field(
+        False,
+        description="If true, the log is fsynced after every write so it survives power loss, not just process crashes.",
+    )
+
+
+class _JournaledCollection(IndexedCollection):
+    def __init__(self, memory: "FileSymbolicMemory", name: str):
+        super().__init__()
+        self._memory = memory
+        self._name = name
+
+    # writes are logged before they are applied, so a write that cannot be encoded or logged never changes memory
+
+    def add(self, document: dict):
+        if document["_id"] in self:
+            raise DuplicateKeyError(f"Duplicate key error: _id {document['_id']} already exists.")
+        self._memory._log(dict(op="i", c=self._name, d=document))
+        super().add(document)
+
+    def update(self, document: dict, changes: dict):
+        _id = document["_id"]
+        if changes.get("_id", _id) != _id and changes["_id"] in self:
+            raise DuplicateKeyError(f"Duplicate key error: _id {changes['_id']} already exists.")
+        self._memory._log(dict(op="u", c=self._name, id=_id, d=changes))
+        super().update(document, changes)
+
+    def remove(self, document: dict):
+        self._memory._log(dict(op="d", c=self._name, id=document["_id"]))
+        super().remove(document)
+
+
+def _read_records(buffer) -> Iterator[tuple[int, dict]]:
+    """
+    Yields (end_offset, record) for each intact record in the buffer, stopping at the first torn or corrupt record.
+    """
+    offset = 0
+    size = len(buffer)
+    while offset + _RECORD_HEADER.size + 4 <= size:
+        (crc,) = _RECORD_HEADER.unpack_from(buffer, offset)
+        start = offset + _RECORD_HEADER.size
+        (length,) = struct.unpack_from("<i", buffer, start)
+        end = start + length
+        if length < 5 or end > size:
+            return
+        payload = buffer[start:end]
+        if zlib.crc32(payload) != crc:
+            return
+        yield end, bson.decode(payload)
+        offset = end
+
+
+def _write_record(f: BinaryIO, record: dict):
+    payload = bson.encode(record)
+    f.write(_RECORD_HEADER.pack(zlib.crc32(payload)) + payload)
+
+
+def _write_snapshot(path: Path, generation: int, documents: Dict[str, List[dict]]):
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        _write_record(f, dict(generation=generation))
+        for name, docs in documents.items():
+            for doc in docs:
+                _write_record(f, dict(c=name, d=doc))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class FileSymbolicMemory(LocalSymbolicMemory, Specable[FileSymbolicMemoryConfig]):
+    """
+    A SymbolicMemory implementation that persists collections to the local filesystem.
+
+    Queries are served from the same indexed in memory collections as LocalSymbolicMemory. Every write is appended to
+    an operation log, and once the log grows past `snapshot_interval` entries it is compacted into a snapshot in the
+    background. Startup mmaps the snapshot and replays only the logs written since, so a single node machine keeps its
+    processes, events, and conversation history across restarts.
+    """
+
+    root_dir: Path
+    db: Dict[str, IndexedCollection]
+
+    def __init__(self, spec: FileSymbolicMemoryConfig):
+        super().__init__(spec)
+        self.root_dir = Path(replace_env_var_in_string(spec.root_dir)).resolve()
+        self.db = {}
+        self._generation = 0
+        self._log_file: Optional[BinaryIO] = None
+        self._log_count = 0
+        self._compaction: Optional[asyncio.Task] = None
+
+    def _create_collection(self, symbol_collection: str) -> IndexedCollection:
+        return _JournaledCollection(self, symbol_collection)
+
+    def _log_path(self, generation: int) -> Path:
+        return self.root_dir / f"oplog-{generation}.bson"
+
+    def _log_generations(self) -> List[int]:
+        return sorted(int(path.stem.split("-")[1]) for path in self.root_dir.glob("oplog-*.bson"))
+
+    async def start(self):
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.db = {}
+        snapshot_generation = self._load_snapshot()
+        self._generation = snapshot_generation
+        self._log_count = 0
+        # logs older than the snapshot are already in it, newer ones were written while it was being compacted
+        for generation in self._log_generations():
+            if generation < snapshot_generation:
+                self._log_path(generation).unlink()
+            else:
+                self._replay_log(generation)
+                self._generation = generation
+        self._log_file = open(self._log_path(self._generation), "ab")
+
+    async def stop(self):
+        if self._compaction:
+            await self._compaction
+        if self._log_file:
+            self.compact()
+            self._log_file.close()
+            self._log_file = None
+        self.db = {}
+
+    def _load_snapshot(self) -> int:
+        path = self.root_dir / _SNAPSHOT_FILE
+        if not path.exists() or path.stat().st_size == 0:
+            return 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            records = _read_records(mm)
+            end, header = next(records, (0, {}))
+            if "generation" not in header:
+                raise ValueError(f"Symbolic memory snapshot {path} is corrupt, its header could not be read")
+            for end, record in records:
+                self._collection(record["c"]).add(record["d"])
+            if end < len(mm):
+                raise ValueError(f"Symbolic memory snapshot {path} is corrupt at offset {end}")
+            return header["generation"]
+
+    def _replay_log(self, generation: int):
+        path = self._log_path(generation)
+        with open(path, "rb") as f:
+            buffer = f.read()
+        valid_to = 0
+        for valid_to, record in _read_records(buffer):
+            self._apply(record)
+            self._log_count += 1
+        if valid_to < len(buffer):
+            logger.warning(f"Discarding {len(buffer) - valid_to} bytes of incomplete symbolic memory log at {path}")
+            with open(path, "r+b") as f:
+                f.truncate(valid_to)
+
+    def _apply(self, record: dict):
+        collection = self._collection(record["c"])
+        if record["op"] == "i":
+            collection.add(record["d"])
+        else:
+            doc = collection.get(record["id"])
+            if doc is None:
+                return
+            if record["op"] == "u":
+                collection.update(doc, record["d"])
+            else:
+                collection.remove(doc)
+
+    def _log(self, record: dict[str, Any]):
+        if not self._log_file:
+            return
+        _write_record(self._log_file, record)
+        self._log_file.flush()
+        if self.spec.fsync:
+            os.fsync(self._log_file.fileno())
+        self._log_count += 1
+        if self._log_count >= self.spec.snapshot_interval and not self._compaction:
+            self._compaction = asyncio.get_running_loop().create_task(self._compact_in_background())
+
+    async def _compact_in_background(self):
+        try:
+            generation, documents = self._rotate_log()
+            await make_async(self._write_snapshot)(generation, documents)
+        except Exception:
+            logger.exception("Failed to compact symbolic memory log, it will be retried after the next write")
+        finally:
+            self._compaction = None
+
+    def _rotate_log(self) -> tuple[int, Dict[str, List[dict]]]:
+        """
+        Starts the log of the next generation and returns the documents the snapshot of that generation must hold.
+
+        Writes replace top level values rather than mutating them, so shallow copies stay a consistent view of the
+        collections while later writes go to the new log.
+        """
+        documents = {name: [dict(doc) for doc in collection] for name, collection in self.db.items()}
+        if self._log_file:
+            self._log_file.close()
+        self._generation += 1
+        self._log_file = open(self._log_path(self._generation), "ab")
+        self._log_count = 0
+        return self._generation, documents
+
+    def _write_snapshot(self, generation: int, documents: Dict[str, List[dict]]):
+        _write_snapshot(self.root_dir / _SNAPSHOT_FILE, generation, documents)
+        for older in self._log_generations():
+            if older < generation:
+                self._log_path(older).unlink(missing_ok=True)
+
+    def compact(self):
+        """
+        Writes the current state of every collection to a new snapshot and starts a fresh log.
+
+        The snapshot is written to a temporary file and atomically renamed into place. The snapshot records its
+        generation, and only the logs of that generation or later are replayed on startup, so a crash at any point
+        leaves either the old snapshot with every log since or the new snapshot (with stale logs that are discarded).
+        """
+        self._write_snapshot(*self._rotate_log())
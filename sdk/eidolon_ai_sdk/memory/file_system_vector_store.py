@@ -1,3 +1,4 @@
+import asyncio
 from abc import abstractmethod
 from typing import List, Dict, Optional, Sequence, Any, Iterable
 
@@ -18,12 +19,20 @@ class FileSystemVectorStoreSpec(BaseModel):
         default="vector_memory",
         description="The root directory where the vector memory will store documents.",
     )
+    inline_page_content: bool = Field(
+        default=False,
+        description="Store the text of each document alongside its vector instead of as a file in file memory, so "
+        "results are read back in one call. Documents already stored as files are still read from file memory until "
+        "they are moved inline with migrate_page_content.",
+    )
 
 
 class FileSystemVectorStore(VectorStore, Specable[FileSystemVectorStoreSpec]):
     def __init__(self, spec: FileSystemVectorStoreSpec):
         super().__init__(spec)
         self.spec = spec
+        if spec.inline_page_content and type(self).set_contents is FileSystemVectorStore.set_contents:
+            raise ValueError(f"{self.__class__.__name__} can not store page content inline")
 
     async def start(self):
         await AgentOS.file_memory.mkdir(self.spec.root_document_directory, exist_ok=True)
@@ -43,6 +52,16 @@ class FileSystemVectorStore(VectorStore, Specable[FileSystemVectorStoreSpec]):
     async def get_metadata(self, collection: str, doc_ids: List[str]):
         pass
 
+    async def get_contents(self, collection: str, doc_ids: List[str]) -> List[Optional[str]]:
+        """
+        The text stored alongside the vectors of the documents, None for documents without any. Stores that can keep
+        text inline should override this and `set_contents`, and accept a `documents` list in `add_embedding`.
+        """
+        return [None] * len(doc_ids)
+
+    async def set_contents(self, collection: str, doc_ids: List[str], contents: List[str]):
+        raise NotImplementedError(f"{self.__class__.__name__} can not store page content inline")
+
     @abstractmethod
     async def query_embedding(
         self,
@@ -54,23 +73,95 @@ class FileSystemVectorStore(VectorStore, Specable[FileSystemVectorStoreSpec]):
     ) -> List[QueryItem]:
         pass
 
+    async def query_embeddings(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[QueryItem]]:
+        return list(
+            await asyncio.gather(
+                *[self.query_embedding(collection, q, num_results, metadata_where, include_embeddings) for q in queries]
+            )
+        )
+
+    def _path(self, collection: str, doc_id: str) -> str:
+        return self.spec.root_document_directory + "/" + collection + "/" + doc_id
+
     async def add(self, collection: str, docs: Sequence[Document]):
-        await AgentOS.file_memory.mkdir(self.spec.root_document_directory + "/" + collection, exist_ok=True)
-        embeddedDocs = [EmbeddedDocument(id=doc.id, embedding=doc.embedding, metadata=doc.metadata) for doc in docs if doc.embedding]
+        embeddedDocs = [
+            EmbeddedDocument(id=doc.id, embedding=doc.embedding, metadata=doc.metadata) for doc in docs if doc.embedding
+        ]
         async for embeddedDoc in AgentOS.similarity_memory.embed([d for d in docs if not d.embedding]):
             embeddedDocs.append(embeddedDoc)
+        if self.spec.inline_page_content:
+            content = {doc.id: doc.page_content for doc in docs}
+            await self.add_embedding(collection, embeddedDocs, documents=[content[d.id] for d in embeddedDocs])
+            return
+        await AgentOS.file_memory.mkdir(self.spec.root_document_directory + "/" + collection, exist_ok=True)
         await self.add_embedding(collection, embeddedDocs)
         with tracer.start_as_current_span("add documents"):
-            for doc in docs:
-                await AgentOS.file_memory.write_file(
-                    self.spec.root_document_directory + "/" + collection + "/" + doc.id,
-                    doc.page_content.encode(),
-                )
+            await asyncio.gather(
+                *[
+                    AgentOS.file_memory.write_file(self._path(collection, doc.id), doc.page_content.encode())
+                    for doc in docs
+                ]
+            )
 
     async def delete(self, collection: str, doc_ids: List[str]):
+        file_ids = doc_ids
+        if self.spec.inline_page_content:
+            contents = await self.get_contents(collection, doc_ids)
+            file_ids = [doc_id for doc_id, content in zip(doc_ids, contents) if content is None]
         await self.delete_embedding(collection, doc_ids)
-        for doc_id in doc_ids:
-            await AgentOS.file_memory.delete_file(self.spec.root_document_directory + "/" + collection + "/" + doc_id)
+        await asyncio.gather(*[AgentOS.file_memory.delete_file(self._path(collection, doc_id)) for doc_id in file_ids])
+
+    async def get_page_contents(self, collection: str, doc_ids: List[str]) -> List[str]:
+        """
+        The text of several documents. Inline text is fetched in one call and text stored as files is read
+        concurrently. Reading never moves text inline, that is left to `migrate_page_content`.
+        """
+        contents = (
+            await self.get_contents(collection, doc_ids) if self.spec.inline_page_content else [None] * len(doc_ids)
+        )
+        missing = [i for i, content in enumerate(contents) if content is None]
+        if missing:
+            files = await self._read_files(collection, [doc_ids[i] for i in missing])
+            for i, content in zip(missing, files):
+                contents[i] = content
+        return contents
+
+    async def _read_files(self, collection: str, doc_ids: List[str]) -> List[str]:
+        files = await asyncio.gather(
+            *[AgentOS.file_memory.read_file(self._path(collection, doc_id)) for doc_id in doc_ids],
+            return_exceptions=self.spec.inline_page_content,
+        )
+        failed = [i for i, data in enumerate(files) if isinstance(data, BaseException)]
+        if failed:
+            # the files may have been moved inline by a concurrent migrate_page_content since the contents were read
+            inline = await self.get_contents(collection, [doc_ids[i] for i in failed])
+            for i, content in zip(failed, inline):
+                if content is None:
+                    raise files[i]
+                files[i] = content.encode()
+        return [data.decode() for data in files]
+
+    async def migrate_page_content(self, collection: str, doc_ids: List[str]):
+        """
+        Moves the text of documents stored as files inline. Documents that are already inline are left as they are.
+        """
+        contents = await self.get_contents(collection, doc_ids)
+        missing = [doc_id for doc_id, content in zip(doc_ids, contents) if content is None]
+        await self._move_inline(collection, missing, await self._read_files(collection, missing))
+
+    async def _move_inline(self, collection: str, doc_ids: List[str], contents: List[str]):
+        if doc_ids:
+            await self.set_contents(collection, doc_ids, contents)
+            await asyncio.gather(
+                *[AgentOS.file_memory.delete_file(self._path(collection, doc_id)) for doc_id in doc_ids]
+            )
 
     async def query(
         self,
@@ -81,20 +172,14 @@ class FileSystemVectorStore(VectorStore, Specable[FileSystemVectorStoreSpec]):
     ) -> List[Document]:
         text = await AgentOS.similarity_memory.embed_text(query) if isinstance(query, str) else query
         results = await self.query_embedding(collection, text, num_results, metadata_where, False)
-        returnDocuments = []
-        for result in results:
-            returnDocuments.append(
-                Document(
-                    id=result.id,
-                    metadata=result.metadata,
-                    page_content=await self.get_page_content(collection, result.id),
-                    score=result.score,
-                )
-            )
-        return returnDocuments
+        contents = await self.get_page_contents(collection, [result.id for result in results])
+        return [
+            Document(id=result.id, metadata=result.metadata, page_content=content, score=result.score)
+            for result, content in zip(results, contents)
+        ]
 
     async def get_page_content(self, collection: str, doc_id: str) -> str:
-        return (await AgentOS.file_memory.read_file(self.spec.root_document_directory + "/" + collection + "/" + doc_id)).decode()
+        return (await self.get_page_contents(collection, [doc_id]))[0]
 
     async def raw_query(
         self,
@@ -106,14 +191,18 @@ class FileSystemVectorStore(VectorStore, Specable[FileSystemVectorStoreSpec]):
     ) -> List[QueryItem]:
         return await self.query_embedding(collection, query, num_results, metadata_where, include_embeddings)
 
+    async def raw_query_many(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[QueryItem]]:
+        return await self.query_embeddings(collection, queries, num_results, metadata_where, include_embeddings)
+
     async def get_docs(self, collection: str, doc_ids: List[str]) -> Iterable[Document]:
         metadatas = await self.get_metadata(collection, doc_ids)
-        for i, doc_id in enumerate(doc_ids):
-            content = await AgentOS.file_memory.read_file(
-                self.spec.root_document_directory + "/" + collection + "/" + doc_id
-            )
-            yield Document(
-                id=doc_id,
-                metadata=metadatas[i],
-                page_content=content.decode(),
-            )
+        contents = await self.get_page_contents(collection, doc_ids)
+        for doc_id, metadata, content in zip(doc_ids, metadatas, contents):
+            yield Document(id=doc_id, metadata=metadata, page_content=content)
@@ -0,0 +1,41 @@
+from typing import List, Tuple, Dict, Union
+
+from pydantic import BaseModel, Field
+
+
+class IndexSpec(BaseModel):
+    """
+    A declarative description of an index a symbolic memory collection should have.
+    """
+
+    collection: str = Field(description="The collection the index belongs to.")
+    keys: List[Tuple[str, int]] = Field(description="The indexed fields and their directions (1 or -1), in order.")
+    unique: bool = Field(False, description="Whether the index enforces uniqueness.")
+
+    @property
+    def name(self) -> str:
+        # matches mongo's default naming so indexes created by hand are recognized
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+_registry: Dict[str, Dict[str, IndexSpec]] = {}
+
+
+def register_index(collection: str, *keys: Union[str, Tuple[str, int]], unique: bool = False) -> IndexSpec:
+    """
+    Registers an index for a collection. Keys are either field names (ascending) or (field, direction) tuples.
+
+    Components that own a collection register the indexes their queries rely on when their module is imported, and
+    symbolic memory implementations provision the registered indexes when they start.
+    """
+    spec = IndexSpec(
+        collection=collection,
+        keys=[(key, 1) if isinstance(key, str) else (key[0], key[1]) for key in keys],
+        unique=unique,
+    )
+    _registry.setdefault(collection, {})[spec.name] = spec
+    return spec
+
+
+def registered_indexes() -> List[IndexSpec]:
+    return [spec for specs in _registry.values() for spec in specs.values()]
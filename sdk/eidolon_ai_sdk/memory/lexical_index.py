@@ -0,0 +1,363 @@
+import asyncio
+import io
+import json
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.document import Document
+from eidolon_ai_sdk.system.reference_model import Specable
+from eidolon_ai_sdk.util.async_wrapper import make_async
+
+_WORD = re.compile(r"\w+")
+_WORD_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower cased words, keeping identifiers like `get_docs` or `DocumentProcessor` whole and also adding their parts so
+    they match questions that spell them out.
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.append(word.lower())
+        parts = _WORD_PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def encode_postings(doc_nums: np.ndarray, bounds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Varint encodes the gaps between the sorted doc numbers of each posting list, where list i is
+    doc_nums[bounds[i]:bounds[i + 1]]. Returns the encoded bytes and the byte offset each list starts at.
+    """
+    gaps = np.diff(doc_nums, prepend=0).astype(np.uint32)
+    starts = bounds[:-1][bounds[:-1] < bounds[1:]]
+    gaps[starts] = doc_nums[starts]
+    sizes = 1 + sum((gaps >= 1 << (7 * k)).astype(np.int64) for k in range(1, 5))
+    positions = np.concatenate([[0], np.cumsum(sizes)])
+    data = np.zeros(positions[-1], dtype=np.uint8)
+    for k in range(5):
+        has = sizes > k
+        more = (sizes > k + 1).astype(np.uint32) << 7
+        data[positions[:-1][has] + k] = ((gaps[has] >> (7 * k)) & 0x7F) | more[has]
+    return data, positions[bounds]
+
+
+def decode_postings(data: np.ndarray) -> np.ndarray:
+    if len(data) == 0 or data.max() < 0x80:
+        return np.cumsum(data, dtype=np.int64)
+    ends = data < 0x80
+    starts = np.flatnonzero(np.concatenate([[True], ends[:-1]]))
+    value_of = np.cumsum(ends) - ends
+    shifts = ((np.arange(len(data)) - starts[value_of]) * 7).astype(np.uint32)
+    gaps = np.bitwise_or.reduceat((data & 0x7F).astype(np.uint32) << shifts, starts)
+    return np.cumsum(gaps, dtype=np.int64)
+
+
+class LexicalIndexSpec(BaseModel):
+    directory: str = Field(default="lexical_index", description="The directory in file memory the index is kept in.")
+    k1: float = Field(default=1.2, ge=0, description="The BM25 term frequency saturation.")
+    b: float = Field(default=0.75, ge=0, le=1, description="The BM25 document length normalization.")
+    compact_after: int = Field(
+        default=1_000, ge=1, description="The number of logged writes after which the index is rewritten as one segment."
+    )
+    cached_terms: int = Field(default=4_096, ge=0, description="The number of decoded posting lists kept in memory.")
+    refresh_interval: float = Field(
+        default=5.0, ge=0, description="Seconds between checks for writes other processes made to the index."
+    )
+
+
+class _Collection:
+    """
+    The inverted index of one collection.
+
+    Postings written before the last compaction are kept varint compressed and decoded (through a small cache) when a
+    query needs them. Writes since then are held in memory as plain lists and logged to file memory, one file per
+    write, until the collection is compacted into a new segment.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = asyncio.Lock()
+        self.loaded = False
+        self.seq = 0
+        self.segment_seq = 0
+        self.logged = 0
+        self.refreshed = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.doc_ids: List[str] = []
+        self.num_of: Dict[str, int] = {}
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.live = 0
+        self.live_len = 0
+        self.terms: Dict[str, int] = {}
+        self.postings = np.zeros(0, dtype=np.uint8)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.counts = np.zeros(1, dtype=np.int64)
+        self.tfs = np.zeros(0, dtype=np.uint8)
+        self.delta: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.decoded: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    def _grow(self, size: int):
+        if size > len(self.alive):
+            capacity = max(size, 2 * len(self.alive), 1024)
+            self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+            self.doc_len = np.concatenate([self.doc_len, np.zeros(capacity - len(self.doc_len), dtype=np.int32)])
+
+    def add(self, entries: List[Tuple[str, Dict[str, int]]]):
+        self.remove([doc_id for doc_id, _ in entries])
+        self._grow(len(self.doc_ids) + len(entries))
+        for doc_id, term_counts in entries:
+            num = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.num_of[doc_id] = num
+            length = sum(term_counts.values())
+            self.doc_len[num] = length
+            self.alive[num] = True
+            self.live += 1
+            self.live_len += length
+            for term, count in term_counts.items():
+                nums, tfs = self.delta.setdefault(term, ([], []))
+                nums.append(num)
+                tfs.append(min(count, 255))
+
+    def remove(self, doc_ids: Iterable[str]):
+        for doc_id in doc_ids:
+            num = self.num_of.pop(doc_id, None)
+            if num is not None:
+                self.alive[num] = False
+                self.live -= 1
+                self.live_len -= int(self.doc_len[num])
+
+    def apply(self, entry: dict):
+        if "add" in entry:
+            self.add([(doc_id, term_counts) for doc_id, term_counts in entry["add"]])
+        if "remove" in entry:
+            self.remove(entry["remove"])
+
+    def _postings(self, term: str, cache_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        nums, tfs = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        i = self.terms.get(term)
+        if i is not None:
+            nums = self.decoded.get(term)
+            if nums is None:
+                nums = decode_postings(self.postings[self.offsets[i] : self.offsets[i + 1]])
+                if cache_size:
+                    self.decoded[term] = nums
+                    if len(self.decoded) > cache_size:
+                        self.decoded.popitem(last=False)
+            else:
+                self.decoded.move_to_end(term)
+            tfs = self.tfs[self.counts[i] : self.counts[i + 1]]
+        if term in self.delta:
+            delta_nums, delta_tfs = self.delta[term]
+            nums = np.concatenate([nums, np.asarray(delta_nums, dtype=np.int64)])
+            tfs = np.concatenate([tfs, np.asarray(delta_tfs, dtype=np.uint8)])
+        return nums, tfs
+
+    def search(self, query: str, num_results: int, spec: LexicalIndexSpec) -> List[Tuple[str, float]]:
+        if not self.live or num_results < 1:
+            return []
+        average_len = self.live_len / self.live
+        all_nums, all_scores = [], []
+        for term in set(tokenize(query)):
+            nums, tfs = self._postings(term, spec.cached_terms)
+            if len(nums) == 0:
+                continue
+            # document frequencies still count removed chunks until the next compaction
+            idf = math.log(1 + (self.live - len(nums) + 0.5) / (len(nums) + 0.5))
+            tfs = tfs.astype(np.float32)
+            norm = spec.k1 * (1 - spec.b + spec.b * self.doc_len[nums] / average_len)
+            all_nums.append(nums)
+            all_scores.append(idf * tfs * (spec.k1 + 1) / (tfs + norm))
+        if not all_nums:
+            return []
+        if len(all_nums) == 1:
+            nums, scores = all_nums[0], all_scores[0]
+        else:
+            nums, inverse = np.unique(np.concatenate(all_nums), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        keep = self.alive[nums]
+        nums, scores = nums[keep], scores[keep]
+        if len(nums) > num_results:
+            best = np.argpartition(-scores, num_results - 1)[:num_results]
+            nums, scores = nums[best], scores[best]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.doc_ids[num], float(score)) for num, score in zip(nums[order], scores[order])]
+
+    def snapshot(self) -> bytes:
+        """
+        The live documents and all postings merged into one compressed segment, with documents renumbered densely.
+        """
+        live = np.flatnonzero(self.alive[: len(self.doc_ids)])
+        renumber = np.full(len(self.doc_ids), -1, dtype=np.int64)
+        renumber[live] = np.arange(len(live))
+        terms, nums, tfs = [], [], []
+        for term in sorted(self.terms.keys() | self.delta.keys()):
+            term_nums, term_tfs = self._postings(term, 0)
+            term_nums = renumber[term_nums]
+            keep = term_nums >= 0
+            if keep.any():
+                terms.append(term)
+                nums.append(term_nums[keep])
+                tfs.append(term_tfs[keep])
+        counts = np.concatenate([[0], np.cumsum([len(n) for n in nums], dtype=np.int64)])
+        postings, offsets = encode_postings(np.concatenate(nums) if nums else np.zeros(0, np.int64), counts)
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            terms=np.frombuffer("\n".join(terms).encode(), dtype=np.uint8),
+            doc_ids=np.frombuffer(json.dumps([self.doc_ids[num] for num in live]).encode(), dtype=np.uint8),
+            doc_len=self.doc_len[live],
+            postings=postings,
+            offsets=offsets,
+            counts=counts,
+            tfs=np.concatenate(tfs) if tfs else np.zeros(0, np.uint8),
+        )
+        return buffer.getvalue()
+
+    def restore(self, data: bytes):
+        self._reset()
+        with np.load(io.BytesIO(data)) as segment:
+            terms = segment["terms"].tobytes().decode()
+            self.terms = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+            self.doc_ids = json.loads(segment["doc_ids"].tobytes())
+            self.num_of = {doc_id: num for num, doc_id in enumerate(self.doc_ids)}
+            self.doc_len = segment["doc_len"].astype(np.int32)
+            self.alive = np.ones(len(self.doc_ids), dtype=bool)
+            self.live = len(self.doc_ids)
+            self.live_len = int(self.doc_len.sum())
+            self.postings = segment["postings"]
+            self.offsets = segment["offsets"]
+            self.counts = segment["counts"]
+            self.tfs = segment["tfs"]
+
+
+class LexicalIndex(Specable[LexicalIndexSpec]):
+    """
+    An in process BM25 index of document chunks, kept in file memory.
+
+    Finds chunks by the exact words they contain, such as identifiers, SKUs, or error codes that embeddings blur, and
+    answers without an embedding call. Collections are shared by every LexicalIndex of the machine using the same
+    directory, so the index a DocumentProcessor maintains is the one a HybridRetriever searches.
+
+    Processes sharing a file memory pick up each other's writes every `refresh_interval` seconds and before writing.
+    Writes are not atomic across processes though, so a collection should only be written by one process at a time.
+    """
+
+    _collections: Dict[Tuple[str, str], _Collection] = {}
+
+    @classmethod
+    def close_all(cls):
+        """
+        Forgets every loaded collection, so the next machine to start reads them from its own file memory.
+        """
+        cls._collections.clear()
+
+    def _collection(self, name: str) -> _Collection:
+        key = (self.spec.directory, name)
+        if key not in LexicalIndex._collections:
+            LexicalIndex._collections[key] = _Collection(f"{self.spec.directory}/{name}")
+        return LexicalIndex._collections[key]
+
+    def _stale(self, collection: _Collection) -> bool:
+        return not collection.loaded or time.monotonic() - collection.refreshed >= self.spec.refresh_interval
+
+    async def _loaded(self, name: str) -> _Collection:
+        collection = self._collection(name)
+        if self._stale(collection):
+            async with collection.lock:
+                if self._stale(collection):
+                    await self._refresh(collection)
+        return collection
+
+    async def _refresh(self, collection: _Collection):
+        """
+        Catches the collection up with the segment and logs in file memory, including those other processes wrote.
+        """
+        manifest_path = f"{collection.path}/manifest.json"
+        if await AgentOS.file_memory.exists(manifest_path):
+            manifest = json.loads(await AgentOS.file_memory.read_file(manifest_path))
+            if manifest["seq"] > collection.segment_seq:
+                collection.restore(await AgentOS.file_memory.read_file(f"{collection.path}/{manifest['segment']}"))
+                collection.segment_seq = collection.seq = manifest["seq"]
+                collection.logged = 0
+        logs = []
+        async for file in AgentOS.file_memory.glob(f"{collection.path}/log-*.json"):
+            seq = int(file.file_path.rsplit("log-", 1)[1].removesuffix(".json"))
+            if seq > collection.seq:
+                logs.append((seq, file.file_path))
+        for seq, path in sorted(logs):
+            collection.apply(json.loads(await AgentOS.file_memory.read_file(path)))
+            collection.seq = seq
+        collection.logged += len(logs)
+        collection.loaded = True
+        collection.refreshed = time.monotonic()
+
+    def _log_path(self, collection: _Collection) -> str:
+        return f"{collection.path}/log-{collection.seq + 1:012d}.json"
+
+    async def _write(self, name: str, entry: dict):
+        collection = await self._loaded(name)
+        async with collection.lock:
+            while await AgentOS.file_memory.exists(self._log_path(collection)):
+                # another process wrote since this one last looked, apply its writes so they are not overwritten
+                await self._refresh(collection)
+            collection.apply(entry)
+            await AgentOS.file_memory.mkdir(collection.path, exist_ok=True)
+            await AgentOS.file_memory.write_file(self._log_path(collection), json.dumps(entry).encode())
+            collection.seq += 1
+            collection.logged += 1
+            if collection.logged >= self.spec.compact_after:
+                await self._compact(collection)
+
+    async def add(self, collection: str, docs: Iterable[Document]):
+        entries = [[doc.id, dict(Counter(tokenize(doc.page_content)))] for doc in docs]
+        if entries:
+            await self._write(collection, dict(add=entries))
+
+    async def delete(self, collection: str, doc_ids: List[str]):
+        if doc_ids:
+            await self._write(collection, dict(remove=list(doc_ids)))
+
+    async def search(self, collection: str, query: str, num_results: int) -> List[Tuple[str, float]]:
+        """
+        The ids and BM25 scores (higher is better) of the chunks best matching the query.
+        """
+        return (await self._loaded(collection)).search(query, num_results, self.spec)
+
+    async def search_many(self, collection: str, queries: List[str], num_results: int) -> List[List[Tuple[str, float]]]:
+        loaded = await self._loaded(collection)
+        return [loaded.search(query, num_results, self.spec) for query in queries]
+
+    async def compact(self, collection: str):
+        loaded = await self._loaded(collection)
+        async with loaded.lock:
+            await self._compact(loaded)
+
+    async def _compact(self, collection: _Collection):
+        previous = collection.segment_seq
+        data = await make_async(collection.snapshot)()
+        segment = f"segment-{collection.seq:012d}.npz"
+        await AgentOS.file_memory.mkdir(collection.path, exist_ok=True)
+        await AgentOS.file_memory.write_file(f"{collection.path}/{segment}", data)
+        manifest = json.dumps(dict(seq=collection.seq, segment=segment)).encode()
+        await AgentOS.file_memory.write_file(f"{collection.path}/manifest.json", manifest)
+        collection.segment_seq = collection.seq
+        collection.restore(data)
+        collection.logged = 0
+        stale = [f"{collection.path}/log-{seq:012d}.json" for seq in range(previous + 1, collection.seq + 1)]
+        if previous:
+            stale.append(f"{collection.path}/segment-{previous:012d}.npz")
+        await asyncio.gather(*[AgentOS.file_memory.delete_file(path) for path in stale])
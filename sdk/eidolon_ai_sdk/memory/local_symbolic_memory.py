@@ -1,5 +1,6 @@
 from copy import deepcopy
-from typing import Any, Union, List, Dict, AsyncIterable, Optional
+from functools import cmp_to_key
+from typing import Any, Union, List, Dict, AsyncIterable, Optional, Iterable, Iterator, Hashable
 
 from bson import ObjectId
 from pymongo.errors import DuplicateKeyError
@@ -7,8 +8,185 @@ from pymongo.errors import DuplicateKeyError
 from eidolon_ai_sdk.memory.semantic_memory import SymbolicMemoryBase
 
 
+def _indexable(value: Any) -> bool:
+    return not isinstance(value, dict) and isinstance(value, Hashable)
+
+
+def _is_operator_expression(value: Any) -> bool:
+    return isinstance(value, dict) and bool(value) and all(key.startswith("$") for key in value)
+
+
+def _matches_operators(value: Any, expression: dict) -> bool:
+    for op, operand in expression.items():
+        if op == "$in":
+            if value not in operand:
+                return False
+        elif op == "$ne":
+            if value == operand:
+                return False
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None or operand is None:
+                return False
+            rtn = _compare_values(value, operand)
+            if (
+                (op == "$gt" and rtn <= 0)
+                or (op == "$gte" and rtn < 0)
+                or (op == "$lt" and rtn >= 0)
+                or (op == "$lte" and rtn > 0)
+            ):
+                return False
+        else:
+            raise ValueError(f"Unsupported query operator {op}")
+    return True
+
+
+def _compare_values(a: Any, b: Any) -> int:
+    # None (or a missing field) sorts before everything else, matching mongo's ordering of null
+    if a is None or b is None:
+        return (a is not None) - (b is not None)
+    return (a > b) - (a < b)
+
+
+def _sort_key(sort: dict):
+    fields = list(sort.items())
+
+    def compare(a: dict, b: dict) -> int:
+        for field, direction in fields:
+            rtn = _compare_values(a.get(field), b.get(field))
+            if rtn:
+                return -rtn if direction == -1 else rtn
+        return 0
+
+    return cmp_to_key(compare)
+
+
+class IndexedCollection:
+    """
+    An in memory collection of documents keyed by `_id`.
+
+    Documents are kept in insertion order. Secondary hash indexes are built lazily the first time a top level key is
+    used in an equality query and are maintained on every write afterward, so repeated lookups on keys like
+    `process_id` or `__agent` only touch the matching documents instead of scanning the whole collection.
+    """
+
+    def __init__(self, documents: Iterable[dict] = ()):
+        self._docs: Dict[Any, dict] = {}
+        self._seq: Dict[Any, int] = {}
+        self._next_seq = 0
+        self._indexes: Dict[str, Dict[Any, Dict[Any, None]]] = {}
+        for document in documents:
+            self.add(document)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._docs.values())
+
+    def __getitem__(self, item: int) -> dict:
+        if item < 0:
+            item += len(self._docs)
+        for i, doc in enumerate(self._docs.values()):
+            if i == item:
+                return doc
+        raise IndexError("collection index out of range")
+
+    def __contains__(self, _id) -> bool:
+        return _id in self._docs
+
+    @property
+    def indexed_keys(self) -> List[str]:
+        return list(self._indexes.keys())
+
+    def get(self, _id) -> Optional[dict]:
+        return self._docs.get(_id)
+
+    def add(self, document: dict):
+        _id = document["_id"]
+        if _id in self._docs:
+            raise DuplicateKeyError(f"Duplicate key error: _id {_id} already exists.")
+        self._docs[_id] = document
+        self._seq[_id] = self._next_seq
+        self._next_seq += 1
+        self._index_doc(document)
+
+    def update(self, document: dict, changes: dict):
+        old_id = document["_id"]
+        new_id = changes.get("_id", old_id)
+        if new_id != old_id and new_id in self._docs:
+            raise DuplicateKeyError(f"Duplicate key error: _id {new_id} already exists.")
+        self._unindex_doc(document)
+        document.update(changes)
+        if new_id != old_id:
+            del self._docs[old_id]
+            self._docs[new_id] = document
+            self._seq[new_id] = self._seq.pop(old_id)
+        self._index_doc(document)
+
+    def remove(self, document: dict):
+        self._unindex_doc(document)
+        del self._docs[document["_id"]]
+        del self._seq[document["_id"]]
+
+    def candidates(self, query: dict) -> Iterable[dict]:
+        """
+        Returns a superset of the documents matching the equality portion of `query`, in insertion order.
+        The caller is still responsible for checking the full query against each candidate.
+        """
+        best = None
+        for key, value in query.items():
+            if isinstance(value, dict) and set(value) == {"$in"} and all(_indexable(v) for v in value["$in"]):
+                values = value["$in"]
+            elif _indexable(value):
+                values = [value]
+            else:
+                continue
+            if key == "_id":
+                return [self._docs[v] for v in sorted(set(values) & self._docs.keys(), key=self._seq.__getitem__)]
+            if "." in key:
+                continue
+            index = self._index(key)
+            if len(values) == 1:
+                bucket = index.get(values[0], {})
+            else:
+                bucket = {_id: None for v in values for _id in index.get(v, {})}
+            if best is None or len(bucket) < len(best):
+                best = bucket
+                if not best:
+                    return []
+        if best is None:
+            return list(self._docs.values())
+        return [self._docs[_id] for _id in sorted(best, key=self._seq.__getitem__)]
+
+    def _index(self, key: str) -> Dict[Any, Dict[Any, None]]:
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = {}
+            for doc in self._docs.values():
+                value = doc.get(key)
+                if key in doc and _indexable(value):
+                    index.setdefault(value, {})[doc["_id"]] = None
+        return index
+
+    def _index_doc(self, doc: dict):
+        for key, index in self._indexes.items():
+            value = doc.get(key)
+            if key in doc and _indexable(value):
+                index.setdefault(value, {})[doc["_id"]] = None
+
+    def _unindex_doc(self, doc: dict):
+        for key, index in self._indexes.items():
+            value = doc.get(key)
+            if key in doc and _indexable(value):
+                bucket = index.get(value)
+                if bucket is not None:
+                    bucket.pop(doc["_id"], None)
+                    if not bucket:
+                        del index[value]
+
+
 class LocalSymbolicMemory(SymbolicMemoryBase):
-    db = {}
+    db: Dict[str, IndexedCollection] = {}
 
     async def start(self):
         LocalSymbolicMemory.db = {}
@@ -16,13 +194,33 @@ class LocalSymbolicMemory(SymbolicMemoryBase):
     async def stop(self):
         LocalSymbolicMemory.db = {}
 
+    def _collection(self, symbol_collection: str) -> IndexedCollection:
+        if symbol_collection not in self.db:
+            self.db[symbol_collection] = self._create_collection(symbol_collection)
+        return self.db[symbol_collection]
+
+    def _create_collection(self, symbol_collection: str) -> IndexedCollection:
+        return IndexedCollection()
+
+    @staticmethod
+    def _matches_exact(doc: dict, query: dict) -> bool:
+        return all(
+            _matches_operators(doc.get(key), value) if _is_operator_expression(value) else (key, value) in doc.items()
+            for key, value in query.items()
+        )
+
     async def count(self, symbol_collection: str, query: dict[str, Any]) -> int:
         if symbol_collection not in self.db:
             return 0
-        return sum(1 for doc in self.db[symbol_collection] if all(item in doc.items() for item in query.items()))
+        collection = self.db[symbol_collection]
+        return sum(1 for doc in collection.candidates(query) if self._matches_exact(doc, query))
 
     def _matches_query(self, doc: dict, query: dict) -> bool:
         for key, value in query.items():
+            if _is_operator_expression(value):
+                if not _matches_operators(doc.get(key), value):
+                    return False
+                continue
             if key not in doc:
                 return False
             if isinstance(value, dict):
@@ -32,6 +230,11 @@ class LocalSymbolicMemory(SymbolicMemoryBase):
                 return False
         return True
 
+    def _matching(self, symbol_collection: str, query: dict) -> List[dict]:
+        if symbol_collection not in self.db:
+            return []
+        return [doc for doc in self.db[symbol_collection].candidates(query) if self._matches_query(doc, query)]
+
     @staticmethod
     def _apply_projection(doc: dict, projection: dict) -> dict:
         rtn = {field: doc[field] for field in doc if field in projection and projection[field] == 1}
@@ -47,12 +250,9 @@ class LocalSymbolicMemory(SymbolicMemoryBase):
         sort: dict = None,
         skip: int = None,
     ) -> AsyncIterable[dict[str, Any]]:
-        if symbol_collection not in self.db:
-            return
-        matching_docs = [doc for doc in self.db[symbol_collection] if self._matches_query(doc, query)]
+        matching_docs = self._matching(symbol_collection, query)
         if sort:
-            for field, direction in reversed(sort.items()):
-                matching_docs = sorted(matching_docs, key=lambda doc: doc.get(field, None), reverse=direction == -1)
+            matching_docs.sort(key=_sort_key(sort))
         if skip:
             matching_docs = matching_docs[skip:]
         for doc in matching_docs:
@@ -61,52 +261,50 @@ class LocalSymbolicMemory(SymbolicMemoryBase):
     async def find_one(
         self, symbol_collection: str, query: dict[str, Any], sort: dict = None
     ) -> Optional[dict[str, Any]]:
-        async for doc in self.find(symbol_collection, query, sort=sort, skip=0):
-            return doc
+        matching_docs = self._matching(symbol_collection, query)
+        if not matching_docs:
+            return None
+        return deepcopy(min(matching_docs, key=_sort_key(sort)) if sort else matching_docs[0])
 
     async def insert_one(self, symbol_collection: str, document: dict[str, Any]) -> None:
-        if symbol_collection not in self.db:
-            self.db[symbol_collection] = []
-        if any(doc.get("_id") == document.get("_id") for doc in self.db[symbol_collection]):
-            raise DuplicateKeyError(f"Duplicate key error: _id {document.get('_id')} already exists.")
+        collection = self._collection(symbol_collection)
         copied = deepcopy(document)
         if "_id" not in copied:
             copied["_id"] = str(ObjectId())
-        self.db[symbol_collection].append(copied)
+        collection.add(copied)
 
     async def insert(self, symbol_collection: str, documents: list[dict[str, Any]]) -> None:
-        if symbol_collection not in self.db:
-            self.db[symbol_collection] = []
+        collection = self._collection(symbol_collection)
+        seen = set()
         for document in documents:
             if "_id" not in document:
                 document["_id"] = str(ObjectId())
-            if any(doc.get("_id") == document.get("_id") for doc in self.db[symbol_collection]):
+            if document["_id"] in collection or document["_id"] in seen:
                 raise DuplicateKeyError(f"Duplicate key error: _id {document.get('_id')} already exists.")
-        self.db[symbol_collection].extend(deepcopy(documents))
+            seen.add(document["_id"])
+        for document in deepcopy(documents):
+            collection.add(document)
 
     async def upsert_one(self, symbol_collection: str, document: dict[str, Any], query: dict[str, Any]) -> None:
-        if symbol_collection not in self.db:
-            self.db[symbol_collection] = []
-        for i, doc in enumerate(self.db[symbol_collection]):
+        collection = self._collection(symbol_collection)
+        for doc in collection.candidates(query):
             if self._matches_query(doc, query):
-                doc.update(deepcopy(document))
+                collection.update(doc, deepcopy(document))
                 return
         if not document.get("_id"):
             document["_id"] = str(ObjectId())
-        if any(doc.get("_id") == document.get("_id") for doc in self.db[symbol_collection]):
-            raise DuplicateKeyError(f"Duplicate key error: _id {document.get('_id')} already exists.")
-        self.db[symbol_collection].append(deepcopy(document))
+        collection.add(deepcopy(document))
 
     async def update_many(self, symbol_collection: str, query: dict[str, Any], document: dict[str, Any]) -> None:
         if symbol_collection not in self.db:
             return
-        for doc in self.db[symbol_collection]:
-            if self._matches_query(doc, query):
-                doc.update(deepcopy(document))
+        collection = self.db[symbol_collection]
+        for doc in self._matching(symbol_collection, query):
+            collection.update(doc, deepcopy(document))
 
     async def delete(self, symbol_collection, query):
         if symbol_collection not in self.db:
             return
-        self.db[symbol_collection] = [
-            doc for doc in self.db[symbol_collection] if not all(item in doc.items() for item in query.items())
-        ]
+        collection = self.db[symbol_collection]
+        for doc in [doc for doc in collection.candidates(query) if self._matches_exact(doc, query)]:
+            collection.remove(doc)
@@ -1,12 +1,15 @@
+import asyncio
 import os
 
 # noinspection PyPackageRequirements
-from contextvars import ContextVar
-from typing import Any, Optional, AsyncIterable, Union, Dict, List
+from typing import Any, Optional, AsyncIterable, Union, Dict, List, Tuple, Literal
 
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorClient
 from pydantic import Field, BaseModel
+from pymongo import monitoring, IndexModel
 
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.memory.index_registry import IndexSpec, registered_indexes
 from eidolon_ai_sdk.memory.semantic_memory import SymbolicMemoryBase
 from eidolon_ai_sdk.system.reference_model import Specable
 
@@ -19,30 +22,223 @@ class MongoSymbolicMemoryConfig(BaseModel):
     mongo_database_name: str = Field(
         default=os.environ.get("MONGO_DATABASE_NAME", "eidolon"), description="The name of the MongoDB database to use."
     )
+    max_pool_size: int = Field(
+        default=100, ge=0, description="The maximum number of connections the shared client keeps open per server."
+    )
+    min_pool_size: int = Field(
+        default=0, ge=0, description="The minimum number of connections the shared client keeps open per server."
+    )
+    max_idle_time_ms: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="How long a pooled connection may sit idle before it is closed. Defaults to no limit.",
+    )
+    index_provisioning: Literal["create", "dry_run", "disabled"] = Field(
+        default="create",
+        description="What to do on start with registered indexes that are missing from the database. "
+        "'create' builds them, 'dry_run' only logs them, and 'disabled' skips the check.",
+    )
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks connection pool activity for a client so it can be reported on the health endpoint.
+    """
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.checkout_failures = 0
+
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            open=self.open,
+            checked_out=self.checked_out,
+            waiting=self.waiting,
+            created=self.created,
+            closed=self.closed,
+            checkout_failures=self.checkout_failures,
+        )
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open += 1
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        self.waiting -= 1
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.waiting -= 1
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+
+class _SharedClient:
+    def __init__(self, client: AsyncIOMotorClient, listener: PoolStatsListener, loop):
+        self.client = client
+        self.listener = listener
+        self.loop = loop
+        self.references = 0
+
+
+# One motor client (and therefore one connection pool) per connection configuration for the whole process.
+# Motor clients are bound to the event loop they were first used on, so a client is only replaced if the loop changes.
+_shared_clients: Dict[Tuple, _SharedClient] = {}
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
 
 
 class MongoSymbolicMemory(SymbolicMemoryBase, Specable[MongoSymbolicMemoryConfig]):
     mongo_connection_string: Optional[str]
     mongo_database_name: str
-    _database: Optional[ContextVar]
+    _shared: Optional[_SharedClient]
 
     def __init__(self, spec: MongoSymbolicMemoryConfig):
         super().__init__(spec)
         self.mongo_connection_string = spec.mongo_connection_string
         self.mongo_database_name = spec.mongo_database_name
-        self._database = None
+        self._shared = None
+        self._stopped = False
+
+    @property
+    def _client_key(self) -> Tuple:
+        return (
+            self.mongo_connection_string,
+            self.spec.max_pool_size,
+            self.spec.min_pool_size,
+            self.spec.max_idle_time_ms,
+        )
+
+    def _acquire_client(self) -> _SharedClient:
+        loop = _running_loop()
+        shared = _shared_clients.get(self._client_key)
+        if shared is None or (loop is not None and shared.loop is not None and shared.loop is not loop):
+            listener = PoolStatsListener()
+            kwargs = dict(
+                maxPoolSize=self.spec.max_pool_size,
+                minPoolSize=self.spec.min_pool_size,
+                event_listeners=[listener],
+            )
+            if self.spec.max_idle_time_ms is not None:
+                kwargs["maxIdleTimeMS"] = self.spec.max_idle_time_ms
+            shared = _SharedClient(AsyncIOMotorClient(self.mongo_connection_string, **kwargs), listener, loop)
+            _shared_clients[self._client_key] = shared
+        shared.references += 1
+        return shared
+
+    def _release_client(self):
+        shared, self._shared = self._shared, None
+        if shared:
+            shared.references -= 1
+            if shared.references <= 0:
+                shared.client.close()
+                if _shared_clients.get(self._client_key) is shared:
+                    del _shared_clients[self._client_key]
 
     @property
     def database(self) -> AsyncIOMotorDatabase:
-        if not self._database:
-            self._database = ContextVar("database")
-        try:
-            return self._database.get()
-        except LookupError:
-            client = AsyncIOMotorClient(self.mongo_connection_string)
-            database = client.get_database(self.mongo_database_name)
-            self._database.set(database)
-            return database
+        if self._stopped:
+            # acquiring again would hold a reference to the shared client that nothing releases
+            raise RuntimeError(f"{self.__class__.__name__} has been stopped")
+        loop = _running_loop()
+        if not self._shared or (loop is not None and self._shared.loop not in (None, loop)):
+            self._release_client()
+            self._shared = self._acquire_client()
+        return self._shared.client.get_database(self.mongo_database_name)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Returns statistics about the connection pool of the shared client used by this memory.
+        """
+        shared = self._shared or _shared_clients.get(self._client_key)
+        stats = shared.listener.stats() if shared else {}
+        return dict(
+            **stats,
+            max_pool_size=self.spec.max_pool_size,
+            min_pool_size=self.spec.min_pool_size,
+            clients=len(_shared_clients),
+        )
+
+    async def start(self):
+        """
+        Acquires the shared client for this memory's connection configuration and provisions registered indexes.
+        """
+        self._stopped = False
+        _ = self.database
+        if self.spec.index_provisioning != "disabled":
+            try:
+                await self.provision_indexes(dry_run=self.spec.index_provisioning == "dry_run")
+            except Exception as e:
+                logger.warning(f"Unable to provision symbolic memory indexes: {type(e).__name__}: {e}")
+
+    async def missing_indexes(self) -> List[IndexSpec]:
+        """
+        Returns the registered indexes that do not exist in the database, matched by their key pattern.
+        """
+        missing = []
+        existing_by_collection = {}
+        for spec in registered_indexes():
+            if spec.collection not in existing_by_collection:
+                info = await self.database[spec.collection].index_information()
+                existing_by_collection[spec.collection] = [
+                    # mongo may report directions as floats, and text, hashed or geo indexes by name
+                    [(f, d if isinstance(d, str) else int(d)) for f, d in index["key"]]
+                    for index in info.values()
+                ]
+            if spec.keys not in existing_by_collection[spec.collection]:
+                missing.append(spec)
+        return missing
+
+    async def provision_indexes(self, dry_run: bool = False) -> List[IndexSpec]:
+        """
+        Creates the registered indexes that are missing from the database.
+
+        :param dry_run: If true, missing indexes are only reported, not created.
+        :return: The indexes that were missing.
+        """
+        missing = await self.missing_indexes()
+        for spec in missing:
+            if dry_run:
+                logger.warning(f"Missing index {spec.name} on collection {spec.collection}")
+            else:
+                logger.info(f"Creating index {spec.name} on collection {spec.collection}")
+                await self.database[spec.collection].create_indexes(
+                    [IndexModel(spec.keys, name=spec.name, unique=spec.unique)]
+                )
+        return missing
 
     async def count(self, symbol_collection: str, query: dict[str, Any]) -> int:
         return await self.database[symbol_collection].count_documents(query)
@@ -88,8 +284,8 @@ class MongoSymbolicMemory(SymbolicMemoryBase, Specable[MongoSymbolicMemoryConfig
 
     async def stop(self):
         """
-        Stops the memory implementation. Noop for this implementation.
+        Releases the shared client. The client is closed once no memory is using it anymore. The memory can not be
+        used again until it is restarted.
         """
-        if self.database is not None:
-            self.database.client.close()
-            self._database = None
+        self._stopped = True
+        self._release_client()
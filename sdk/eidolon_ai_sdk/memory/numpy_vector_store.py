@@ -0,0 +1,610 @@
+import base64
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Literal, Optional, Sequence
+
+import numpy as np
+from pydantic import Field
+
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.memory.document import EmbeddedDocument
+from eidolon_ai_sdk.memory.file_system_vector_store import FileSystemVectorStore, FileSystemVectorStoreSpec, tracer
+from eidolon_ai_sdk.memory.vector_store import QueryItem
+from eidolon_ai_sdk.system.reference_model import Specable
+from eidolon_ai_sdk.util.async_wrapper import make_async
+from eidolon_ai_sdk.util.str_utils import replace_env_var_in_string
+
+_CHUNK_ROWS = 65_536
+
+
+class NumpyVectorStoreSpec(FileSystemVectorStoreSpec):
+    path: str = Field(
+        "${EIDOLON_DATA_DIR}/numpy_vector_store", description="The local directory the vectors are stored in."
+    )
+    metric: Literal["cosine", "ip", "l2"] = Field(
+        "cosine",
+        description="The distance used to rank results. Scores are distances (lower is closer), computed like chroma's "
+        "spaces of the same name.",
+    )
+    compact_after: int = Field(
+        10_000,
+        ge=1,
+        description="The number of logged writes after which a collection is rewritten into one matrix, on a "
+        "background thread.",
+    )
+    ivf_threshold: Optional[int] = Field(
+        100_000,
+        ge=1,
+        description="Collections with at least this many vectors when compacted are searched through an IVF index. "
+        "Searches are always exact when unset.",
+    )
+    ivf_lists: Optional[int] = Field(
+        None, ge=1, description="The number of IVF clusters. Defaults to the square root of the collection size."
+    )
+    ivf_probes: int = Field(16, ge=1, description="The number of closest IVF clusters searched for each query.")
+
+
+def _column_key(value: Any) -> Hashable:
+    return value if isinstance(value, Hashable) else json.dumps(value, sort_keys=True, default=str)
+
+
+def _grown(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    capacity = max(size, 2 * len(array), 1024)
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+_FILES = ("vectors.npy", "norms.npy", "rows.json", "ivf.npz", "contents.bin", "contents.npz", "log.jsonl")
+
+# the attributes a compaction swaps in, everything _reset initializes
+_STATE = (
+    "generation",
+    "dim",
+    "base",
+    "_tail",
+    "_norms",
+    "_alive",
+    "ids",
+    "metadatas",
+    "documents",
+    "packed",
+    "offsets",
+    "packed_rows",
+    "row_of",
+    "columns",
+    "centroids",
+    "ivf_lists",
+    "logged",
+)
+
+
+class _Collection:
+    """
+    The vectors of one collection.
+
+    Vectors written before the last compaction live in a float32 .npy matrix that is mmap'd, so only the rows a search
+    touches are paged in. Writes since then are appended to a log and held in memory, in buffers that grow by doubling,
+    until the collection is compacted into a new matrix. A manifest names the current generation of files so a
+    compaction is replaced atomically. Compactions triggered by writes run on a background thread.
+
+    Document text kept inline is packed into one segment file at compaction, with an index of where each row's text
+    starts, and held in memory until then.
+    """
+
+    def __init__(self, directory: Path, spec: NumpyVectorStoreSpec, generation: Optional[int] = None):
+        self.directory = directory
+        self.spec = spec
+        self.lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self._reset()
+        self._load(generation)
+
+    def _reset(self):
+        self.generation = 0
+        self.dim: Optional[int] = None
+        self.base = np.zeros((0, 0), dtype=np.float32)
+        self._tail = np.zeros((0, 0), dtype=np.float32)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self.ids: List[str] = []
+        self.metadatas: List[dict] = []
+        self.documents: Dict[int, str] = {}
+        self.packed: Optional[np.ndarray] = None
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.packed_rows = np.zeros(0, dtype=bool)
+        self.row_of: Dict[str, int] = {}
+        self.columns: Dict[str, Dict[Hashable, List[int]]] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self.ivf_lists: List[np.ndarray] = []
+        self.logged = 0
+
+    @property
+    def tail(self) -> np.ndarray:
+        return self._tail[: max(len(self.ids) - len(self.base), 0)]
+
+    @property
+    def norms(self) -> np.ndarray:
+        return self._norms[: len(self.ids)]
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._alive[: len(self.ids)]
+
+    def _file(self, name: str, generation: Optional[int] = None) -> Path:
+        stem, _, extension = name.partition(".")
+        return self.directory / f"{stem}-{self.generation if generation is None else generation}.{extension}"
+
+    def _load(self, generation: Optional[int] = None):
+        if generation is None:
+            manifest = self.directory / "manifest.json"
+            if not manifest.exists():
+                return
+            manifest = json.loads(manifest.read_text())
+            generation = manifest["generation"]
+            self.dim = manifest["dim"]
+        self.generation = generation
+        if self._file("vectors.npy").exists():
+            self.base = np.load(self._file("vectors.npy"), mmap_mode="r")
+            self._norms = np.load(self._file("norms.npy"))
+            rows = json.loads(self._file("rows.json").read_text())
+            self._register(rows["ids"], rows["metadatas"])
+        if self._file("contents.npz").exists():
+            with np.load(self._file("contents.npz")) as contents:
+                self.offsets, self.packed_rows = contents["offsets"], contents["present"]
+            if self.offsets[-1]:
+                self.packed = np.memmap(self._file("contents.bin"), dtype=np.uint8, mode="r")
+        if self._file("ivf.npz").exists():
+            with np.load(self._file("ivf.npz")) as ivf:
+                self._set_ivf(ivf["centroids"], ivf["assignments"])
+        if self._file("log.jsonl").exists():
+            with open(self._file("log.jsonl")) as log:
+                for line in log:
+                    if line.strip():
+                        self._apply(json.loads(line))
+                        self.logged += 1
+
+    def _register(self, ids: Sequence[str], metadatas: Sequence[dict], documents: Optional[Sequence[str]] = None):
+        start = len(self.ids)
+        if documents is not None:
+            self.documents.update(enumerate(documents, start))
+        self._alive = _grown(self._alive, start + len(ids))
+        self._alive[start : start + len(ids)] = True
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas)
+        for row, (doc_id, metadata) in enumerate(zip(ids, metadatas), start):
+            previous = self.row_of.get(doc_id)
+            if previous is not None:
+                self._alive[previous] = False
+            self.row_of[doc_id] = row
+            for key, value in (metadata or {}).items():
+                self.columns.setdefault(key, {}).setdefault(_column_key(value), []).append(row)
+
+    def _apply(self, entry: dict):
+        if entry["op"] == "add":
+            vectors = np.frombuffer(base64.b64decode(entry["vectors"]), dtype=np.float32)
+            self._append(
+                entry["ids"], entry["metadatas"], vectors.reshape(len(entry["ids"]), -1), entry.get("documents")
+            )
+        elif entry["op"] == "contents":
+            self._set_contents(entry["ids"], entry["documents"])
+        else:
+            self._delete(entry["ids"])
+
+    def _append(self, ids: List[str], metadatas: List[dict], vectors: np.ndarray, documents: Optional[List[str]] = None):
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+        rows, tail_rows = len(self.ids), len(self.tail)
+        if self._tail.shape[1] != self.dim:
+            self._tail = np.zeros((0, self.dim), dtype=np.float32)
+        self._tail = _grown(self._tail, tail_rows + len(vectors))
+        self._tail[tail_rows : tail_rows + len(vectors)] = vectors
+        self._norms = _grown(self._norms, rows + len(vectors))
+        self._norms[rows : rows + len(vectors)] = np.linalg.norm(vectors, axis=1)
+        self._register(ids, metadatas, documents)
+
+    def _set_contents(self, ids: List[str], documents: List[str]):
+        for doc_id, document in zip(ids, documents):
+            if doc_id in self.row_of:
+                self.documents[self.row_of[doc_id]] = document
+
+    def _delete(self, ids: List[str]):
+        for doc_id in ids:
+            row = self.row_of.pop(doc_id, None)
+            if row is not None:
+                self._alive[row] = False
+
+    def _log(self, entry: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not (self.directory / "manifest.json").exists():
+            self._write_manifest()
+        with open(self._file("log.jsonl"), "a") as log:
+            log.write(json.dumps(entry) + "\n")
+        self.logged += 1
+        if self.logged >= self.spec.compact_after and self._compaction is None:
+            self._compaction = threading.Thread(target=self._compact_in_background, daemon=True)
+            self._compaction.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception(f"Failed to compact vectors in {self.directory}")
+        finally:
+            with self.lock:
+                self._compaction = None
+
+    def wait_for_compaction(self):
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def _write_manifest(self):
+        tmp = self.directory / "manifest.json.tmp"
+        tmp.write_text(json.dumps(dict(generation=self.generation, dim=self.dim)))
+        os.replace(tmp, self.directory / "manifest.json")
+
+    def add(self, ids: List[str], metadatas: List[dict], vectors: np.ndarray, documents: Optional[List[str]] = None):
+        with self.lock:
+            self._append(ids, metadatas, vectors, documents)
+            entry = dict(op="add", ids=ids, metadatas=metadatas, vectors=base64.b64encode(vectors.tobytes()).decode())
+            if documents is not None:
+                entry["documents"] = documents
+            self._log(entry)
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            if any(doc_id in self.row_of for doc_id in ids):
+                self._delete(ids)
+                self._log(dict(op="delete", ids=ids))
+
+    def metadata(self, ids: List[str]) -> List[dict]:
+        with self.lock:
+            return [self.metadatas[self.row_of[doc_id]] if doc_id in self.row_of else {} for doc_id in ids]
+
+    def _content(self, row: int) -> Optional[str]:
+        if row in self.documents:
+            return self.documents[row]
+        if row < len(self.packed_rows) and self.packed_rows[row]:
+            return (
+                bytes(self.packed[self.offsets[row] : self.offsets[row + 1]]).decode() if self.packed is not None else ""
+            )
+        return None
+
+    def contents(self, ids: List[str]) -> List[Optional[str]]:
+        with self.lock:
+            return [self._content(self.row_of[doc_id]) if doc_id in self.row_of else None for doc_id in ids]
+
+    def set_contents(self, ids: List[str], documents: List[str]):
+        with self.lock:
+            self._set_contents(ids, documents)
+            self._log(dict(op="contents", ids=ids, documents=documents))
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        n_base = len(self.base)
+        base_rows, tail_rows = rows[rows < n_base], rows[rows >= n_base] - n_base
+        parts = []
+        if len(base_rows):
+            parts.append(np.asarray(self.base[base_rows]))
+        if len(tail_rows):
+            parts.append(self.tail[tail_rows])
+        return np.concatenate(parts) if len(parts) > 1 else parts[0] if parts else np.zeros((0, self.dim), np.float32)
+
+    def _distances(self, queries: np.ndarray, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        dot = queries @ vectors.T
+        if self.spec.metric == "ip":
+            return 1 - dot
+        query_norms = np.linalg.norm(queries, axis=1)[:, None]
+        if self.spec.metric == "cosine":
+            return 1 - dot / np.maximum(query_norms * norms[None, :], 1e-12)
+        return query_norms**2 - 2 * dot + norms[None, :] ** 2
+
+    def _all_distances(self, queries: np.ndarray) -> np.ndarray:
+        # computed straight over the mmap'd matrix so exact searches do not copy the collection
+        n_base = len(self.base)
+        parts = []
+        if n_base:
+            parts.append(self._distances(queries, self.base, self.norms[:n_base]))
+        if len(self.tail):
+            parts.append(self._distances(queries, self.tail, self.norms[n_base:]))
+        return np.concatenate(parts, axis=1) if parts else np.zeros((len(queries), 0), dtype=np.float32)
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, distances: np.ndarray, k: int):
+        if len(rows) > k:
+            closest = np.argpartition(distances, k - 1)[:k]
+            rows, distances = rows[closest], distances[closest]
+        order = np.argsort(distances, kind="stable")
+        return rows[order], distances[order]
+
+    def _candidates(self, query: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+        n_base = len(self.base)
+        if self.centroids is None:
+            return np.flatnonzero(allowed)
+        probes = min(self.spec.ivf_probes, len(self.centroids))
+        centroid_distances = self._distances(query[None, :], self.centroids, np.linalg.norm(self.centroids, axis=1))[0]
+        closest = np.argpartition(centroid_distances, probes - 1)[:probes]
+        rows = np.sort(np.concatenate([self.ivf_lists[c] for c in closest] + [np.arange(n_base, len(self.ids))]))
+        return rows[allowed[rows]]
+
+    def search(self, queries: np.ndarray, k: int, where: Optional[Dict[str, Any]], include_embeddings: bool):
+        with self.lock:
+            if self.dim is None or k < 1:
+                return [[] for _ in queries]
+            allowed = self.alive if not where else self.alive & self._filter(where)
+            results = []
+            if self.centroids is None:
+                rows = np.flatnonzero(allowed)
+                distances = self._all_distances(queries)
+                ranked = [self._top_k(rows, distances[q, rows], k) for q in range(len(queries))]
+            else:
+                ranked = []
+                for query in queries:
+                    rows = self._candidates(query, allowed)
+                    distances = self._distances(query[None, :], self._vectors(rows), self.norms[rows])[0]
+                    ranked.append(self._top_k(rows, distances, k))
+            for rows, distances in ranked:
+                embeddings = self._vectors(rows) if include_embeddings else None
+                results.append(
+                    [
+                        (
+                            self.ids[row],
+                            float(distance),
+                            self.metadatas[row],
+                            embeddings[i].tolist() if include_embeddings else None,
+                        )
+                        for i, (row, distance) in enumerate(zip(rows, distances))
+                    ]
+                )
+            return results
+
+    def _filter(self, where: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._filter(sub)
+                mask &= any_mask
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for op, operand in condition.items():
+                    if op == "$eq":
+                        mask &= self._rows_with(key, [operand])
+                    elif op == "$ne":
+                        mask &= ~self._rows_with(key, [operand])
+                    elif op == "$in":
+                        mask &= self._rows_with(key, operand)
+                    elif op == "$nin":
+                        mask &= ~self._rows_with(key, operand)
+                    else:
+                        raise ValueError(f"Unsupported metadata filter operator {op}")
+        return mask
+
+    def _rows_with(self, key: str, values: Sequence[Any]) -> np.ndarray:
+        mask = np.zeros(len(self.ids), dtype=bool)
+        column = self.columns.get(key, {})
+        for value in values:
+            rows = column.get(_column_key(value))
+            if rows:
+                mask[rows] = True
+        return mask
+
+    def compact(self):
+        """
+        Rewrites the live vectors into a new mmap'd matrix, builds the IVF index when the collection is large enough,
+        and starts a new log.
+
+        The new generation is written and loaded without holding the collection lock, so searches and writes carry on
+        meanwhile. Rows are only ever appended, so the snapshot taken up front stays valid, and writes logged since
+        then are replayed onto the new generation when it replaces the current one.
+        """
+        with self._compacting:
+            with self.lock:
+                rows = np.flatnonzero(self.alive)
+                norms = self.norms[rows]
+                generation, dim = self.generation + 1, self.dim
+                log = self._file("log.jsonl")
+                logged_bytes = log.stat().st_size if log.exists() else 0
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for name in _FILES:
+                # left behind by a compaction that failed part way through
+                self._file(name, generation).unlink(missing_ok=True)
+            if len(rows):
+                vectors = np.lib.format.open_memmap(
+                    self._file("vectors.npy", generation), mode="w+", dtype=np.float32, shape=(len(rows), dim)
+                )
+                for start in range(0, len(rows), _CHUNK_ROWS):
+                    vectors[start : start + _CHUNK_ROWS] = self._vectors(rows[start : start + _CHUNK_ROWS])
+                vectors.flush()
+            else:
+                vectors = np.zeros((0, dim or 0), dtype=np.float32)
+                np.save(self._file("vectors.npy", generation), vectors)
+            np.save(self._file("norms.npy", generation), norms)
+            self._file("rows.json", generation).write_text(
+                json.dumps(dict(ids=[self.ids[r] for r in rows], metadatas=[self.metadatas[r] for r in rows]))
+            )
+            self._pack_contents(rows, generation)
+            if self.spec.ivf_threshold and len(rows) >= self.spec.ivf_threshold:
+                centroids, assignments = self._build_ivf(vectors, norms)
+                np.savez(self._file("ivf.npz", generation), centroids=centroids, assignments=assignments)
+            del vectors
+            compacted = _Collection(self.directory, self.spec, generation)
+            compacted.dim = dim
+
+            with self.lock:
+                carried = []
+                if log.exists():
+                    with open(log) as previous_log:
+                        previous_log.seek(logged_bytes)
+                        carried = [line for line in previous_log if line.strip()]
+                if carried:
+                    for line in carried:
+                        compacted._apply(json.loads(line))
+                    compacted._file("log.jsonl").write_text("".join(carried))
+                    compacted.logged = len(carried)
+                previous = self.generation
+                for name in _STATE:
+                    setattr(self, name, getattr(compacted, name))
+                self._write_manifest()
+                for name in _FILES:
+                    self._file(name, previous).unlink(missing_ok=True)
+
+    def _pack_contents(self, rows: np.ndarray, generation: int):
+        contents = [self._content(row) for row in rows]
+        if all(content is None for content in contents):
+            return
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        with open(self._file("contents.bin", generation), "wb") as packed:
+            for i, content in enumerate(contents):
+                data = content.encode() if content is not None else b""
+                packed.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        present = np.asarray([content is not None for content in contents], dtype=bool)
+        np.savez(self._file("contents.npz", generation), offsets=offsets, present=present)
+
+    def _build_ivf(self, vectors: np.ndarray, norms: np.ndarray, iterations: int = 10):
+        n = len(vectors)
+        lists = min(self.spec.ivf_lists or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(n, size=min(n, lists * 64), replace=False))
+        sample = self._for_clustering(np.asarray(vectors[sample_rows]), norms[sample_rows])
+        centroids = sample[rng.choice(len(sample), size=lists, replace=False)]
+        for _ in range(iterations):
+            assignments = self._assign(sample, centroids)
+            for c in range(lists):
+                members = sample[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            if self.spec.metric == "cosine":
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        assignments = np.concatenate(
+            [
+                self._assign(
+                    self._for_clustering(np.asarray(vectors[s : s + _CHUNK_ROWS]), norms[s : s + _CHUNK_ROWS]),
+                    centroids,
+                )
+                for s in range(0, n, _CHUNK_ROWS)
+            ]
+        )
+        return centroids, assignments.astype(np.int32)
+
+    def _for_clustering(self, vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+        if self.spec.metric == "cosine":
+            return vectors / np.maximum(norms[:, None], 1e-12)
+        return vectors.copy()
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        return np.argmin(self._distances(vectors, centroids, np.linalg.norm(centroids, axis=1)), axis=1)
+
+    def _set_ivf(self, centroids: np.ndarray, assignments: np.ndarray):
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self.centroids = centroids
+        self.ivf_lists = [order[bounds[c] : bounds[c + 1]] for c in range(len(centroids))]
+
+
+class NumpyVectorStore(FileSystemVectorStore, Specable[NumpyVectorStoreSpec]):
+    """
+    A dependency light vector store for single node deployments that keeps each collection in float32 NumPy matrices
+    on local disk.
+
+    Searches are exact, vectorized over the whole collection. Collections that reach `ivf_threshold` vectors are
+    clustered when compacted, and searches then only scan the `ivf_probes` clusters closest to the query. Metadata
+    filters support equality, $eq, $ne, $in, $nin, $and, and $or, answered from a per key index of the metadata.
+    """
+
+    spec: NumpyVectorStoreSpec
+
+    def __init__(self, spec: NumpyVectorStoreSpec):
+        super().__init__(spec)
+        self.spec = spec
+        self.root = Path(replace_env_var_in_string(spec.path, EIDOLON_DATA_DIR="/tmp/eidolon_data_dir")).resolve()
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+
+    def _collection(self, name: str) -> _Collection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = _Collection(self.root / name, self.spec)
+            return self._collections[name]
+
+    @make_async
+    def add_embedding(self, collection: str, docs: List[EmbeddedDocument], **add_kwargs: Any):
+        with tracer.start_as_current_span("add embedding"):
+            if docs:
+                self._collection(collection).add(
+                    [doc.id for doc in docs],
+                    [doc.metadata for doc in docs],
+                    np.asarray([doc.embedding for doc in docs], dtype=np.float32),
+                    add_kwargs.get("documents"),
+                )
+
+    @make_async
+    def delete_embedding(self, collection: str, doc_ids: List[str], **delete_kwargs: Any):
+        self._collection(collection).delete(doc_ids)
+
+    @make_async
+    def get_metadata(self, collection: str, doc_ids: List[str]):
+        return self._collection(collection).metadata(doc_ids)
+
+    @make_async
+    def get_contents(self, collection: str, doc_ids: List[str]) -> List[Optional[str]]:
+        return self._collection(collection).contents(doc_ids)
+
+    @make_async
+    def set_contents(self, collection: str, doc_ids: List[str], contents: List[str]):
+        self._collection(collection).set_contents(doc_ids, contents)
+
+    @make_async
+    def compact(self, collection: str):
+        self._collection(collection).compact()
+
+    @make_async
+    def stop(self):
+        with self._lock:
+            collections = list(self._collections.values())
+        for collection in collections:
+            collection.wait_for_compaction()
+
+    async def query_embedding(
+        self,
+        collection: str,
+        query: List[float],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[QueryItem]:
+        return (await self.query_embeddings(collection, [query], num_results, metadata_where, include_embeddings))[0]
+
+    @make_async
+    def query_embeddings(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[QueryItem]]:
+        with tracer.start_as_current_span("query embeddings"):
+            results = self._collection(collection).search(
+                np.asarray(queries, dtype=np.float32), num_results, metadata_where, include_embeddings
+            )
+        return [
+            [
+                QueryItem(id=doc_id, score=score, metadata=metadata, embedding=embedding)
+                for doc_id, score, metadata, embedding in items
+            ]
+            for items in results
+        ]
@@ -42,6 +42,17 @@ class SimilarityMemoryImpl(Specable[SimilarityMemorySpec], SimilarityMemory):
         """
         return await self.embedder.embed_text(text, **kwargs)
 
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        """Create embeddings for several pieces of text in as few requests as the embedder allows.
+
+        Args:
+            texts: The texts to be encoded.
+
+        Returns:
+            The embeddings of the texts, in the same order.
+        """
+        return await self.embedder.embed_texts(texts, **kwargs)
+
     def embed(self, documents: Sequence[Document], **kwargs: Any) -> AsyncGenerator[EmbeddedDocument, None]:
         """
         Create embeddings for a list of documents.
@@ -76,5 +87,17 @@ class SimilarityMemoryImpl(Specable[SimilarityMemorySpec], SimilarityMemory):
     ) -> List[QueryItem]:
         return await self.vector_store.raw_query(collection, query, num_results, metadata_where, include_embeddings)
 
+    async def raw_query_many(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[QueryItem]]:
+        return await self.vector_store.raw_query_many(
+            collection, queries, num_results, metadata_where, include_embeddings
+        )
+
     def get_docs(self, collection: str, doc_ids: List[str]) -> AsyncIterable[Document]:
         return self.vector_store.get_docs(collection, doc_ids)
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Sequence, AsyncIterable
@@ -50,6 +51,24 @@ class VectorStore(ABC):
     ) -> List[QueryItem]:
         pass
 
+    async def raw_query_many(
+        self,
+        collection: str,
+        queries: List[List[float]],
+        num_results: int,
+        metadata_where: Optional[Dict[str, str]] = None,
+        include_embeddings: bool = False,
+    ) -> List[List[QueryItem]]:
+        """
+        Runs several raw queries against a collection. Returns one result list per query, in the same order. Stores
+        that can search for several vectors in one call should override this.
+        """
+        return list(
+            await asyncio.gather(
+                *[self.raw_query(collection, q, num_results, metadata_where, include_embeddings) for q in queries]
+            )
+        )
+
     @abstractmethod
     def get_docs(self, collection: str, doc_ids: List[str]) -> AsyncIterable[Document]:
         pass
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Set, List
+from typing import Set, List, Dict, Tuple
 
 from eidolon_ai_sdk.agent_os import AgentOS
 from eidolon_ai_sdk.security.permissions import PermissionException
@@ -26,9 +26,24 @@ class ProcessAuthorizer(ABC):
         """
         pass
 
+    async def authorized_processes(self, permissions: Set[Permission], processes: Dict[str, str]) -> Set[str]:
+        """
+        Returns the ids of the given processes (process id -> agent) the authenticated user has the specified
+        permission(s) to. Checks each process in turn unless overridden with a batched lookup.
+        """
+        authorized = set()
+        for process_id, agent in processes.items():
+            try:
+                await self.check_process_perms(permissions, agent, process_id)
+                authorized.add(process_id)
+            except PermissionException:
+                pass
+        return authorized
+
 
 class AuthDoc(MongoDoc):
     collection = "resource_auth_records"
+    indexes = [["subject_id", "subject_type", "resource_type", "resource_id"], ["resource_id"]]
     resource_type: str
     resource_id: str
     subject_type: str
@@ -55,6 +70,27 @@ class PrivateAuthorizer(ProcessAuthorizer):
             if missing_resource:
                 raise PermissionException(missing_resource, process_id)
 
+    async def authorized_processes(self, permissions: Set[Permission], processes: Dict[str, str]) -> Set[str]:
+        if not processes:
+            return set()
+        granted: Dict[Tuple[str, str], Set[str]] = {}
+        async for doc in AuthDoc.find(
+            query=dict(
+                subject_id=User.get_current().id,
+                subject_type="user",
+                resource_id={"$in": list(processes)},
+            ),
+            projection=dict(resource_id=1, resource_type=1, permissions=1),
+            convert=False,
+        ):
+            granted.setdefault((doc["resource_type"], doc["resource_id"]), set()).update(doc["permissions"])
+        # like check_process_perms, permissions only count when granted on the process's own agent
+        return {
+            process_id
+            for process_id, agent in processes.items()
+            if permissions.issubset(granted.get((f"{agent}/process", process_id), set()))
+        }
+
     async def record_process(self, agent: str, process_id: str):
         user = User.get_current()
         await AuthDoc.create(
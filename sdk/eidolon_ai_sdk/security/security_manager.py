@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Set
+from typing import Dict, Optional, Set
 
 from pydantic import BaseModel
 from starlette.requests import Request
@@ -65,3 +65,10 @@ class SecurityManagerImpl(Specable[SecurityManagerSpec], SecurityManager):
         Called when a process is created. Should propagate any state needed for future resource checks.
         """
         return await self.process_authorizer.record_process(agent, resource_id)
+
+    async def authorized_processes(self, permissions: Set[Permission], processes: Dict[str, str]) -> Set[str]:
+        """
+        Returns the ids of the given processes (process id -> agent) the authenticated user has the specified
+        permission(s) to.
+        """
+        return await self.process_authorizer.authorized_processes(permissions, processes)
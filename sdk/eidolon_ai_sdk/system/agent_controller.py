@@ -2,10 +2,11 @@ from __future__ import annotations
 
 import asyncio
 import inspect
+import json
 import logging
 import typing
-import uuid
 from collections.abc import AsyncIterator
+from contextlib import aclosing
 from inspect import Parameter
 from textwrap import dedent
 
@@ -15,7 +16,7 @@ from fastapi.params import Body, Param
 from pydantic import BaseModel, Field, create_model
 from pydantic_core import PydanticUndefined, to_jsonable_python
 from sse_starlette import EventSourceResponse, ServerSentEvent
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 from eidolon_ai_client.events import (
     StartAgentCallEvent,
@@ -44,11 +45,13 @@ from eidolon_ai_sdk.system.agent_contract import (
 )
 from eidolon_ai_sdk.system.fn_handler import FnHandler, get_handlers
 from eidolon_ai_sdk.system.kernel import AgentOSKernel
-from eidolon_ai_sdk.system.processes import ProcessDoc, store_events, load_events
+from eidolon_ai_sdk.system.process_event_buffer import ProcessEventBuffers
+from eidolon_ai_sdk.system.processes import ProcessDoc, EventSink, load_events_json, load_event_records
 from eidolon_ai_sdk.system.resources.agent_resource import AgentResource
 from eidolon_ai_sdk.system.resources.reference_resource import ReferenceResource
 from eidolon_ai_sdk.util.class_utils import for_name
 from eidolon_ai_sdk.util.posthog import report_agent_action, report_new_process
+from eidolon_ai_sdk.util.stream_collector import coalesce_string_events
 
 
 # todo, agent controller has become a mega impl, we should break up responsibilities
@@ -58,10 +61,14 @@ class AgentController:
     actions: typing.Dict[str, FnHandler]
     security: SecurityManager
 
-    def __init__(self, name, agent):
+    def __init__(self, name, agent, sse_coalesce_delay: float = 0.05, sse_coalesce_max_bytes: int = 4096):
         self.name = name
         self.actions = {}
         self.agent = agent
+        self.sse_coalesce_delay = sse_coalesce_delay
+        self.sse_coalesce_max_bytes = sse_coalesce_max_bytes
+        self.event_buffers = ProcessEventBuffers(name)
+        self.background_actions: typing.Set[asyncio.Task] = set()
 
     async def start(self, app: FastAPI):
         logger.info(f"Starting agent '{self.name}'")
@@ -119,7 +126,10 @@ class AgentController:
         )
 
     async def stop(self, app: FastAPI):
-        pass
+        tasks = list(self.background_actions)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     async def run_program(
             self,
@@ -171,6 +181,27 @@ class AgentController:
         if "request" in parameters and parameters["request"].annotation == Request:
             kwargs["request"] = request
 
+        if "respond-async" in request.headers.get("Prefer", ""):
+            # run the action in the background, clients follow it through the process event stream
+            await self.event_buffers.open(process.record_id)
+            self.run_in_background(process.record_id, self.agent_event_stream(handler, process, last_state, **kwargs))
+            return JSONResponse(
+                StateSummary(
+                    agent=self.name,
+                    process_id=process.record_id,
+                    state=process.state,
+                    available_actions=[],
+                    title=process.title,
+                    created=process.created,
+                    updated=process.updated,
+                ).model_dump(),
+                202,
+                headers={
+                    "Location": f"/processes/{process.record_id}/events/stream",
+                    "Preference-Applied": "respond-async",
+                },
+            )
+
         # get the accepted content types
         accept_header = request.headers.get("Accept")
         media_types = accept_header.split(",") if accept_header else []
@@ -186,21 +217,44 @@ class AgentController:
 
         if event_stream_idx != -1 and (app_json_idx == -1 or event_stream_idx < app_json_idx):
             # stream the results
-            async def with_sse(stream: AsyncIterator[BaseStreamEvent]):
+            async def with_sse(stream: AsyncIterator[typing.Tuple[int, BaseStreamEvent]]):
                 try:
-                    async for event in stream:
-                        yield ServerSentEvent(id=str(uuid.uuid4()), data=event.model_dump_json())
+                    async for event_id, event in stream:
+                        yield ServerSentEvent(id=str(event_id), data=event.model_dump_json())
                 except Exception as e:
                     logger.exception(f"Server Error {e}")
                     raise e
 
-            return EventSourceResponse(
-                with_sse(self.agent_event_stream(handler, process, last_state, **kwargs)), status_code=202
-            )
+            stream = self._coalesce(self.identified_event_stream(handler, process, last_state, **kwargs))
+            return EventSourceResponse(with_sse(stream), status_code=202)
         else:
             # run the program synchronously
             return await self.send_response(handler, process, last_state, **kwargs)
 
+    def _coalesce(
+            self, stream: AsyncIterator[typing.Tuple[int, StreamEvent]]
+    ) -> AsyncIterator[typing.Tuple[int, StreamEvent]]:
+        return coalesce_string_events(stream, self.sse_coalesce_delay, self.sse_coalesce_max_bytes)
+
+    def run_in_background(self, process_id: str, stream: AsyncIterator[StreamEvent]):
+        """
+        Runs an action to completion independently of the request that started it. The task is owned by the
+        controller and is cancelled when the controller stops.
+        """
+
+        async def drain():
+            async for _ in stream:
+                pass
+
+        def done(task_: asyncio.Task):
+            self.background_actions.discard(task_)
+            if not task_.cancelled() and task_.exception():
+                logger.error(f"Background action for process {process_id} failed", exc_info=task_.exception())
+
+        task = asyncio.create_task(drain())
+        self.background_actions.add(task)
+        task.add_done_callback(done)
+
     async def _create_process(self, **kwargs):
         try:
             process = await ProcessDoc.create(agent=self.name, **kwargs, _id=str(ObjectId()))
@@ -263,9 +317,26 @@ class AgentController:
         )
 
     async def agent_event_stream(self, handler, process, last_state, **kwargs) -> AsyncIterator[StreamEvent]:
+        async with aclosing(self.identified_event_stream(handler, process, last_state, **kwargs)) as stream:
+            async for _, event in stream:
+                yield event
+
+    async def identified_event_stream(
+            self, handler, process, last_state, **kwargs
+    ) -> AsyncIterator[typing.Tuple[int, StreamEvent]]:
+        """
+        Runs the action and yields its events along with their per process event ids.
+        """
         is_async_gen = inspect.isasyncgenfunction(handler.fn)
         stream = handler.fn(self.agent, **kwargs) if is_async_gen else self.stream_agent_fn(handler, **kwargs)
-        events_to_store = []
+        event_buffer = await self.event_buffers.open(process.record_id)
+        event_sink = EventSink(self.name, process.record_id)
+
+        async def record(event_: StreamEvent) -> int:
+            event_id_ = await event_buffer.publish(event_)
+            await event_sink.add(event_, event_id_)
+            return event_id_
+
         ended = False
         transitioned = False
         try:
@@ -278,8 +349,7 @@ class AgentController:
                 elif not user_input_event_seen:
                     user_input_event_seen = True
                     output_event = UserInputEvent(input=to_jsonable_python(kwargs, fallback=str))
-                    events_to_store.append(output_event)
-                    yield output_event
+                    yield await record(output_event), output_event
                 if event.is_root_and_type(StartAgentCallEvent):
                     start_event_seen = True
                 elif not start_event_seen and not event.is_root_and_type(UserInputEvent):
@@ -297,21 +367,11 @@ class AgentController:
                         process_id=process.record_id,
                         **extra,
                     )
-                    events_to_store.append(output_event)
-                    yield output_event
+                    yield await record(output_event), output_event
                 if not ended:
                     ended = event.is_root_end_event()
                     transitioned = event.is_root_and_type(AgentStateEvent)
-                    if (
-                            isinstance(event, StringOutputEvent)
-                            and events_to_store
-                            and isinstance(events_to_store[-1], StringOutputEvent)
-                            and event.stream_context == events_to_store[-1].stream_context
-                    ):
-                        events_to_store[-1].content += event.content
-                    else:
-                        events_to_store.append(event)
-                    yield event
+                    yield await record(event), event
                 else:
                     logger.warning(f"Received event after end event ({event.event_type}), ignoring")
         except asyncio.CancelledError:
@@ -320,12 +380,13 @@ class AgentController:
                 if not transitioned:
                     await process.update(state=last_state)
                     actions = self.get_available_actions(last_state)
-                    events_to_store.append(AgentStateEvent(state=last_state, available_actions=actions))
-                events_to_store.append(CanceledEvent())
+                    await record(AgentStateEvent(state=last_state, available_actions=actions))
+                await record(CanceledEvent())
 
             raise
         finally:
-            await store_events(self.name, process.record_id, events_to_store)
+            await event_sink.close()
+            self.event_buffers.close(process.record_id)
             # get the latest state and if terminated, delete the process
             latest_record = await self.get_latest_process_event(process.record_id)
             if latest_record.delete_on_terminate and latest_record.state == "terminated":
@@ -433,7 +494,46 @@ class AgentController:
 
     async def get_process_events(self, process_id: str):
         await self.security.check_permissions("read", self.name, process_id)
-        return await load_events(self.name, process_id)
+        return Response(content=await load_events_json(self.name, process_id), media_type="application/json")
+
+    async def stream_process_events(self, process_id: str, last_event_id: typing.Optional[int] = None):
+        """
+        Streams the events of a process after `last_event_id`, following the running action if there is one.
+
+        Recent events are replayed from the process's in memory buffer, and older ones from the stored events. A client
+        that reads too slowly to keep up with the action catches up the same way, from the buffer or else from the
+        stored events. If it falls behind before receiving anything, the stream ends and the client can reconnect with
+        its Last-Event-ID.
+        """
+        await self.security.check_permissions("read", self.name, process_id)
+        buffer = self.event_buffers.get(process_id)
+        after_id = -1 if last_event_id is None else last_event_id
+
+        async def events():
+            nonlocal after_id
+            while True:
+                start_id = after_id
+                if buffer is None or buffer.oldest_id > after_id + 1:
+                    stored = [record async for record in load_event_records(self.name, process_id)]
+                    for i, (event_id, last_event_id, event) in enumerate(stored):
+                        # a stored string event holds every streamed part up to the next stored event
+                        end_id = stored[i + 1][0] - 1 if i + 1 < len(stored) else last_event_id
+                        if end_id <= after_id:
+                            continue
+                        if buffer and event_id >= buffer.oldest_id:
+                            break
+                        yield ServerSentEvent(id=str(end_id), data=json.dumps(event))
+                        after_id = end_id
+                if buffer is None:
+                    return
+                async for event_id, event in self._coalesce(buffer.follow(after_id)):
+                    yield ServerSentEvent(id=str(event_id), data=event.model_dump_json())
+                    after_id = event_id
+                # follow only stops short of the latest event when it fell behind past what the buffer holds
+                if after_id == start_id or buffer.oldest_id <= after_id + 1:
+                    return
+
+        return EventSourceResponse(events())
 
     async def create_process(self, title: typing.Optional[str], parent_process_id: typing.Optional[str] = None):
         """
@@ -504,6 +604,7 @@ class AgentController:
                 logger.debug(f"Skipping non root reference {r.metadata.name}")
 
         await ProcessDoc.delete(_id=process_id)
+        self.event_buffers.discard(process_id)
         return num_deleted + 1
 
     def get_available_actions(self, state):
@@ -1,6 +1,8 @@
+import base64
+import json
 import typing
 from contextlib import contextmanager
-from typing import List, Optional, Annotated, Literal, cast
+from typing import List, Optional, Annotated, Literal, cast, Tuple, AsyncIterable, AsyncIterator
 
 from fastapi import FastAPI, Request, Body, Header
 from pydantic import BaseModel, Field
@@ -9,8 +11,12 @@ from starlette.responses import JSONResponse, Response
 from eidolon_ai_client.client import ProcessStatus
 from eidolon_ai_client.events import FileHandle
 from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.agent.doc_manager.process_pool import DocumentProcessPool
 from eidolon_ai_sdk.agent_os_interfaces import FileMemory, SymbolicMemory, SimilarityMemory, SecurityManager
+from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import OpenAIConnectionHandler
+from eidolon_ai_sdk.apu.llm.rate_limiter import LLMRateLimiter
 from eidolon_ai_sdk.memory.agent_memory import AgentMemory
+from eidolon_ai_sdk.memory.lexical_index import LexicalIndex
 from .agent_contract import StateSummary, CreateProcessArgs, DeleteProcessResponse, ListProcessesResponse
 from .agent_controller import AgentController
 from .kernel import AgentOSKernel
@@ -33,7 +39,16 @@ class MachineSpec(BaseModel):
     process_file_system: AnnotatedReference[ProcessFileSystem] = Field(
         description="The Process File System implementation. Used to store files related to processes."
     )
+    llm_rate_limiter: AnnotatedReference[LLMRateLimiter] = Field(
+        description="Budgets the requests and tokens per minute of the llm calls made by every agent on the machine."
+    )
     fail_on_agent_start_error: bool = Field(False, description="If true, the machine will fail to start if an agent fails to start. Default: False")
+    sse_coalesce_delay_ms: int = Field(
+        50,
+        ge=0,
+        description="Streamed string output is merged into SSE frames of up to this many milliseconds of output. 0 sends every delta as its own frame.",
+    )
+    sse_coalesce_max_bytes: int = Field(4096, ge=1, description="The maximum size of a merged SSE string output frame.")
 
     def get_agent_memory(self):
         file_memory = self.file_memory.instantiate()
@@ -52,6 +67,7 @@ class AgentMachine(Specable[MachineSpec]):
     agent_controllers: List[AgentController]
     app: Optional[FastAPI]
     process_file_system: ProcessFileSystem
+    llm_rate_limiter: LLMRateLimiter
 
     def __init__(self, spec: MachineSpec):
         super().__init__(spec)
@@ -64,10 +80,19 @@ class AgentMachine(Specable[MachineSpec]):
                 except Exception as e:
                     register_instantiate_error(name, r.kind, e)
         self.memory = self.spec.get_agent_memory()
-        self.agent_controllers = [AgentController(name, agent) for name, agent in agents.items()]
+        self.agent_controllers = [
+            AgentController(
+                name,
+                agent,
+                sse_coalesce_delay=self.spec.sse_coalesce_delay_ms / 1000,
+                sse_coalesce_max_bytes=self.spec.sse_coalesce_max_bytes,
+            )
+            for name, agent in agents.items()
+        ]
         self.app = None
         self.security_manager = self.spec.security_manager.instantiate()
         self.process_file_system = self.spec.process_file_system.instantiate()
+        self.llm_rate_limiter = self.spec.llm_rate_limiter.instantiate()
 
     async def start(self, app):
         if self.app:
@@ -113,6 +138,16 @@ class AgentMachine(Specable[MachineSpec]):
             tags=["processes"],
         )
 
+        app.add_api_route(
+            "/processes/{process_id}/events/stream",
+            endpoint=self.stream_process_events,
+            methods=["GET"],
+            tags=["processes"],
+            responses={
+                200: {"content": {"text/event-stream": {"schema": {"$ref": "#/components/schemas/EventTypes"}}}},
+            },
+        )
+
         # Add routes for the process filesystem
         app.add_api_route(
             "/processes/{process_id}/files",
@@ -159,6 +194,9 @@ class AgentMachine(Specable[MachineSpec]):
         if self.app:
             for program in self.agent_controllers:
                 await program.stop(self.app)
+            await OpenAIConnectionHandler.close_all()
+            DocumentProcessPool.shutdown_all()
+            LexicalIndex.close_all()
             await self.memory.stop()
             self.app = None
 
@@ -234,47 +272,66 @@ class AgentMachine(Specable[MachineSpec]):
             skip: int = 0,
             limit: Annotated[int, Field(ge=1, le=100)] = 100,
             sort: Literal["ascending", "descending"] = "ascending",
+            cursor: Optional[str] = None,
+            agent: Optional[str] = None,
+            state: Optional[str] = None,
+            parent_process_id: Optional[str] = None,
     ):
         """
-        List all processes. Supports paging and sorting
+        List all processes. Supports filtering by agent, state and parent process, sorting, and paging.
+        Pages are fetched by following `next`, which carries a cursor of the last process returned.
         """
         security: SecurityManager = AgentOS.security_manager
-        child_pids = await AgentCallHistory.get_child_pids()
-        processes_acc = []
-        async for process_ in ProcessDoc.find(
-                query={}, projection={"data": 0}, sort=dict(updated=1 if sort == "ascending" else -1)
-        ):
-            process_ = cast(ProcessDoc, process_)
+        direction = 1 if sort == "ascending" else -1
+        query = {}
+        if agent:
+            query["agent"] = agent
+        if state:
+            query["state"] = state
+        if parent_process_id:
+            query["_id"] = {"$in": [pid async for pid in AgentCallHistory.get_children(parent_process_id)]}
+        after = None
+        if cursor:
             try:
-                await security.check_permissions("read", process_.agent, process_.record_id)
-                if skip > 0:
-                    skip -= 1
-                else:
-                    controller = self._get_agent_controller(process_.agent)
-                    if not controller:
-                        logger.error(
-                            f"Could not find agent {process_.agent}, in {self.agent_controllers}, skipping process"
-                        )
-                    else:
-                        summary = StateSummary(
-                            agent=process_.agent,
-                            process_id=process_.record_id,
-                            state=process_.state,
-                            available_actions=controller.get_available_actions(process_.state),
-                            title=process_.title,
-                            created=process_.created,
-                            updated=process_.updated,
-                        )
-                        if summary.process_id in child_pids:
-                            summary.parent_process_id = child_pids[summary.process_id]
-                        processes_acc.append(summary)
-            except PermissionException:
-                logger.debug(f"Skipping process {process_.record_id} due to lack of permissions")
+                after = _decode_cursor(cursor)
+            except ValueError:
+                return JSONResponse(content={"detail": "Invalid cursor"}, status_code=400)
+            query["updated"] = {"$gte" if direction == 1 else "$lte": after[0]}
 
+        processes_acc = []
+        last_process = None
+        found = ProcessDoc.find(query=query, projection={"data": 0}, sort=dict(updated=direction, _id=direction))
+        async for process_ in _readable_processes(security, found, after, direction, limit):
+            if skip > 0:
+                skip -= 1
+                continue
+            controller = self._get_agent_controller(process_.agent)
+            if not controller:
+                logger.error(f"Could not find agent {process_.agent}, in {self.agent_controllers}, skipping process")
+                continue
+            processes_acc.append(
+                StateSummary(
+                    agent=process_.agent,
+                    process_id=process_.record_id,
+                    state=process_.state,
+                    available_actions=controller.get_available_actions(process_.state),
+                    title=process_.title,
+                    created=process_.created,
+                    updated=process_.updated,
+                )
+            )
+            last_process = process_
             if len(processes_acc) >= limit:
                 break
 
-        next_page_url = f"{request.url}/processes/?limit={limit}&skip={skip + limit}"
+        parent_pids = await AgentCallHistory.get_parent_pids([summary.process_id for summary in processes_acc])
+        for summary in processes_acc:
+            summary.parent_process_id = parent_pids.get(summary.process_id)
+
+        next_page_url = None
+        if len(processes_acc) >= limit:
+            next_cursor = _encode_cursor(last_process.updated, last_process.record_id)
+            next_page_url = str(request.url.remove_query_params("skip").include_query_params(cursor=next_cursor))
         return JSONResponse(
             ListProcessesResponse(
                 total=len(processes_acc),
@@ -290,7 +347,7 @@ class AgentMachine(Specable[MachineSpec]):
             logger.info(f"Process {process_id} does not exist")
             return JSONResponse(content={"detail": "Process Not Found"}, status_code=404)
         else:
-            child_pids = await AgentCallHistory.get_child_pids()
+            parent_pids = await AgentCallHistory.get_parent_pids([process_id])
             security: SecurityManager = AgentOS.security_manager
             await security.check_permissions("read", process_doc.agent, process_id)
             process_ = cast(ProcessDoc, process_doc)
@@ -308,8 +365,7 @@ class AgentMachine(Specable[MachineSpec]):
                 created=process_.created,
                 updated=process_.updated,
             )
-            if summary.process_id in child_pids:
-                summary.parent_process_id = child_pids[summary.process_id]
+            summary.parent_process_id = parent_pids.get(summary.process_id)
             return JSONResponse(content=summary.model_dump(), status_code=200)
 
     async def create_process(self, args: CreateProcessArgs):
@@ -354,6 +410,82 @@ class AgentMachine(Specable[MachineSpec]):
             return JSONResponse(content={"detail": "Agent not found"}, status_code=404)
         return await controller.get_process_events(process_id)
 
+    async def stream_process_events(
+            self,
+            process_id: str,
+            last_event_id: Annotated[Optional[int], Header(alias="Last-Event-ID")] = None,
+    ):
+        """
+        Subscribe to the events of a process. Events after the Last-Event-ID header are replayed, then the running
+        action (if any) is followed until it finishes.
+        """
+        process_doc: ProcessDoc = await ProcessDoc.find_one(query={"_id": process_id})
+        if not process_doc:
+            logger.info(f"Process {process_id} does not exist")
+            return JSONResponse(content={"detail": "Process Not Found"}, status_code=404)
+
+        controller = self._get_agent_controller(process_doc.agent)
+        if not controller:
+            logger.info(f"Agent {process_doc.agent} does not exist")
+            return JSONResponse(content={"detail": "Agent not found"}, status_code=404)
+        return await controller.stream_process_events(process_id, last_event_id)
+
+
+async def _readable_processes(
+    security: SecurityManager, found: AsyncIterable[ProcessDoc], after: Optional[Tuple[str, str]], direction, batch_size
+) -> AsyncIterator[ProcessDoc]:
+    """
+    Yields the processes the user may read, in order. Process permissions are checked a batch at a time, so each page
+    only looks up the grants of the processes it actually visits.
+    """
+    readable_agents = {}
+    batch = []
+
+    async def flush():
+        allowed = await security.authorized_processes({"read"}, {p.record_id: p.agent for p in batch})
+        readable = [p for p in batch if p.record_id in allowed]
+        batch.clear()
+        return readable
+
+    async for process_ in found:
+        process_ = cast(ProcessDoc, process_)
+        if after and process_.updated == after[0] and (
+                process_.record_id == after[1] or (process_.record_id > after[1]) != (direction == 1)
+        ):
+            continue
+        if process_.agent not in readable_agents:
+            readable_agents[process_.agent] = await _can_read_agent(security, process_.agent)
+        if not readable_agents[process_.agent]:
+            logger.debug(f"Skipping process {process_.record_id} due to lack of permissions")
+            continue
+        batch.append(process_)
+        if len(batch) >= batch_size:
+            for readable in await flush():
+                yield readable
+    if batch:
+        for readable in await flush():
+            yield readable
+
+
+async def _can_read_agent(security: SecurityManager, agent: str) -> bool:
+    try:
+        await security.check_permissions("read", agent)
+        return True
+    except PermissionException:
+        return False
+
+
+def _encode_cursor(updated: str, process_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([updated, process_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        updated, process_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+    return updated, process_id
+
 
 @contextmanager
 def error_logger(filename: str = None):
@@ -0,0 +1,153 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from eidolon_ai_client.events import StreamEvent
+from eidolon_ai_client.util.logger import logger
+from eidolon_ai_sdk.system.processes import last_stored_event_id
+
+
+class _Subscriber:
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue[Optional[Tuple[int, StreamEvent]]] = asyncio.Queue(max_queue)
+        self.closed = False
+        self.dropped = False
+
+    def close(self):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass  # the subscriber stops once it has drained its queue
+
+
+class ProcessEventBuffer:
+    """
+    The most recent events of one process, numbered with ids that increase monotonically across all of the process's
+    actions, and broadcast to every subscriber following the process.
+
+    The same ids are used for SSE event ids and for the stored events, so a client whose connection dropped can resume
+    from its Last-Event-ID out of this buffer, or out of the stored events once they have aged out of it.
+
+    Each subscriber gets a bounded queue. Publishing never waits on subscribers, so a subscriber whose queue is full
+    is dropped rather than holding up the action or the other subscribers. A dropped follower catches up from the
+    buffer and subscribes again. If the events it missed have already been evicted, it stops so the caller can resume
+    from the stored events.
+    """
+
+    def __init__(
+        self,
+        process_id: str,
+        next_id: int,
+        capacity: int,
+        max_subscriber_queue: int = 256,
+    ):
+        self.process_id = process_id
+        self.next_id = next_id
+        self.running = False
+        self.max_subscriber_queue = max_subscriber_queue
+        self._events: Deque[Tuple[int, StreamEvent]] = deque(maxlen=capacity)
+        self._subscribers: List[_Subscriber] = []
+
+    @property
+    def oldest_id(self) -> int:
+        return self._events[0][0] if self._events else self.next_id
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def publish(self, event: StreamEvent) -> int:
+        event_id = self.next_id
+        self.next_id += 1
+        self._events.append((event_id, event))
+        for subscriber in [*self._subscribers]:
+            try:
+                subscriber.queue.put_nowait((event_id, event))
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping slow subscriber to process {self.process_id} events")
+                subscriber.dropped = True
+                self._unsubscribe(subscriber)
+        return event_id
+
+    def finish(self):
+        self.running = False
+        for subscriber in self._subscribers:
+            subscriber.close()
+        self._subscribers = []
+
+    def _unsubscribe(self, subscriber: _Subscriber):
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+        subscriber.close()
+
+    async def follow(self, after_id: int) -> AsyncIterator[Tuple[int, StreamEvent]]:
+        """
+        Yields the buffered events with ids greater than `after_id`, then new events as they are published, until the
+        running action finishes. Events that have already been evicted from the buffer are skipped, except that a
+        follower that fell behind and was dropped stops at the gap rather than skip the events it missed.
+        """
+        subscriber = None
+        try:
+            while True:
+                backlog = [(event_id, event) for event_id, event in self._events if event_id > after_id]
+                if not self.running:
+                    for item in backlog:
+                        yield item
+                    return
+
+                subscriber = _Subscriber(self.max_subscriber_queue)
+                self._subscribers.append(subscriber)
+                for event_id, event in backlog:
+                    yield event_id, event
+                    after_id = event_id
+                while not (subscriber.closed and subscriber.queue.empty()):
+                    item = await subscriber.queue.get()
+                    if item is None:
+                        break
+                    if item[0] > after_id:
+                        yield item
+                        after_id = item[0]
+                if not subscriber.dropped or self.oldest_id > after_id + 1:
+                    return
+        finally:
+            if subscriber:
+                self._unsubscribe(subscriber)
+
+
+class ProcessEventBuffers:
+    """
+    The event buffers of the processes of one agent. Buffers of running processes are always kept, and the buffers of
+    the `max_finished` most recently finished processes are kept so clients can catch up on their last events.
+    """
+
+    def __init__(self, agent: str, capacity: int = 1000, max_finished: int = 100):
+        self.agent = agent
+        self.capacity = capacity
+        self.max_finished = max_finished
+        self._buffers: Dict[str, ProcessEventBuffer] = OrderedDict()
+
+    def get(self, process_id: str) -> Optional[ProcessEventBuffer]:
+        return self._buffers.get(process_id)
+
+    async def open(self, process_id: str) -> ProcessEventBuffer:
+        buffer = self._buffers.pop(process_id, None)
+        if buffer is None:
+            last_id = await last_stored_event_id(self.agent, process_id)
+            buffer = ProcessEventBuffer(process_id, 0 if last_id is None else last_id + 1, self.capacity)
+        self._buffers[process_id] = buffer
+        buffer.running = True
+        return buffer
+
+    def close(self, process_id: str):
+        buffer = self._buffers.get(process_id)
+        if buffer:
+            buffer.finish()
+        finished = [pid for pid, b in self._buffers.items() if not b.running]
+        for pid in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._buffers[pid]
+
+    def discard(self, process_id: str):
+        buffer = self._buffers.pop(process_id, None)
+        if buffer:
+            buffer.finish()
@@ -1,19 +1,31 @@
+import asyncio
 import bson
 import logging
 from datetime import datetime
 from pydantic import BaseModel
+from pydantic_core import to_json
 from pymongo.errors import DuplicateKeyError
-from typing import ClassVar, Any, cast, AsyncIterable, Optional, Dict
+from typing import ClassVar, Any, cast, AsyncIterable, Optional, Dict, List, Tuple, Union
 
 from eidolon_ai_sdk.agent_os import AgentOS
-from eidolon_ai_client.events import StreamEvent
+from eidolon_ai_client.events import StreamEvent, StringOutputEvent
+from eidolon_ai_sdk.memory.index_registry import register_index
 
 
 class MongoDoc(BaseModel, extra="allow"):
     collection: ClassVar[str]
+    # each entry is the key list of one index, see register_index
+    indexes: ClassVar[List[List[Union[str, Tuple[str, int]]]]] = []
     created: str = None
     updated: str = None
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs):
+        super().__pydantic_init_subclass__(**kwargs)
+        if "indexes" in cls.__dict__:
+            for keys in cls.indexes:
+                register_index(cls.collection, *keys)
+
     @property
     def record_id(self):
         return self._id
@@ -65,6 +77,7 @@ class MongoDoc(BaseModel, extra="allow"):
 
 class ProcessDoc(MongoDoc):
     collection = "processes"
+    indexes = [["updated"], ["agent", "updated"]]
     metadata: dict = {}
     agent: str
     state: str
@@ -79,41 +92,198 @@ class ProcessDoc(MongoDoc):
         )
 
 
-async def store_events(agent: str, process_id: str, events: list[StreamEvent]):
+register_index("process_events", "__agent", "__process_id", "__create_time", "__event_id")
+
+
+_INSERT_CHUNK_SIZE = 500
+# the fields of stored events that are only used to query them, never returned
+_EVENT_PROJECTION = {"_id": 0, "__process_id": 0, "__agent": 0, "__create_time": 0}
+
+
+def _event_document(event: StreamEvent) -> Dict[str, Any]:
+    if type(event) is StringOutputEvent:
+        # token level output dominates the event volume and only holds json values, so skip pydantic serialization
+        doc = dict(event.__dict__)
+        doc["category"] = event.category.value
+    else:
+        doc = event.model_dump(mode="json")
+    if doc["stream_context"] is None:
+        del doc["stream_context"]
+    return doc
+
+
+def serialize_events(
+    agent: str,
+    process_id: str,
+    events: List[StreamEvent],
+    event_ids: List[int] = None,
+    last_event_ids: List[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Converts events to their stored form. Events are stored with json compatible values, without a stream_context
+    when they are root events, and with one creation time per batch; __event_id orders events within a batch. An event
+    merged from several streamed parts also records the id of its last part as __last_event_id.
+    """
+    create_time = datetime.now().timestamp()
+    event_ids = event_ids if event_ids is not None else list(range(len(events)))
+    stored_events = []
+    for event_id, last_event_id, event in zip(event_ids, last_event_ids or event_ids, events):
+        doc = _event_document(event)
+        doc["__process_id"] = process_id
+        doc["__agent"] = agent
+        doc["__create_time"] = create_time
+        doc["__event_id"] = event_id
+        if last_event_id != event_id:
+            doc["__last_event_id"] = last_event_id
+        stored_events.append(doc)
+    return stored_events
+
+
+async def store_events(
+    agent: str,
+    process_id: str,
+    events: list[StreamEvent],
+    event_ids: List[int] = None,
+    last_event_ids: List[int] = None,
+):
     try:
-        stored_events = []
-        for event_num, event in enumerate(events):
-            event_obj: Dict[str, Any] = {
-                **event.model_dump(),
-                "__process_id": process_id,
-                "__agent": agent,
-                "__create_time": datetime.now().timestamp(),
-                "__event_id": event_num,
-            }
-            event_obj["category"] = event_obj["category"].value
-            if hasattr(event_obj["event_type"], "value"):
-                event_obj["event_type"] = event_obj["event_type"].value
-            event_obj["category"] = str(event_obj["category"])
-            stored_events.append(event_obj)
-
-        await AgentOS.symbolic_memory.insert("process_events", stored_events)
+        stored_events = serialize_events(agent, process_id, events, event_ids, last_event_ids)
+        for i in range(0, len(stored_events), _INSERT_CHUNK_SIZE):
+            await AgentOS.symbolic_memory.insert("process_events", stored_events[i : i + _INSERT_CHUNK_SIZE])
     except Exception as e:
         # todo, depending on why this fails, we should try to store an error event. Connection vs parsing error
         logging.getLogger("eidolon").exception(f"Error storing events {e}")
 
 
-async def load_events(agent: str, process_id: str):
+class EventSink:
+    """
+    Write-behind persistence for the events of a single action.
+
+    Events are buffered, with consecutive StringOutputEvents of the same stream context merged, and the buffer is
+    written out whenever it reaches `max_events` events or `max_bytes` of content, and at least every `max_delay`
+    seconds while the action runs. This bounds the memory held per stream and makes events visible to
+    `load_events` while the action is still running.
+
+    Each event is added with the id it was streamed with, and a merged event is stored under the id of its first part
+    along with the id of its last part.
+    """
+
+    def __init__(
+        self,
+        agent: str,
+        process_id: str,
+        max_events: int = 100,
+        max_bytes: int = 64 * 1024,
+        max_delay: float = 1.0,
+    ):
+        self.agent = agent
+        self.process_id = process_id
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._pending: List[StreamEvent] = []
+        self._pending_ids: List[int] = []
+        self._pending_last_ids: List[int] = []
+        self._pending_bytes = 0
+        self._lock = asyncio.Lock()
+        self._closing = asyncio.Event()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, event: StreamEvent, event_id: int):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+        if (
+            isinstance(event, StringOutputEvent)
+            and self._pending
+            and isinstance(self._pending[-1], StringOutputEvent)
+            and event.stream_context == self._pending[-1].stream_context
+        ):
+            self._pending[-1].content += event.content
+            self._pending_last_ids[-1] = event_id
+        else:
+            # copy so that merging into the buffered event never changes what was yielded to the caller
+            self._pending.append(event.model_copy() if isinstance(event, StringOutputEvent) else event)
+            self._pending_ids.append(event_id)
+            self._pending_last_ids.append(event_id)
+        self._pending_bytes += (
+            len(event.content) if isinstance(event, StringOutputEvent) else len(event.model_dump_json())
+        )
+        if len(self._pending) >= self.max_events or self._pending_bytes >= self.max_bytes:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            events, event_ids, last_event_ids = self._pending, self._pending_ids, self._pending_last_ids
+            self._pending, self._pending_ids, self._pending_last_ids, self._pending_bytes = [], [], [], 0
+            await store_events(self.agent, self.process_id, events, event_ids, last_event_ids)
+
+    async def close(self):
+        """
+        Writes out any buffered events and stops the periodic flush.
+        """
+        self._closing.set()
+        if self._timer:
+            await self._timer
+        await self.flush()
+
+    async def _flush_periodically(self):
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+
+async def last_stored_event_id(agent: str, process_id: str) -> Optional[int]:
+    event = await AgentOS.symbolic_memory.find_one(
+        "process_events",
+        {"__agent": agent, "__process_id": process_id},
+        sort={"__create_time": -1, "__event_id": -1},
+    )
+    return event.get("__last_event_id", event["__event_id"]) if event else None
+
+
+async def load_event_records(agent: str, process_id: str) -> AsyncIterable[Tuple[int, int, dict[str, Any]]]:
+    """
+    Yields the stored events of a process in order, along with the ids of the first and last parts each was streamed
+    as. Events stored before the last part was recorded report their first id for both.
+    """
     query = {"__agent": agent, "__process_id": process_id}
     order = {"__create_time": 1, "__event_id": 1}
-    events = cast(AsyncIterable[dict[str, Any]], AgentOS.symbolic_memory.find("process_events", query, sort=order))
-
-    events_arr = [event async for event in events]
-    for event in events_arr:
-        del event["_id"]
-        del event["__process_id"]
-        del event["__create_time"]
-        del event["__event_id"]
-        del event["__agent"]
-        if not event["stream_context"]:
+    events = cast(
+        AsyncIterable[dict[str, Any]],
+        AgentOS.symbolic_memory.find("process_events", query, projection=_EVENT_PROJECTION, sort=order),
+    )
+    async for event in events:
+        event_id = event.pop("__event_id")
+        last_event_id = event.pop("__last_event_id", event_id)
+        if event.get("stream_context", True) is None:
+            # events stored before root stream contexts were omitted
             del event["stream_context"]
+        yield event_id, last_event_id, event
+
+
+async def load_events(agent: str, process_id: str):
+    events_arr = []
+    async for _, _, event in load_event_records(agent, process_id):
+        previous = events_arr[-1] if events_arr else None
+        if (
+            previous
+            and event["event_type"] == "string"
+            and previous["event_type"] == "string"
+            and event.get("stream_context") == previous.get("stream_context")
+        ):
+            # string output may have been flushed in several batches while streaming
+            previous["content"] += event["content"]
+        else:
+            events_arr.append(event)
     return events_arr
+
+
+async def load_events_json(agent: str, process_id: str) -> bytes:
+    """
+    The stored events of a process, encoded as a json array ready to be served.
+    """
+    return to_json(await load_events(agent, process_id))
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, ClassVar, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one. The first caller of a key runs the call, callers of the same key
+    that arrive while it is in flight await its result instead of making the call again.
+
+    The call runs in its own task so the callers that are sharing it are not affected if the first caller is cancelled.
+    Named instances are registered so their counters can be reported by the machine.
+    """
+
+    instances: ClassVar[Dict[str, "SingleFlight"]] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.hits = 0
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        SingleFlight.instances[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            self.calls += 1
+            task = asyncio.create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # marks the exception retrieved when every caller was cancelled
+
+    def stats(self) -> Dict[str, int]:
+        return dict(calls=self.calls, hits=self.hits, in_flight=len(self._in_flight))
+
+    @classmethod
+    def all_stats(cls) -> Dict[str, Dict[str, int]]:
+        return {name: instance.stats() for name, instance in cls.instances.items()}
+
+
+def request_key(*parts: Any) -> str:
+    """
+    A stable key for a request made of json serializable parts.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
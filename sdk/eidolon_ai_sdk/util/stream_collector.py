@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Optional, AsyncIterator, List, Callable
+import asyncio
+import time
+from typing import Optional, AsyncIterator, List, Callable, Tuple
 
 from eidolon_ai_client.events import (
     BaseStreamEvent,
@@ -90,3 +92,76 @@ def stream_manager(
 
 class ManagedContextError(Exception):
     pass
+
+
+_END_OF_STREAM = object()
+
+
+async def coalesce_string_events(
+    stream: AsyncIterator[Tuple[int, StreamEvent]], max_delay: float, max_bytes: int
+) -> AsyncIterator[Tuple[int, StreamEvent]]:
+    """
+    Merges runs of (id, event) pairs holding StringOutputEvents of the same stream context into one event, tagged with
+    the id of the last event merged into it so a client resuming from that id does not receive any part twice.
+
+    A merged event is emitted once a different event arrives, its utf-8 encoded content reaches `max_bytes`, or
+    `max_delay` seconds after it was started, whether or not another part has arrived by then. A `max_delay` of 0
+    disables merging.
+    """
+    if max_delay <= 0:
+        async for item in stream:
+            yield item
+        return
+
+    # the stream is read by a task of its own so merged events can be emitted on time while the next part is awaited
+    queue: asyncio.Queue = asyncio.Queue(1)
+
+    async def read():
+        try:
+            async for item in stream:
+                await queue.put(item)
+            await queue.put(_END_OF_STREAM)
+        except Exception as e:
+            await queue.put(e)
+
+    reader = asyncio.create_task(read())
+    pending_id, pending, pending_bytes, deadline = None, None, 0, 0.0
+    try:
+        while True:
+            if pending is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    yield pending_id, pending
+                    pending = None
+                    continue
+            if item is _END_OF_STREAM or isinstance(item, Exception):
+                if pending is not None:
+                    yield pending_id, pending
+                if item is _END_OF_STREAM:
+                    return
+                raise item
+            event_id, event = item
+            if isinstance(event, StringOutputEvent):
+                if pending is not None and pending.stream_context == event.stream_context:
+                    pending.content += event.content
+                    pending_bytes += len(event.content.encode())
+                    pending_id = event_id
+                else:
+                    if pending is not None:
+                        yield pending_id, pending
+                    pending_id, pending = event_id, event.model_copy()
+                    pending_bytes, deadline = len(event.content.encode()), time.monotonic() + max_delay
+                if pending_bytes >= max_bytes:
+                    yield pending_id, pending
+                    pending = None
+            else:
+                if pending is not None:
+                    yield pending_id, pending
+                    pending = None
+                yield event_id, event
+    finally:
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import time
+import tracemalloc
+from typing import List
+
+import pymupdf
+
+import pytest
+
+from eidolon_ai_sdk.agent.doc_manager.document_processor import DocumentProcessor, DocumentProcessorSpec
+from eidolon_ai_sdk.agent.doc_manager.loaders.base_loader import FileInfo
+from eidolon_ai_sdk.agent.doc_manager.parsers.base_parser import DataBlob
+from eidolon_ai_sdk.agent.doc_manager.parsers.pdf_parsers import PyPDFParser
+from eidolon_ai_sdk.agent.doc_manager.process_pool import DocumentProcessPool, _parse_and_split
+from eidolon_ai_sdk.agent.doc_manager.parsers.text_parsers import TextParser
+from eidolon_ai_sdk.agent.doc_manager.transformer.text_splitters import RecursiveCharacterTextSplitter
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.lexical_index import LexicalIndex
+from eidolon_ai_sdk.system.reference_model import Reference
+from eidolon_ai_sdk.util.class_utils import fqn
+
+
+class RecordingSimilarityMemory:
+    def __init__(self):
+        self.docs = {}
+        self.added: List[str] = []
+        self.deleted: List[str] = []
+        self.batches: List[int] = []
+
+    async def add(self, collection, docs):
+        self.batches.append(len(docs))
+        self.added.extend(doc.page_content for doc in docs)
+        self.docs.update({doc.id: doc.page_content for doc in docs})
+
+    async def delete(self, collection, doc_ids):
+        self.deleted.extend(self.docs.pop(doc_id) for doc_id in doc_ids)
+
+
+@pytest.fixture
+def similarity(machine, monkeypatch):
+    memory = RecordingSimilarityMemory()
+    monkeypatch.setattr(AgentOS, "similarity_memory", memory)
+    return memory
+
+
+def _processor(chunk_size=10, parser=TextParser, **kwargs) -> DocumentProcessor:
+    return DocumentProcessor(
+        spec=DocumentProcessorSpec(
+            parser=Reference(implementation=fqn(parser)),
+            splitter=Reference(implementation=fqn(RecursiveCharacterTextSplitter), chunk_size=chunk_size),
+            **kwargs,
+        )
+    )
+
+
+def _file(*paragraphs: str) -> FileInfo:
+    data = DataBlob.from_bytes(data="\n\n".join(paragraphs).encode(), mimetype="text/plain", path="file.txt")
+    return FileInfo(path="file.txt", metadata=dict(version=len(paragraphs)), data=data)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "book.pdf"
+    with pymupdf.open() as book:
+        for page in range(300):
+            book.new_page().insert_text((72, 72), f"page {page} " + "lorem ipsum dolor sit amet " * 60)
+        book.save(path)
+    return FileInfo(path="book.pdf", metadata={}, data=DataBlob.from_path(str(path)))
+
+
+@pytest.fixture
+def process_pool():
+    yield
+    DocumentProcessPool.shutdown_all()
+
+
+async def _record():
+    return await AgentOS.symbolic_memory.find_one("doc_sync_test", {"file_path": "file.txt"})
+
+
+class TestDocumentProcessor:
+    async def test_replace_only_reindexes_changed_chunks(self, similarity):
+        processor = _processor()
+        await processor.addFile("doc_sync_test", _file("aaaaaaa", "bbbbbbb", "ccccccc"))
+        before = await _record()
+        similarity.added = []
+
+        await processor.replaceFile("doc_sync_test", _file("aaaaaaa", "ddddddd", "ccccccc", "aaaaaaa"))
+        after = await _record()
+        assert similarity.added == ["ddddddd", "aaaaaaa"]
+        assert similarity.deleted == ["bbbbbbb"]
+        assert after["doc_ids"][0] == before["doc_ids"][0] and after["doc_ids"][2] == before["doc_ids"][2]
+        assert [similarity.docs[doc_id] for doc_id in after["doc_ids"]] == ["aaaaaaa", "ddddddd", "ccccccc", "aaaaaaa"]
+        assert after["chunk_hashes"][0] == after["chunk_hashes"][3]
+        assert after["data"] == dict(version=4)
+
+    async def test_replace_updates_the_start_of_moved_chunks(self, similarity):
+        processor = _processor()
+        await processor.addFile("doc_sync_test", _file("aaaaaaa", "bbbbbbb"))
+        before = await _record()
+        assert before["chunk_starts"] == [0, 9]
+        similarity.added = []
+
+        await processor.replaceFile("doc_sync_test", _file("ccccccc", "aaaaaaa", "bbbbbbb"))
+        after = await _record()
+        assert similarity.added == ["ccccccc", "aaaaaaa", "bbbbbbb"]
+        assert similarity.deleted == []
+        assert after["doc_ids"][1:] == before["doc_ids"]
+        assert after["chunk_starts"] == [0, 9, 18]
+
+        similarity.added = []
+        await processor.replaceFile("doc_sync_test", _file("ccccccc", "aaaaaaa", "bbbbbbb"))
+        assert similarity.added == []
+
+    async def test_replace_without_incremental_updates_reindexes_everything(self, similarity):
+        processor = _processor(incremental_updates=False)
+        await processor.addFile("doc_sync_test", _file("aaaaaaa", "bbbbbbb"))
+        similarity.added = []
+        await processor.replaceFile("doc_sync_test", _file("aaaaaaa", "ccccccc"))
+        assert similarity.added == ["aaaaaaa", "ccccccc"]
+        assert sorted(similarity.deleted) == ["aaaaaaa", "bbbbbbb"]
+
+    async def test_replace_records_without_hashes_reindexes_everything(self, similarity):
+        processor = _processor()
+        await processor.addFile("doc_sync_test", _file("aaaaaaa", "bbbbbbb"))
+        record = await _record()
+        del record["chunk_hashes"]
+        await AgentOS.symbolic_memory.delete("doc_sync_test", {"file_path": "file.txt"})
+        await AgentOS.symbolic_memory.insert_one("doc_sync_test", record)
+        similarity.added = []
+        await processor.replaceFile("doc_sync_test", _file("aaaaaaa", "ccccccc"))
+        assert similarity.added == ["aaaaaaa", "ccccccc"]
+        assert "chunk_hashes" in await _record()
+
+    async def test_keeps_the_lexical_index_in_sync(self, similarity, monkeypatch):
+        monkeypatch.setattr(LexicalIndex, "_collections", {})
+        processor = _processor(lexical_index=dict(directory="processor_lexical"))
+        await processor.addFile("doc_sync_test", _file("aaaaaaa", "bbbbbbb"))
+        [(doc_id, _)] = await processor.lexical_index.search("doc_sync_test", "bbbbbbb", 10)
+        assert similarity.docs[doc_id] == "bbbbbbb"
+
+        await processor.replaceFile("doc_sync_test", _file("aaaaaaa", "ccccccc"))
+        assert await processor.lexical_index.search("doc_sync_test", "bbbbbbb", 10) == []
+        assert len(await processor.lexical_index.search("doc_sync_test", "aaaaaaa ccccccc", 10)) == 2
+        await processor.removeFile("doc_sync_test", "file.txt")
+        assert await processor.lexical_index.search("doc_sync_test", "aaaaaaa ccccccc", 10) == []
+
+    async def test_process_execution_matches_threads(self, similarity, process_pool):
+        file = _file("aaaaaaa", "bbbbbbb", "ccccccc")
+        threaded = await _processor()._parse_and_split(file)
+        processed = await _processor(execution="process", processes=2)._parse_and_split(file)
+        assert [(d.page_content, d.metadata) for d in processed] == [(d.page_content, d.metadata) for d in threaded]
+        assert len({d.id for d in processed}) == 3
+
+    async def test_process_execution_keeps_the_file_encoding(self, similarity, process_pool):
+        data = DataBlob.from_bytes(data="café crème".encode("latin-1"), mimetype="text/plain", path="file.txt")
+        data.encoding = "latin-1"
+        file = FileInfo(path="file.txt", metadata={}, data=data)
+        processed = await _processor(execution="process", processes=1)._parse_and_split(file)
+        assert [d.page_content for d in processed] == ["café crème"]
+
+    def test_workers_receive_components_once(self, process_pool):
+        key, components = _processor(execution="process", processes=1).components
+        assert _parse_and_split(key, None, b"aaaaaaa", "text/plain", "file.txt", "utf-8") is None
+        assert len(_parse_and_split(key, components, b"aaaaaaa", "text/plain", "file.txt", "utf-8")) == 1
+        assert len(_parse_and_split(key, None, b"bbbbbbb\n\nccccccc", "text/plain", "file.txt", "utf-8")) == 2
+
+    @pytest.mark.skipif(
+        "EIDOLON_PROCESS_BENCHMARK_FILES" not in os.environ,
+        reason="set EIDOLON_PROCESS_BENCHMARK_FILES to run benchmarks",
+    )
+    async def test_process_execution_benchmark(self, similarity, process_pool):
+        count = int(os.environ["EIDOLON_PROCESS_BENCHMARK_FILES"])
+        files = [_file(*[f"word{i} " * 20 + str(j) for j in range(2000)]) for i in range(count)]
+        rates = {}
+        for execution in ("thread", "process"):
+            processor = _processor(chunk_size=1000, execution=execution, processes=4)
+            await DocumentProcessPool.ready(4)
+            await asyncio.gather(*[processor._parse_and_split(file) for file in files[:4]])
+            start = time.perf_counter()
+            await asyncio.gather(*[processor._parse_and_split(file) for file in files])
+            rates[execution] = len(files) / (time.perf_counter() - start)
+        assert rates["process"] > rates["thread"]
+
+    async def test_streams_files_in_bounded_batches(self, similarity, pdf):
+        await _processor(chunk_size=500, parser=PyPDFParser).addFile("doc_sync_test", pdf)
+        whole = similarity.added
+        await AgentOS.symbolic_memory.delete("doc_sync_test", {"file_path": "book.pdf"})
+        similarity.added, similarity.batches = [], []
+
+        await _processor(chunk_size=500, parser=PyPDFParser, stream_batch_size=8).addFile("doc_sync_test", pdf)
+        assert similarity.added == whole
+        assert max(similarity.batches) == 8 and len(similarity.batches) > 1
+        record = await AgentOS.symbolic_memory.find_one("doc_sync_test", {"file_path": "book.pdf"})
+        assert [similarity.docs[doc_id] for doc_id in record["doc_ids"]] == whole
+
+    async def test_streaming_memory_does_not_grow_with_pages(self, similarity, pdf):
+        peaks = {}
+        for name, batch_size in (("whole file", None), ("streamed", 8)):
+            processor = _processor(chunk_size=500, parser=PyPDFParser, stream_batch_size=batch_size)
+            tracemalloc.start()
+            async for _ in processor._chunk_batches(pdf):
+                pass
+            peaks[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        assert peaks["streamed"] * 4 < peaks["whole file"]
+
+    async def test_failed_cleanup_does_not_hide_the_failure(self, similarity, monkeypatch):
+        async def fail(*args, **kwargs):
+            raise RuntimeError("similarity memory is down")
+
+        monkeypatch.setattr(similarity, "add", fail)
+        monkeypatch.setattr(similarity, "delete", fail)
+        processor = _processor()
+        warnings = []
+        monkeypatch.setattr(processor.logger, "warning", lambda msg, **kwargs: warnings.append(msg))
+        await processor.addFile("doc_sync_test", _file("aaaaaaa"))
+        await processor.replaceFile("doc_sync_test", _file("bbbbbbb"))
+        assert await _record() is None
+        assert (
+            warnings
+            == [
+                "Failed to parse file file.txt (similarity memory is down)",
+                "Failed to remove the chunks of file.txt from doc_sync_test (similarity memory is down)",
+            ]
+            * 2
+        )
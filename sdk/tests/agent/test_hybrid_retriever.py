@@ -0,0 +1,40 @@
+import pytest
+
+from eidolon_ai_sdk.agent.retriever_agent.document_retriever import HybridRetriever, HybridRetrieverSpec
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.document import Document
+from eidolon_ai_sdk.memory.lexical_index import LexicalIndex
+from eidolon_ai_sdk.memory.vector_store import QueryItem
+
+
+class FixedSimilarityMemory:
+    # every question finds the same chunks, closest first
+    def __init__(self, distances):
+        self.distances = distances
+
+    async def embed_texts(self, texts):
+        return [[0.0] for _ in texts]
+
+    async def raw_query_many(self, collection, queries, num_results):
+        items = [QueryItem(id=doc_id, score=score, embedding=None) for doc_id, score in self.distances.items()]
+        return [items[:num_results] for _ in queries]
+
+
+@pytest.fixture
+def retriever(machine, monkeypatch):
+    monkeypatch.setattr(LexicalIndex, "_collections", {})
+    monkeypatch.setattr(AgentOS, "similarity_memory", FixedSimilarityMemory(dict(a=0.1, b=0.2, c=0.3)))
+    return HybridRetriever(spec=HybridRetrieverSpec(lexical_index=dict(directory="hybrid")))
+
+
+async def test_fuses_vector_and_lexical_results(retriever):
+    await retriever.lexical_index.add(
+        "docs",
+        [
+            Document(id="c", page_content="raises ERR_4012 when parse_pdf fails"),
+            Document(id="d", page_content="ERR_4012 is also logged"),
+        ],
+    )
+    [fused, vector_only] = await retriever.search("docs", ["what raises ERR_4012", "anything"], 4)
+    assert list(fused) == ["c", "a", "b", "d"]
+    assert list(vector_only) == ["a", "b", "c"]
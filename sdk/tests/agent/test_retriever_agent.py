@@ -8,6 +8,7 @@ from eidolon_ai_sdk.agent.doc_manager.loaders.s3_loader import S3Loader
 from eidolon_ai_sdk.agent.retriever_agent.retriever_agent import RetrieverAgent
 from eidolon_ai_sdk.system.reference_model import Reference
 from eidolon_ai_sdk.system.resources.agent_resource import AgentResource
+from eidolon_ai_sdk.system.resources.reference_resource import ReferenceResource
 from eidolon_ai_sdk.system.resources.resources_base import Metadata
 from eidolon_ai_sdk.util.class_utils import fqn
 
@@ -84,8 +85,17 @@ class TestRetrieverAgent:
         )
 
     @pytest.fixture(scope="class")
-    async def agent(self, retriever, retrieverNoStore, retrieverS3, retrieverAzure, run_app) -> Agent:
-        async with run_app(retriever, retrieverNoStore, retrieverS3, retrieverAzure):
+    def embedding(self):
+        # the cassettes were recorded embedding one text per request
+        return ReferenceResource(
+            apiVersion="eidolon/v1",
+            metadata=Metadata(name="Embedding"),
+            spec=dict(implementation="OpenAIEmbedding", batch_size=1),
+        )
+
+    @pytest.fixture(scope="class")
+    async def agent(self, retriever, retrieverNoStore, retrieverS3, retrieverAzure, embedding, run_app) -> Agent:
+        async with run_app(retriever, retrieverNoStore, retrieverS3, retrieverAzure, embedding):
             yield Agent.get("RetrieverAgentWithStore")
 
     async def test_list_files(self, agent):
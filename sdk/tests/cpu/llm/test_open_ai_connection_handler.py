@@ -0,0 +1,97 @@
+import asyncio
+import importlib.util
+import time
+
+import dill
+import pytest
+
+from azure.core.credentials import AccessToken
+from pydantic import ValidationError
+
+from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import (
+    OpenAIConnectionHandler,
+    OpenAIConnectionHandlerSpec,
+    CachedTokenProvider,
+)
+from eidolon_ai_sdk.memory.embeddings import OpenAIEmbedding, OpenAIEmbeddingSpec
+from eidolon_ai_sdk.system.reference_model import Reference
+
+
+def _handler(**kwargs):
+    return OpenAIConnectionHandler(OpenAIConnectionHandlerSpec(api_key="sk-test", **kwargs))
+
+
+class FakeCredential:
+    def __init__(self, expires_in):
+        self.expires_in = expires_in
+        self.calls = 0
+
+    def get_token(self, *scopes):
+        self.calls += 1
+        return AccessToken(f"token-{self.calls}", int(time.time() + self.expires_in))
+
+
+class TestOpenAIConnectionHandler:
+    async def test_reuses_one_pooled_client(self):
+        handler = _handler(max_connections=7)
+        client = handler.client()
+        assert handler.client() is client
+        assert client._client._transport._pool._max_connections == 7
+        await OpenAIConnectionHandler.close_all()
+        assert client._client.is_closed
+        assert handler.client() is not client
+        await handler.close()
+
+    def test_extra_fields_are_passed_to_client(self):
+        client = _handler(base_url="http://localhost:1234/v1").makeClient()
+        assert str(client.base_url) == "http://localhost:1234/v1/"
+
+    async def test_pickles_without_client(self):
+        handler = _handler()
+        handler.client()
+        restored = dill.loads(dill.dumps(handler))
+        assert restored._client is None
+        assert restored.client() is not handler.client()
+        await OpenAIConnectionHandler.close_all()
+
+    def test_http2_requires_h2(self, monkeypatch):
+        assert _handler(http2=True).spec.http2
+        monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+        with pytest.raises(ValidationError, match="h2"):
+            _handler(http2=True)
+
+    async def test_openai_embedding_uses_pooled_client(self):
+        embedding = OpenAIEmbedding(
+            OpenAIEmbeddingSpec(connection_handler=Reference[OpenAIConnectionHandler](api_key="sk-test"))
+        )
+        await embedding.start()
+        assert embedding.connection_handler.client() is embedding.connection_handler.client()
+        await OpenAIConnectionHandler.close_all()
+
+    async def test_shares_identical_non_streaming_completions(self):
+        handler = _handler()
+        calls = []
+
+        async def completion(**kwargs):
+            calls.append(kwargs)
+            await asyncio.sleep(0.01)
+            return object()
+
+        handler._completion = completion
+        request = dict(model="gpt", messages=[dict(role="user", content="hi")])
+        results = await asyncio.gather(*[handler.completion(**request) for _ in range(3)])
+        assert len(calls) == 1 and len(set(map(id, results))) == 1
+        await asyncio.gather(*[handler.completion(**request, stream=True) for _ in range(3)])
+        assert len(calls) == 4
+
+
+class TestCachedTokenProvider:
+    def test_reuses_token_until_it_nears_expiry(self):
+        credential = FakeCredential(expires_in=3600)
+        provider = CachedTokenProvider(credential, ["scope"])
+        assert provider() == provider() == "token-1"
+
+        credential.expires_in = 60
+        provider._token = None
+        assert provider() == "token-2"
+        assert provider() == "token-3"
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from eidolon_ai_client.events import FileHandle
+from eidolon_ai_sdk.apu.llm.rate_limiter import LLMRateLimiter, LLMRateLimiterSpec, RateLimit
+from eidolon_ai_sdk.apu.llm_message import UserMessage, UserMessageText, UserMessageImage, SystemMessage
+
+
+def _limiter(max_wait=60.0, **limits):
+    return LLMRateLimiter(LLMRateLimiterSpec(limits={k: RateLimit(**v) for k, v in limits.items()}, max_wait=max_wait))
+
+
+class TestLLMRateLimiter:
+    async def test_unlimited_keys_do_not_wait(self):
+        limiter = _limiter()
+        for _ in range(100):
+            await asyncio.wait_for(limiter.acquire("gpt-4", 1_000_000), 1)
+        assert limiter.stats() == {}
+
+    async def test_requests_wait_for_budget_in_order(self):
+        limiter = _limiter(gpt=dict(requests_per_minute=600))  # one request every 0.1 seconds
+        for _ in range(600):
+            await limiter.acquire("gpt", 1)
+        finished = []
+
+        async def call(i):
+            await limiter.acquire("gpt", 1)
+            finished.append(i)
+
+        calls = [asyncio.create_task(call(i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert limiter.queue_depths() == {"gpt": 3}
+        await asyncio.gather(*calls)
+        assert finished == [0, 1, 2]
+        assert limiter.queue_depths() == {"gpt": 0}
+
+    async def test_fails_when_budget_exceeds_max_wait(self):
+        limiter = _limiter(max_wait=0.5, gpt=dict(tokens_per_minute=6000))
+        await limiter.acquire("gpt", 6000)
+        with pytest.raises(HTTPException) as e:
+            await limiter.acquire("gpt", 1000)  # 10 seconds of tokens
+        assert e.value.status_code == 429
+        assert e.value.headers["Retry-After"] == "10"
+        await asyncio.wait_for(limiter.acquire("gpt", 10), 1)
+        assert limiter.stats()["gpt"]["queue_depth"] == 0
+
+    async def test_calls_larger_than_the_budget_wait_for_a_full_bucket(self):
+        limiter = _limiter(gpt=dict(tokens_per_minute=100))
+        await asyncio.wait_for(limiter.acquire("gpt", 10_000), 1)
+        assert limiter.stats()["gpt"]["available_tokens"] == 0
+
+    def test_estimates_tokens(self):
+        limiter = _limiter()
+        messages = [
+            SystemMessage(content="x" * 100),
+            UserMessage(
+                content=[
+                    UserMessageText(text="y" * 40),
+                    UserMessageImage(file=FileHandle(machineURL="http://localhost", process_id="p", file_id="f")),
+                ]
+            ),
+        ]
+        estimate = limiter.estimate_tokens(messages)
+        assert 10 + 765 + 25 <= estimate < 10 + 765 + 50
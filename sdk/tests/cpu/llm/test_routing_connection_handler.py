@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError, RateLimitError
+
+from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import OpenAIConnectionHandler
+from eidolon_ai_sdk.apu.llm.routing_connection_handler import RoutingConnectionHandler, RoutingConnectionHandlerSpec
+from eidolon_ai_sdk.system.reference_model import Reference
+from eidolon_ai_sdk.util.class_utils import fqn
+
+
+def _error(cls, status):
+    response = httpx.Response(status, request=httpx.Request("POST", "http://test"), headers={"retry-after": "120"})
+    return cls("error", response=response, body=None)
+
+
+class FakeStream:
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.closed = False
+
+    async def _chunks(self):
+        await asyncio.sleep(self.delay)
+        for i in range(3):
+            yield f"{self.name}{i}"
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeHandler(OpenAIConnectionHandler):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.calls = 0
+        self.streams = []
+
+    async def completion(self, **kwargs):
+        self.calls += 1
+        error = self.spec.model_extra.get("error")
+        if error == "throttle":
+            raise _error(RateLimitError, 429)
+        if error == "bad_request":
+            raise _error(BadRequestError, 400)
+        self.streams.append(FakeStream(self.spec.model_extra["name"], self.spec.model_extra.get("delay", 0)))
+        return self.streams[-1]
+
+
+def _router(*endpoints, **kwargs) -> RoutingConnectionHandler:
+    handlers = [Reference[OpenAIConnectionHandler](implementation=fqn(FakeHandler), **e) for e in endpoints]
+    return RoutingConnectionHandler(RoutingConnectionHandlerSpec(handlers=handlers, **kwargs))
+
+
+async def _complete(router):
+    return [chunk async for chunk in await router.completion(stream=True)]
+
+
+class TestRoutingConnectionHandler:
+    async def test_fails_over_and_ejects_throttled_endpoint(self):
+        router = _router(dict(name="a", error="throttle"), dict(name="b"))
+        router.endpoints[0].time_to_first_token = 0.001
+        router.endpoints[1].time_to_first_token = 100
+        for _ in range(5):
+            assert await _complete(router) == ["b0", "b1", "b2"]
+        throttled = router.endpoints[0]
+        assert throttled.handler.calls == 1
+        assert throttled.ejected_until > time.monotonic() + 60  # honors retry-after
+        assert throttled.error_rate > 0
+        assert all(s.closed for s in router.endpoints[1].handler.streams)
+
+    async def test_does_not_retry_request_errors(self):
+        router = _router(dict(name="a", error="bad_request"), dict(name="b", error="bad_request"))
+        with pytest.raises(BadRequestError):
+            await router.completion(stream=True)
+        assert sum(e.handler.calls for e in router.endpoints) == 1
+        assert all(e.ejected_until == 0 for e in router.endpoints)
+
+    async def test_prefers_endpoint_with_faster_first_token(self):
+        router = _router(dict(name="slow", delay=0.05), dict(name="fast"))
+        router.endpoints[0].time_to_first_token = 0.05
+        router.endpoints[1].time_to_first_token = 0.001
+        for _ in range(20):
+            await _complete(router)
+        assert router.endpoints[1].handler.calls > router.endpoints[0].handler.calls
+
+    async def test_hedges_slow_first_token(self):
+        router = _router(dict(name="slow", delay=5), dict(name="fast"), hedge_after=0.05)
+        slow, fast = router.endpoints
+        slow.time_to_first_token = 0.001
+        fast.time_to_first_token = 100
+        start = time.perf_counter()
+        assert await _complete(router) == ["fast0", "fast1", "fast2"]
+        assert time.perf_counter() - start < 1
+        assert slow.handler.streams[0].closed
+        assert slow.time_to_first_token > 0.001
@@ -25,6 +25,13 @@ def r(name, **kwargs):
 
 resources = [
     r("simple", actions=[dict(allow_file_upload=True)]),
+    # the cassettes were recorded embedding one text per request
+    Resource(
+        apiVersion="eidolon/v1",
+        kind="Reference",
+        metadata=Metadata(name="Embedding"),
+        spec=dict(implementation="OpenAIEmbedding", batch_size=1),
+    ),
 ]
 
 
@@ -0,0 +1,125 @@
+import pytest
+from pydantic import BaseModel
+
+from eidolon_ai_client.events import LLMToolCallRequestEvent, ObjectOutputEvent, StringOutputEvent, ToolCall
+from eidolon_ai_sdk.apu.llm_cache import (
+    CachingLLMUnit,
+    CachingLLMUnitSpec,
+    InMemoryLLMResponseCache,
+    InMemoryLLMResponseCacheSpec,
+    SymbolicMemoryLLMResponseCache,
+    SymbolicMemoryLLMResponseCacheSpec,
+)
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.apu.llm_message import SystemMessage, UserMessage, UserMessageText
+from eidolon_ai_sdk.apu.llm_unit import LLMUnit
+from eidolon_ai_sdk.apu.processing_unit import ProcessingUnit
+from eidolon_ai_sdk.memory.index_registry import registered_indexes
+from eidolon_ai_sdk.system.reference_model import Reference, Specable
+from eidolon_ai_sdk.util.class_utils import fqn
+
+
+class FakeLLMSpec(BaseModel):
+    temperature: float = 0.0
+    fail: bool = False
+
+
+class FakeLLM(LLMUnit, Specable[FakeLLMSpec]):
+    calls = 0
+
+    def __init__(self, **kwargs):
+        ProcessingUnit.__init__(self, **kwargs)
+        Specable.__init__(self, **kwargs)
+        self.model = None
+        self.temperature = self.spec.temperature
+
+    async def execute_llm(self, messages, tools, output_format):
+        FakeLLM.calls += 1
+        yield StringOutputEvent(content="Hello, ")
+        yield StringOutputEvent(content="world")
+        if self.spec.fail:
+            raise RuntimeError("stream broke")
+        yield LLMToolCallRequestEvent(tool_call=ToolCall(tool_call_id="t1", name="search", arguments=dict(q="x")))
+        yield ObjectOutputEvent(content=dict(done=True))
+
+
+def _unit(cache=None, **llm) -> CachingLLMUnit:
+    cache = cache or Reference(implementation=fqn(InMemoryLLMResponseCache))
+    return CachingLLMUnit(spec=CachingLLMUnitSpec(llm_unit=Reference(implementation=fqn(FakeLLM), **llm), cache=cache))
+
+
+async def _run(unit, content="hi", output_format="str"):
+    messages = [SystemMessage(content="be brief"), UserMessage(content=[UserMessageText(text=content)])]
+    return [e async for e in unit.execute_llm(messages, [], output_format)]
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    FakeLLM.calls = 0
+
+
+class TestCachingLLMUnit:
+    async def test_replays_identical_requests(self):
+        unit = _unit()
+        first = await _run(unit)
+        second = await _run(unit)
+        assert FakeLLM.calls == 1
+        assert (unit.hits, unit.misses) == (1, 1)
+        assert "".join(e.content for e in second if isinstance(e, StringOutputEvent)) == "Hello, world"
+        assert [e.event_type for e in second] == ["string", "llm_tool_call_request", "object"]
+        assert second[1:] == first[2:]
+
+    async def test_key_covers_request_and_unit_config(self):
+        unit = _unit()
+        await _run(unit)
+        await _run(unit, content="other")
+        await _run(unit, output_format=dict(type="object"))
+        await _run(_unit(temperature=0.7))
+        assert FakeLLM.calls == 4
+
+    async def test_does_not_cache_failed_streams(self):
+        unit = _unit(fail=True)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await _run(unit)
+        assert FakeLLM.calls == 2
+
+
+class TestLLMResponseCaches:
+    async def test_in_memory_evicts_least_recently_used(self):
+        cache = InMemoryLLMResponseCache(InMemoryLLMResponseCacheSpec(max_entries=2))
+        await cache.put("a", [])
+        await cache.put("b", [])
+        await cache.get("a")
+        await cache.put("c", [])
+        assert await cache.get("b") is None
+        assert await cache.get("a") == []
+
+    async def test_in_memory_expires_entries(self):
+        cache = InMemoryLLMResponseCache(InMemoryLLMResponseCacheSpec(ttl=0.001))
+        await cache.put("a", [])
+        cache._entries["a"] = (0, [])
+        assert await cache.get("a") is None
+
+    async def test_symbolic_memory_cache(self, machine):
+        unit = _unit(Reference(implementation=fqn(SymbolicMemoryLLMResponseCache), max_entries=1, eviction_interval=1))
+        await _run(unit)
+        assert len(await _run(unit)) == 3
+        await _run(unit, content="other")
+        await _run(unit)
+        assert FakeLLM.calls == 3
+        assert {spec.name for spec in registered_indexes() if spec.collection == "llm_response_cache"} == {
+            "key_1",
+            "last_used_1",
+        }
+
+    async def test_symbolic_memory_cache_evicts_periodically(self, machine):
+        cache = SymbolicMemoryLLMResponseCache(
+            SymbolicMemoryLLMResponseCacheSpec(collection="periodic_cache", max_entries=2, eviction_interval=3)
+        )
+        for key in "abcd":
+            await cache.put(key, [])
+        assert await AgentOS.symbolic_memory.count("periodic_cache", {}) == 3
+        await cache.put("e", [])
+        await cache.put("f", [])
+        assert [await cache.get(key) is not None for key in "abcdef"] == [False] * 4 + [True] * 2
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Any, List
+
+from pydantic import Field
+
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.document import Document
+from eidolon_ai_sdk.memory.embedding_cache import CachingEmbedding, CachingEmbeddingSpec
+from eidolon_ai_sdk.memory.embeddings import Embedding, EmbeddingSpec
+from eidolon_ai_sdk.memory.index_registry import registered_indexes
+from eidolon_ai_sdk.system.reference_model import Reference, Specable
+from eidolon_ai_sdk.util.class_utils import fqn
+
+
+class LengthEmbeddingSpec(EmbeddingSpec):
+    model: str = Field("length")
+
+
+class LengthEmbedding(Embedding, Specable[LengthEmbeddingSpec]):
+    embedded: List[str] = []
+
+    async def embed_text(self, text: str, **kwargs: Any) -> List[float]:
+        return (await self.embed_texts([text]))[0]
+
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        LengthEmbedding.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+
+def _cache(**kwargs) -> CachingEmbedding:
+    LengthEmbedding.embedded = []
+    embedder = Reference(implementation=fqn(LengthEmbedding), **kwargs.pop("embedder", {}))
+    return CachingEmbedding(CachingEmbeddingSpec(embedder=embedder, **kwargs))
+
+
+class TestCachingEmbedding:
+    async def test_reuses_embeddings_of_known_text(self):
+        cache = _cache(persistent=False)
+        assert await cache.embed_text("abc") == [3.0]
+        docs = [Document(id=str(i), page_content=text) for i, text in enumerate(["abc", "de", "de"])]
+        embedded = {d.id: d.embedding async for d in cache.embed(docs)}
+        assert embedded == {"0": [3.0], "1": [2.0], "2": [2.0]}
+        assert LengthEmbedding.embedded == ["abc", "de"]
+        assert (cache.hits, cache.misses) == (2, 2)
+
+    async def test_evicts_least_recently_used(self):
+        cache = _cache(persistent=False, max_entries=2)
+        await cache.embed_texts(["a", "b"])
+        await cache.embed_text("a")
+        await cache.embed_text("c")
+        await cache.embed_texts(["a", "b"])
+        assert LengthEmbedding.embedded == ["a", "b", "c", "b"]
+
+    async def test_key_covers_embedder_model(self):
+        cache = _cache(persistent=False)
+        other = _cache(persistent=False, embedder=dict(model="other"))
+        assert cache.cache_key("a") != other.cache_key("a")
+        assert cache.cache_key("a") != cache.cache_key("b")
+
+    async def test_persists_embeddings_in_symbolic_memory(self, machine):
+        await _cache().embed_texts(["abc", "de"])
+        restarted = _cache()
+        assert await restarted.embed_texts(["de", "fghi", "abc"]) == [[2.0], [4.0], [3.0]]
+        assert LengthEmbedding.embedded == ["fghi"]
+
+    async def test_bounds_concurrent_writes(self, machine, monkeypatch):
+        upsert_one = AgentOS.symbolic_memory.upsert_one
+        in_flight = max_in_flight = 0
+
+        async def counting_upsert(*args, **kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.001)
+            try:
+                return await upsert_one(*args, **kwargs)
+            finally:
+                in_flight -= 1
+
+        monkeypatch.setattr(AgentOS.symbolic_memory, "upsert_one", counting_upsert)
+        cache = _cache(collection="bounded_embedding_cache", max_concurrent_writes=3)
+        await cache.embed_texts(["x" * i for i in range(1, 21)])
+        assert max_in_flight == 3
+        assert await AgentOS.symbolic_memory.count("bounded_embedding_cache", {}) == 20
+        assert "key_1" in {spec.name for spec in registered_indexes() if spec.collection == "bounded_embedding_cache"}
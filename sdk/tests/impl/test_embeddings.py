@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List
+
+import httpx
+import openai
+import pytest
+
+from eidolon_ai_sdk.apu.llm.open_ai_connection_handler import OpenAIConnectionHandler
+from eidolon_ai_sdk.memory.document import Document
+from eidolon_ai_sdk.memory.embeddings import Embedding, EmbeddingSpec, OpenAIEmbedding, OpenAIEmbeddingSpec
+from eidolon_ai_sdk.system.reference_model import Reference
+
+
+class CountingEmbedding(Embedding):
+    def __init__(self, spec: EmbeddingSpec, failures: int = 0, error: Exception = ConnectionError("flaky")):
+        super().__init__(spec)
+        self.error = error
+        self.batches: List[List[str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failures = failures
+
+    async def embed_text(self, text: str, **kwargs: Any) -> List[float]:
+        return (await self.embed_texts([text]))[0]
+
+    async def embed_texts(self, texts: List[str], **kwargs: Any) -> List[List[float]]:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if self.failures:
+                self.failures -= 1
+                raise self.error
+            self.batches.append(texts)
+            return [[float(len(text))] for text in texts]
+        finally:
+            self.in_flight -= 1
+
+
+def _response(status: int) -> httpx.Response:
+    return httpx.Response(status, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+
+
+def _docs(n, size=10):
+    return [Document(id=str(i), page_content="x" * size, metadata=dict(i=i)) for i in range(n)]
+
+
+async def _embed(embedding, docs):
+    return {d.id: d async for d in embedding.embed(docs)}
+
+
+class TestEmbedding:
+    async def test_packs_documents_into_batches(self):
+        embedding = CountingEmbedding(EmbeddingSpec(batch_size=100, max_concurrency=3))
+        embedded = await _embed(embedding, _docs(1000))
+        assert len(embedding.batches) == 10
+        assert embedding.max_in_flight == 3
+        assert embedded["7"].embedding == [10.0] and embedded["7"].metadata == dict(i=7)
+
+    async def test_limits_estimated_tokens_per_batch(self):
+        embedding = CountingEmbedding(EmbeddingSpec(max_batch_tokens=100, chars_per_token=1))
+        await _embed(embedding, _docs(10, size=30) + _docs(1, size=500))
+        assert sorted(len(b) for b in embedding.batches) == [1, 1, 3, 3, 3]
+
+    async def test_retries_failed_batches(self):
+        embedding = CountingEmbedding(EmbeddingSpec(max_retries=2), failures=2)
+        assert len(await _embed(embedding, _docs(5))) == 5
+
+    async def test_raises_after_retries(self):
+        embedding = CountingEmbedding(EmbeddingSpec(max_retries=0), failures=1)
+        with pytest.raises(ConnectionError):
+            await _embed(embedding, _docs(5))
+
+    async def test_retries_rate_limits_and_server_errors(self):
+        for status in [429, 503]:
+            error = openai.APIStatusError("failed", response=_response(status), body=None)
+            embedding = CountingEmbedding(EmbeddingSpec(max_retries=1), failures=1, error=error)
+            assert len(await _embed(embedding, _docs(5))) == 5
+
+    async def test_does_not_retry_request_errors(self):
+        error = openai.BadRequestError("invalid input", response=_response(400), body=None)
+        embedding = CountingEmbedding(EmbeddingSpec(max_retries=3), failures=1, error=error)
+        with pytest.raises(openai.BadRequestError):
+            await _embed(embedding, _docs(5))
+        assert embedding.failures == 0 and embedding.batches == []
+
+
+class TestOpenAIEmbedding:
+    async def test_sends_batches_and_lone_texts_as_strings(self, monkeypatch):
+        inputs = []
+
+        async def create(input, model):
+            inputs.append(input)
+            texts = [input] if isinstance(input, str) else input
+            return SimpleNamespace(
+                data=[SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(texts)]
+            )
+
+        embedding = OpenAIEmbedding(
+            OpenAIEmbeddingSpec(connection_handler=Reference[OpenAIConnectionHandler](api_key="sk-test"), batch_size=2)
+        )
+        await embedding.start()
+        client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+        monkeypatch.setattr(embedding.connection_handler, "client", lambda: client)
+        assert await embedding.embed_texts(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+        assert inputs == [["a", "bb"], "ccc"]
@@ -0,0 +1,103 @@
+import pytest
+from bson.errors import InvalidDocument
+
+from eidolon_ai_sdk.memory.file_symbolic_memory import FileSymbolicMemory, FileSymbolicMemoryConfig
+
+
+@pytest.fixture
+def memory_factory(tmp_path):
+    def fn(**kwargs):
+        return FileSymbolicMemory(FileSymbolicMemoryConfig(root_dir=str(tmp_path), **kwargs))
+
+    return fn
+
+
+async def _all(memory, collection, query=None):
+    return [doc async for doc in memory.find(collection, query or {}, sort={"n": 1})]
+
+
+class TestFileSymbolicMemory:
+    async def test_persists_across_restarts(self, memory_factory):
+        memory = memory_factory()
+        await memory.start()
+        await memory.insert("events", [{"_id": str(i), "process_id": "p1", "n": i} for i in range(3)])
+        await memory.upsert_one("events", {"n": 10}, {"_id": "1"})
+        await memory.delete("events", {"_id": "2"})
+        await memory.stop()
+
+        restarted = memory_factory()
+        await restarted.start()
+        assert await _all(restarted, "events", {"process_id": "p1"}) == [
+            {"_id": "0", "process_id": "p1", "n": 0},
+            {"_id": "1", "process_id": "p1", "n": 10},
+        ]
+        await restarted.stop()
+
+    async def test_replays_log_after_crash(self, memory_factory, tmp_path):
+        memory = memory_factory()
+        await memory.start()
+        await memory.insert_one("processes", {"_id": "a", "n": 1})
+        await memory.update_many("processes", {"_id": "a"}, {"state": "running"})
+        # simulate a crash: no stop, no compaction, and a torn write at the end of the log
+        memory._log_file.write(b"\x01\x02\x03\x04\x40\x00")
+        memory._log_file.close()
+
+        restarted = memory_factory()
+        await restarted.start()
+        assert await restarted.find_one("processes", {"_id": "a"}) == {"_id": "a", "n": 1, "state": "running"}
+        await restarted.insert_one("processes", {"_id": "b", "n": 2})
+        await restarted.stop()
+
+        again = memory_factory()
+        await again.start()
+        assert [doc["_id"] for doc in await _all(again, "processes")] == ["a", "b"]
+        await again.stop()
+
+    async def test_compacts_log_into_snapshot(self, memory_factory, tmp_path):
+        memory = memory_factory(snapshot_interval=5)
+        await memory.start()
+        for i in range(12):
+            await memory.insert_one("events", {"_id": str(i), "n": i})
+            if memory._compaction:
+                await memory._compaction
+        assert (tmp_path / "snapshot.bson").exists()
+        assert len(list(tmp_path.glob("oplog-*.bson"))) == 1
+        assert memory._log_count == 2
+        memory._log_file.close()
+
+        restarted = memory_factory(snapshot_interval=5)
+        await restarted.start()
+        assert [doc["n"] for doc in await _all(restarted, "events")] == list(range(12))
+        await restarted.stop()
+
+    async def test_replays_logs_written_while_compacting(self, memory_factory, tmp_path):
+        memory = memory_factory()
+        await memory.start()
+        await memory.insert_one("events", {"_id": "a", "n": 1})
+        # simulate a crash after the log was rotated but before the snapshot was written
+        memory._rotate_log()
+        await memory.insert_one("events", {"_id": "b", "n": 2})
+        memory._log_file.close()
+        assert sorted(p.name for p in tmp_path.glob("oplog-*.bson")) == ["oplog-0.bson", "oplog-1.bson"]
+
+        restarted = memory_factory()
+        await restarted.start()
+        assert [doc["_id"] for doc in await _all(restarted, "events")] == ["a", "b"]
+        await restarted.stop()
+        assert [p.name for p in tmp_path.glob("oplog-*.bson")] == ["oplog-2.bson"]
+
+    async def test_unencodable_writes_leave_memory_unchanged(self, memory_factory):
+        memory = memory_factory()
+        await memory.start()
+        await memory.insert_one("events", {"_id": "a", "n": 1})
+        with pytest.raises(InvalidDocument):
+            await memory.insert_one("events", {"_id": "b", "n": object()})
+        with pytest.raises(InvalidDocument):
+            await memory.update_many("events", {"_id": "a"}, {"n": object()})
+        assert await _all(memory, "events") == [{"_id": "a", "n": 1}]
+        await memory.stop()
+
+    async def test_corrupt_snapshot_raises(self, memory_factory, tmp_path):
+        (tmp_path / "snapshot.bson").write_bytes(b"not a snapshot")
+        with pytest.raises(ValueError, match="corrupt"):
+            await memory_factory().start()
@@ -0,0 +1,143 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.document import Document
+from eidolon_ai_sdk.memory.lexical_index import (
+    LexicalIndex,
+    LexicalIndexSpec,
+    decode_postings,
+    encode_postings,
+    tokenize,
+)
+
+
+def _index(**kwargs) -> LexicalIndex:
+    return LexicalIndex(spec=LexicalIndexSpec(**kwargs))
+
+
+def _docs(*texts: str):
+    return [Document(id=str(i), page_content=text) for i, text in enumerate(texts)]
+
+
+def _ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+@pytest.fixture
+def fresh_collections(machine, monkeypatch):
+    monkeypatch.setattr(LexicalIndex, "_collections", {})
+
+
+class TestLexicalIndex:
+    def test_tokenize_keeps_identifiers_and_their_parts(self):
+        assert tokenize("call get_docs on DocumentProcessor, E1234") == [
+            "call",
+            "get_docs",
+            "get",
+            "docs",
+            "on",
+            "documentprocessor",
+            "document",
+            "processor",
+            "e1234",
+            "e",
+            "1234",
+        ]
+
+    def test_postings_round_trip(self):
+        lists = [[0, 1, 2], [], [5, 200, 70_000, 2**31], [3]]
+        bounds = np.concatenate([[0], np.cumsum([len(docs) for docs in lists])])
+        data, offsets = encode_postings(np.asarray([d for docs in lists for d in docs], dtype=np.int64), bounds)
+        assert offsets[-1] == len(data) < 8 * bounds[-1]
+        decoded = [decode_postings(data[offsets[i] : offsets[i + 1]]).tolist() for i in range(len(lists))]
+        assert decoded == lists
+
+    async def test_ranks_by_bm25(self, fresh_collections):
+        index = _index()
+        await index.add("c", _docs("the cat sat", "the dog ran after the dog", "error E1234 in parse_pdf", "the dog"))
+        assert _ids(await index.search("c", "dog", 10)) == ["3", "1"]
+        assert _ids(await index.search("c", "what raises E1234?", 10)) == ["2"]
+        assert _ids(await index.search("c", "parse pdf", 10)) == ["2"]
+        assert await index.search("c", "unknown words", 10) == []
+        assert _ids(await index.search("c", "the cat", 1)) == ["0"]
+
+    async def test_replaced_and_deleted_documents(self, fresh_collections):
+        index = _index()
+        await index.add("c", _docs("alpha beta", "beta gamma"))
+        await index.add("c", [Document(id="0", page_content="gamma")])
+        await index.delete("c", ["1"])
+        assert _ids(await index.search("c", "beta", 10)) == []
+        assert _ids(await index.search("c", "gamma", 10)) == ["0"]
+
+    async def test_reloads_from_log_and_segments(self, fresh_collections, monkeypatch):
+        index = _index(directory="lexical_reload", compact_after=3)
+        await index.add("c", _docs("alpha beta", "beta gamma"))
+        await index.delete("c", ["0"])
+        await index.add("c", [Document(id="2", page_content="alpha delta")])
+        assert [f.file_path async for f in AgentOS.file_memory.glob("lexical_reload/c/log-*")] == []
+        await index.add("c", [Document(id="3", page_content="alpha alpha")])
+
+        monkeypatch.setattr(LexicalIndex, "_collections", {})
+        reloaded = _index(directory="lexical_reload")
+        assert _ids(await reloaded.search("c", "alpha", 10)) == ["3", "2"]
+        assert _ids(await reloaded.search("c", "beta", 10)) == ["1"]
+        await reloaded.compact("c")
+        monkeypatch.setattr(LexicalIndex, "_collections", {})
+        assert _ids(await _index(directory="lexical_reload").search("c", "alpha beta", 10)) == ["1", "3", "2"]
+
+    async def test_picks_up_writes_of_other_processes(self, fresh_collections, monkeypatch):
+        index = _index(directory="lexical_shared", refresh_interval=60)
+        await index.add("c", _docs("alpha"))
+        this_process = LexicalIndex._collections
+        monkeypatch.setattr(LexicalIndex, "_collections", {})
+        await _index(directory="lexical_shared").add("c", [Document(id="1", page_content="beta")])
+
+        monkeypatch.setattr(LexicalIndex, "_collections", this_process)
+        assert _ids(await index.search("c", "beta", 10)) == []  # refreshed less than refresh_interval ago
+        await index.add("c", [Document(id="2", page_content="beta gamma")])
+        assert _ids(await index.search("c", "beta", 10)) == ["1", "2"]
+        logs = [f.file_path async for f in AgentOS.file_memory.glob("lexical_shared/c/log-*.json")]
+        assert len(logs) == 3
+
+        monkeypatch.setattr(LexicalIndex, "_collections", {})
+        assert _ids(await _index(directory="lexical_shared").search("c", "alpha beta", 10)) == ["0", "1", "2"]
+
+    @pytest.mark.skipif(
+        "EIDOLON_LEXICAL_BENCHMARK_SIZE" not in os.environ, reason="set EIDOLON_LEXICAL_BENCHMARK_SIZE to run benchmarks"
+    )
+    async def test_query_benchmark(self, fresh_collections):
+        size = int(os.environ["EIDOLON_LEXICAL_BENCHMARK_SIZE"])
+        rng = np.random.default_rng(3)
+        vocabulary = [f"w{i}" for i in range(50_000)]
+        words = np.minimum(rng.zipf(1.2, size=(size, 40)), len(vocabulary)) - 1
+        collection = _index()._collection("benchmark")
+        for start in range(0, size, 10_000):
+            entries = []
+            for num in range(start, min(size, start + 10_000)):
+                terms, counts = np.unique(words[num], return_counts=True)
+                entries.append((str(num), {vocabulary[t]: int(c) for t, c in zip(terms, counts)}))
+            collection.add(entries)
+        collection.restore(collection.snapshot())
+        collection.loaded = True
+        collection.refreshed = time.monotonic()
+
+        index = _index(refresh_interval=3600)
+        queries = [" ".join(vocabulary[t] for t in rng.integers(100, 50_000, 3)) for _ in range(200)]
+        await index.search_many("benchmark", queries, 10)
+        start = time.perf_counter()
+        results = [await index.search("benchmark", query, 10) for query in queries]
+        indexed = time.perf_counter() - start
+
+        doc_terms = [{vocabulary[t] for t in doc_words} for doc_words in words]
+        start = time.perf_counter()
+        expected = [[num for num in range(size) if set(query.split()) & doc_terms[num]] for query in queries]
+        scanned = time.perf_counter() - start
+
+        for found, matching in zip(results, expected):
+            assert set(_ids(found)) <= set(map(str, matching))
+            assert len(found) == min(10, len(matching))
+        assert indexed < scanned
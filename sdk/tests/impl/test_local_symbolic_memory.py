@@ -101,3 +101,48 @@ class TestLocalSymbolicMemory:
             await memory.upsert_one(
                 "collection", {"_id": "4"}, {"key": "updated_value", "updated": "2022-01-02T00:00:00"}
             )
+
+    @pytest.mark.asyncio
+    async def test_find_uses_secondary_index(self, memory):
+        await memory.insert("collection", [{"process_id": str(i % 3), "n": i} for i in range(9)])
+        found = [doc["n"] async for doc in memory.find("collection", {"process_id": "1"})]
+        assert found == [1, 4, 7]
+        assert "process_id" in LocalSymbolicMemory.db["collection"].indexed_keys
+
+    @pytest.mark.asyncio
+    async def test_index_tracks_updates_and_deletes(self, memory):
+        await memory.insert("collection", [{"_id": str(i), "thread_id": "a", "n": i} for i in range(3)])
+        assert await memory.count("collection", {"thread_id": "a"}) == 3
+        await memory.update_many("collection", {"_id": "1"}, {"thread_id": "b"})
+        await memory.delete("collection", {"_id": "2"})
+        assert [doc["n"] async for doc in memory.find("collection", {"thread_id": "a"})] == [0]
+        assert [doc["n"] async for doc in memory.find("collection", {"thread_id": "b"})] == [1]
+        assert await memory.find_one("collection", {"_id": "2"}) is None
+
+    @pytest.mark.asyncio
+    async def test_find_sorts_by_multiple_keys_and_skips(self, memory):
+        await memory.insert(
+            "collection",
+            [{"a": 1, "b": 2}, {"a": 2, "b": 1}, {"a": 1, "b": 1}, {"a": 2, "b": 2}, {"b": 3}],
+        )
+        found = [(doc.get("a"), doc["b"]) async for doc in memory.find("collection", {}, sort={"a": 1, "b": -1}, skip=1)]
+        assert found == [(1, 2), (1, 1), (2, 2), (2, 1)]
+        first = await memory.find_one("collection", {}, sort={"a": -1, "b": 1})
+        assert (first["a"], first["b"]) == (2, 1)
+
+    @pytest.mark.asyncio
+    async def test_insert_duplicate_within_batch(self, memory):
+        with pytest.raises(DuplicateKeyError):
+            await memory.insert("collection", [{"_id": "1"}, {"_id": "1"}])
+        assert len(LocalSymbolicMemory.db["collection"]) == 0
+
+    @pytest.mark.asyncio
+    async def test_comparison_operators(self, memory):
+        await memory.insert("collection", [{"_id": str(i), "n": i, "agent": "a" if i % 2 else "b"} for i in range(6)])
+        found = [doc["n"] async for doc in memory.find("collection", {"n": {"$gte": 2, "$lt": 5}, "agent": "a"})]
+        assert found == [3]
+        found = [doc["n"] async for doc in memory.find("collection", {"_id": {"$in": ["4", "1", "9"]}})]
+        assert found == [1, 4]
+        assert await memory.count("collection", {"agent": {"$in": ["a"]}, "n": {"$ne": 1}}) == 2
+        await memory.delete("collection", {"n": {"$gt": 3}})
+        assert await memory.count("collection", {}) == 4
@@ -0,0 +1,97 @@
+import asyncio
+from collections import defaultdict
+
+import pytest
+
+from eidolon_ai_sdk.memory.mongo_symbolic_memory import MongoSymbolicMemory, MongoSymbolicMemoryConfig, _shared_clients
+from eidolon_ai_sdk.system.processes import ProcessDoc  # noqa: F401, registers process indexes
+
+
+def _memory(**kwargs):
+    kwargs.setdefault("index_provisioning", "disabled")
+    return MongoSymbolicMemory(
+        MongoSymbolicMemoryConfig(mongo_connection_string="mongodb://shared-pool-test:1", **kwargs)
+    )
+
+
+class FakeCollection:
+    def __init__(self):
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    async def index_information(self):
+        return self.indexes
+
+    async def create_indexes(self, models):
+        for model in models:
+            self.indexes[model.document["name"]] = {"key": list(model.document["key"].items())}
+
+
+class TestMongoSymbolicMemoryClient:
+    async def test_memories_share_one_client(self):
+        first, second = _memory(max_pool_size=7), _memory(max_pool_size=7)
+        await first.start()
+        await second.start()
+        try:
+            assert first.database.client is second.database.client
+            assert first.database.client.options.pool_options.max_pool_size == 7
+        finally:
+            await first.stop()
+            await second.stop()
+        assert not any(key[0] == "mongodb://shared-pool-test:1" for key in _shared_clients)
+
+    async def test_new_tasks_reuse_client(self):
+        memory = _memory()
+        await memory.start()
+        try:
+            clients = await asyncio.gather(*[asyncio.create_task(self._client(memory)) for _ in range(5)])
+            assert all(c is memory.database.client for c in clients)
+            assert memory.pool_stats()["max_pool_size"] == 100
+        finally:
+            await memory.stop()
+
+    async def test_use_after_stop_does_not_reacquire_the_client(self):
+        memory = _memory()
+        await memory.start()
+        await memory.stop()
+        with pytest.raises(RuntimeError, match="has been stopped"):
+            _ = memory.database
+        assert not any(key[0] == "mongodb://shared-pool-test:1" for key in _shared_clients)
+
+        await memory.start()
+        try:
+            assert _shared_clients[memory._client_key].references == 1
+        finally:
+            await memory.stop()
+
+    @staticmethod
+    async def _client(memory):
+        return memory.database.client
+
+
+class TestIndexProvisioning:
+    async def test_dry_run_reports_without_creating(self, monkeypatch):
+        database = defaultdict(FakeCollection)
+        monkeypatch.setattr(MongoSymbolicMemory, "database", property(lambda self: database))
+        memory = _memory()
+        missing = await memory.provision_indexes(dry_run=True)
+        assert ("process_events", "__agent_1___process_id_1___create_time_1___event_id_1") in {
+            (spec.collection, spec.name) for spec in missing
+        }
+        assert list(database["process_events"].indexes) == ["_id_"]
+
+    async def test_creates_missing_indexes_once(self, monkeypatch):
+        database = defaultdict(FakeCollection)
+        monkeypatch.setattr(MongoSymbolicMemory, "database", property(lambda self: database))
+        memory = _memory()
+        assert await memory.provision_indexes()
+        assert "agent_1_updated_1" in database["processes"].indexes
+        assert await memory.missing_indexes() == []
+
+    async def test_tolerates_indexes_without_a_direction(self, monkeypatch):
+        database = defaultdict(FakeCollection)
+        database["processes"].indexes["title_text"] = {"key": [("_fts", "text"), ("_ftsx", 1.0)]}
+        database["processes"].indexes["agent_hashed"] = {"key": [("agent", "hashed")]}
+        monkeypatch.setattr(MongoSymbolicMemory, "database", property(lambda self: database))
+        memory = _memory()
+        await memory.provision_indexes()
+        assert await memory.missing_indexes() == []
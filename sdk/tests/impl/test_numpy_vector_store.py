@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.memory.document import Document, EmbeddedDocument
+from eidolon_ai_sdk.memory.file_system_vector_store import FileSystemVectorStore
+from eidolon_ai_sdk.memory.numpy_vector_store import NumpyVectorStore, NumpyVectorStoreSpec, _Collection
+
+
+def _store(tmp_path, **kwargs) -> NumpyVectorStore:
+    return NumpyVectorStore(NumpyVectorStoreSpec(path=str(tmp_path), **kwargs))
+
+
+def _docs(vectors, **metadata):
+    return [
+        EmbeddedDocument(id=str(i), embedding=list(map(float, v)), metadata=dict(i=i, parity=i % 2, **metadata))
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _ids(items):
+    return [item.id for item in items]
+
+
+class TestNumpyVectorStore:
+    async def test_queries_by_distance(self, tmp_path):
+        store = _store(tmp_path)
+        await store.add_embedding("c", _docs([[1, 0], [0, 1], [1, 1]]))
+        items = await store.raw_query("c", [1.0, 0.1], 3, include_embeddings=True)
+        assert _ids(items) == ["0", "2", "1"]
+        assert items[0].score == pytest.approx(1 - 1 / np.hypot(1, 0.1), abs=1e-6)
+        assert items[2].embedding == [0.0, 1.0] and items[2].metadata == dict(i=1, parity=1)
+
+    @pytest.mark.parametrize("metric", ["ip", "l2"])
+    async def test_metrics(self, tmp_path, metric):
+        store = _store(tmp_path, metric=metric)
+        await store.add_embedding("c", _docs([[1, 0], [3, 0]]))
+        items = await store.raw_query("c", [2.0, 0.0], 2)
+        if metric == "ip":
+            assert _ids(items) == ["1", "0"] and items[0].score == -5
+        else:
+            assert [item.score for item in items] == [1, 1]
+
+    async def test_upsert_delete_and_filter(self, tmp_path):
+        store = _store(tmp_path)
+        await store.add_embedding("c", _docs([[1, 0], [0, 1], [1, 1], [1, 0.5]]))
+        await store.add_embedding("c", [EmbeddedDocument(id="1", embedding=[1.0, 0.0], metadata=dict(parity=1))])
+        await store.delete_embedding("c", ["0"])
+        assert _ids(await store.raw_query("c", [1.0, 0.0], 10)) == ["1", "3", "2"]
+        assert _ids(await store.raw_query("c", [1.0, 0.0], 10, metadata_where=dict(parity=0))) == ["2"]
+        where = {"$or": [{"i": {"$in": [2, 3]}}, {"parity": {"$ne": 0}}]}
+        assert _ids(await store.raw_query("c", [1.0, 0.0], 10, metadata_where=where)) == ["1", "3", "2"]
+        assert await store.get_metadata("c", ["3", "0"]) == [dict(i=3, parity=1), {}]
+
+    async def test_reopens_from_log_and_compacted_files(self, tmp_path):
+        store = _store(tmp_path, compact_after=3)
+        await store.add_embedding("c", _docs([[1, 0], [0, 1]]))
+        await store.delete_embedding("c", ["0"])
+        assert len(list(tmp_path.glob("c/log-*.jsonl"))) == 1
+        await store.add_embedding("c", [EmbeddedDocument(id="2", embedding=[1.0, 1.0])])
+        store._collection("c").wait_for_compaction()
+        assert list(tmp_path.glob("c/log-*.jsonl")) == []
+        await store.add_embedding("c", [EmbeddedDocument(id="3", embedding=[1.0, 0.0])])
+
+        reopened = _store(tmp_path)
+        items = await reopened.raw_query("c", [1.0, 0.0], 10)
+        assert _ids(items) == ["3", "2", "1"]
+        assert isinstance(reopened._collection("c").base, np.memmap)
+
+    async def test_writes_during_compaction_are_kept(self, tmp_path, monkeypatch):
+        store = _store(tmp_path)
+        await store.add_embedding("c", _docs([[1, 0], [0, 1], [1, 1]]))
+        collection = store._collection("c")
+        pack_contents = _Collection._pack_contents
+
+        def write_while_packing(self, rows, generation):
+            # runs on another thread, so it would block if the compaction held the collection lock
+            writer = threading.Thread(
+                target=lambda: (
+                    collection.add(["3"], [{}], np.asarray([[1.0, 0.5]], dtype=np.float32)),
+                    collection.delete(["1"]),
+                )
+            )
+            writer.start()
+            writer.join(timeout=10)
+            assert not writer.is_alive()
+            pack_contents(self, rows, generation)
+
+        monkeypatch.setattr(_Collection, "_pack_contents", write_while_packing)
+        await store.compact("c")
+        assert collection.logged == 2
+        for reader in (store, _store(tmp_path)):
+            assert _ids(await reader.raw_query("c", [1.0, 0.0], 10)) == ["0", "3", "2"]
+
+    def test_appends_grow_buffers_by_capacity(self, tmp_path):
+        collection = _store(tmp_path)._collection("c")
+        for i in range(10):
+            collection.add([str(i)], [{}], np.asarray([[1.0, float(i)]], dtype=np.float32))
+        assert len(collection._tail) == len(collection._norms) == len(collection._alive) == 1024
+        assert len(collection.tail) == len(collection.norms) == len(collection.alive) == 10
+
+    async def test_batched_queries(self, tmp_path):
+        store = _store(tmp_path)
+        await store.add_embedding("c", _docs([[1, 0], [0, 1]]))
+        results = await store.raw_query_many("c", [[0.0, 1.0], [1.0, 0.0]], 1)
+        assert [_ids(items) for items in results] == [["1"], ["0"]]
+        assert await store.raw_query("missing", [1.0, 0.0], 1) == []
+
+    async def test_ivf_search_finds_nearest_neighbours(self, tmp_path):
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(20, 16))
+        vectors = (centers[rng.integers(0, 20, 4000)] + rng.normal(scale=0.05, size=(4000, 16))).astype(np.float32)
+        exact = _store(tmp_path / "exact", ivf_threshold=None)
+        ivf = _store(tmp_path / "ivf", ivf_threshold=1000, ivf_lists=20, ivf_probes=3)
+        for store in (exact, ivf):
+            await store.add_embedding("c", _docs(vectors))
+            await store.compact("c")
+        assert ivf._collection("c").centroids is not None
+
+        queries = vectors[:50] + rng.normal(scale=0.01, size=(50, 16))
+        expected = await exact.raw_query_many("c", queries.tolist(), 5)
+        found = await ivf.raw_query_many("c", queries.tolist(), 5)
+        recall = np.mean([len(set(_ids(e)) & set(_ids(f))) / 5 for e, f in zip(expected, found)])
+        assert recall > 0.9
+
+    async def test_inline_contents_survive_log_replay_and_compaction(self, tmp_path):
+        store = _store(tmp_path, compact_after=100)
+        await store.add_embedding("c", _docs([[1, 0], [0, 1]]), documents=["zero", "one"])
+        await store.add_embedding("c", [EmbeddedDocument(id="2", embedding=[1.0, 1.0])])
+        await store.set_contents("c", ["2"], ["two"])
+        assert await _store(tmp_path).get_contents("c", ["1", "2", "x"]) == ["one", "two", None]
+
+        await store.compact("c")
+        await store.add_embedding("c", [EmbeddedDocument(id="3", embedding=[1.0, 0.5])])
+        reopened = _store(tmp_path)
+        assert isinstance(reopened._collection("c").packed, np.memmap)
+        assert await reopened.get_contents("c", ["0", "2", "3"]) == ["zero", "two", None]
+
+    async def test_inline_page_content_migrates_files(self, tmp_path, machine):
+        files = _store(tmp_path, root_document_directory="migrate")
+        docs = [Document(id=str(i), page_content=f"text {i}", embedding=[1.0, float(i)]) for i in range(3)]
+        await files.add("c", docs)
+        assert await AgentOS.file_memory.exists("migrate/c/0")
+
+        inline = _store(tmp_path, root_document_directory="migrate", inline_page_content=True)
+        assert [d.page_content for d in await inline.query("c", [1.0, 0.0], 1)] == ["text 0"]
+        assert await AgentOS.file_memory.exists("migrate/c/0")
+        await inline.migrate_page_content("c", ["0", "1"])
+        assert not await AgentOS.file_memory.exists("migrate/c/1")
+        await inline.migrate_page_content("c", ["0", "1", "2"])
+        assert await inline.get_contents("c", ["0", "1", "2"]) == ["text 0", "text 1", "text 2"]
+        assert not await AgentOS.file_memory.exists("migrate/c/2")
+
+        await inline.add("c", [Document(id="3", page_content="text 3", embedding=[0.0, 1.0])])
+        assert not await AgentOS.file_memory.exists("migrate/c/3")
+        assert [d.page_content async for d in inline.get_docs("c", ["3", "1"])] == ["text 3", "text 1"]
+        await inline.delete("c", ["3"])
+        assert await inline.get_contents("c", ["3"]) == [None]
+
+    async def test_reads_race_with_migration(self, tmp_path, machine, monkeypatch):
+        files = _store(tmp_path, root_document_directory="race")
+        await files.add("c", [Document(id="0", page_content="text 0", embedding=[1.0, 0.0])])
+        inline = _store(tmp_path, root_document_directory="race", inline_page_content=True)
+        get_contents = inline.get_contents
+
+        async def migrated_after_read(collection, doc_ids):
+            found = await get_contents(collection, doc_ids)
+            monkeypatch.setattr(inline, "get_contents", get_contents)
+            await inline.migrate_page_content(collection, doc_ids)
+            return found
+
+        monkeypatch.setattr(inline, "get_contents", migrated_after_read)
+        assert await inline.get_page_contents("c", ["0"]) == ["text 0"]
+        assert not await AgentOS.file_memory.exists("race/c/0")
+
+    def test_inline_page_content_requires_a_store_that_can_set_contents(self, tmp_path):
+        class FilesOnlyStore(NumpyVectorStore):
+            set_contents = FileSystemVectorStore.set_contents
+
+        FilesOnlyStore(NumpyVectorStoreSpec(path=str(tmp_path)))
+        with pytest.raises(ValueError, match="FilesOnlyStore can not store page content inline"):
+            FilesOnlyStore(NumpyVectorStoreSpec(path=str(tmp_path), inline_page_content=True))
+
+    @pytest.mark.skipif(
+        "EIDOLON_VECTOR_BENCHMARK_SIZE" not in os.environ, reason="set EIDOLON_VECTOR_BENCHMARK_SIZE to run benchmarks"
+    )
+    async def test_query_benchmark_against_chroma(self, tmp_path):
+        pytest.importorskip("chromadb")
+        from eidolon_ai_sdk.memory.chroma_vector_store import ChromaVectorStore, ChromaVectorStoreConfig
+
+        size = int(os.environ["EIDOLON_VECTOR_BENCHMARK_SIZE"])
+        rng = np.random.default_rng(2)
+        vectors = rng.normal(size=(size, 64)).astype(np.float32)
+        queries = rng.normal(size=(20, 64)).astype(np.float32).tolist()
+        docs = _docs(vectors)
+
+        numpy_store = _store(tmp_path / "numpy", metric="l2")  # chroma's default space
+        chroma_store = ChromaVectorStore(ChromaVectorStoreConfig(url=f"file://{tmp_path / 'chroma'}"))
+        timings = {}
+        for name, store in (("numpy", numpy_store), ("chroma", chroma_store)):
+            for i in range(0, size, 5_000):
+                await store.add_embedding("benchmark", docs[i : i + 5_000])
+            start = time.perf_counter()
+            results = [await store.raw_query("benchmark", q, 10) for q in queries]
+            timings[name] = (time.perf_counter() - start, results)
+        exact = [
+            [str(i) for i in np.argsort(((vectors - np.asarray(q, dtype=np.float32)) ** 2).sum(axis=1))[:10]]
+            for q in queries
+        ]
+        assert [_ids(r) for r in timings["numpy"][1]] == exact
+        assert timings["numpy"][0] < timings["chroma"][0]
@@ -197,20 +197,17 @@ class TestHelloWorld:
 
     async def test_lots_o_context_streaming(self, agent):
         events = [e async for e in (await agent.create_process()).stream_action("lots_o_context")]
+        # adjacent string deltas of a context are merged into one frame
         assert events[2:-1] == [
-            StringOutputEvent(content="1"),
-            StringOutputEvent(content="2"),
+            StringOutputEvent(content="12"),
             StartStreamContextEvent(context_id="c1", title="c1"),
-            StringOutputEvent(content="3", stream_context="c1"),
-            StringOutputEvent(content="4", stream_context="c1"),
+            StringOutputEvent(content="34", stream_context="c1"),
             SuccessEvent(stream_context="c1"),
             EndStreamContextEvent(context_id="c1"),
             StartStreamContextEvent(context_id="c2", title="c2"),
-            StringOutputEvent(content="5", stream_context="c2"),
-            StringOutputEvent(content="6", stream_context="c2"),
+            StringOutputEvent(content="56", stream_context="c2"),
             StartStreamContextEvent(context_id="c3", stream_context="c2", title="c3"),
-            StringOutputEvent(content="7", stream_context="c2.c3"),
-            StringOutputEvent(content="8", stream_context="c2.c3"),
+            StringOutputEvent(content="78", stream_context="c2.c3"),
             SuccessEvent(stream_context="c2.c3"),
             EndStreamContextEvent(stream_context="c2", context_id="c3"),
             SuccessEvent(stream_context="c2"),
@@ -329,6 +326,31 @@ class TestStateMachine:
         assert processes.total == 3
         assert {p.process_id for p in processes.processes} == {second, third, first}
 
+    async def test_list_processes_filters_and_pages(self, client):
+        created = []
+        for desired_state in ["foo", "bar", "foo"]:
+            process = await run_program("StateMachine", "idle", json=dict(desired_state=desired_state, response="b"))
+            created.append(process.process_id)
+        other = (await run_program("StateMachine2", "idle", json=dict(desired_state="foo", response="b"))).process_id
+
+        resp = await client.get("/processes", params=dict(agent="StateMachine", state="foo"))
+        found = [p["process_id"] for p in resp.json()["processes"]]
+        assert [pid for pid in found if pid in created] == [created[0], created[2]]
+        assert other not in found
+
+        for sort, expected in [("ascending", created), ("descending", created[::-1])]:
+            seen = []
+            url = f"/processes?agent=StateMachine&limit=2&sort={sort}"
+            while url:
+                page = (await client.get(url)).json()
+                assert page["total"] <= 2
+                seen.extend(p["process_id"] for p in page["processes"])
+                url = page["next"]
+            assert len(seen) == len(set(seen))
+            assert [pid for pid in seen if pid in created] == expected
+
+        assert (await client.get("/processes", params=dict(cursor="nope"))).status_code == 400
+
     async def test_can_start(self):
         post = await run_program(
             "StateMachine", "idle", json=dict(desired_state="bar", response="low man on the totem pole")
@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 import httpx
 import pytest_asyncio
 from fastapi import Body, HTTPException
@@ -96,3 +99,43 @@ class TestHelloWorld:
 
         events = await process.events()
         self.compare_events(events, server_events)
+
+    async def _sse(self, client, url, **headers):
+        events = []
+        async with client.stream("GET", url, headers=headers) as resp:
+            assert resp.status_code == 200
+            event_id = None
+            async for line in resp.aiter_lines():
+                if line.startswith("id:"):
+                    event_id = int(line[3:].strip())
+                elif line.startswith("data:"):
+                    events.append((event_id, json.loads(line[5:].strip())))
+        return events
+
+    async def test_resume_stream_from_last_event_id(self, client):
+        process = await Agent.get("HelloWorld").create_process()
+        await process.action("idle_streaming", "world")
+
+        everything = await self._sse(client, f"/processes/{process.process_id}/events/stream")
+        assert [event_id for event_id, _ in everything] == sorted({event_id for event_id, _ in everything})
+        assert [e["event_type"] for _, e in everything][-1] == "success"
+        ids = [event_id for event_id, _ in everything]
+
+        url = f"/processes/{process.process_id}/events/stream"
+        assert await self._sse(client, url, **{"Last-Event-ID": str(ids[3])}) == everything[4:]
+
+    async def test_detached_action_fans_out_to_subscribers(self, client):
+        process = await Agent.get("HelloWorld").create_process()
+        resp = await client.post(
+            f"/processes/{process.process_id}/agent/HelloWorld/actions/idle_streaming",
+            json="world",
+            headers={"Prefer": "respond-async"},
+        )
+        assert resp.status_code == 202
+        assert resp.json()["process_id"] == process.process_id
+        url = resp.headers["Location"]
+
+        first, second = await asyncio.gather(self._sse(client, url), self._sse(client, url))
+        assert first == second
+        assert [e["event_type"] for _, e in first][-1] == "success"
+        assert (await process.status()).state == "terminated"
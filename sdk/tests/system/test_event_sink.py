@@ -0,0 +1,57 @@
+import asyncio
+
+from eidolon_ai_client.events import StringOutputEvent, SuccessEvent, UserInputEvent
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.system.processes import EventSink, last_stored_event_id, load_events
+
+
+async def _stored(process_id):
+    return [e async for e in AgentOS.symbolic_memory.find("process_events", {"__process_id": process_id})]
+
+
+class TestEventSink:
+    async def test_flushes_full_batches_while_open(self, machine):
+        sink = EventSink("agent", "p_count", max_events=2, max_delay=60)
+        await sink.add(UserInputEvent(input="hi"), 5)
+        assert await _stored("p_count") == []
+        await sink.add(StringOutputEvent(content="a"), 6)
+        assert [e["__event_id"] for e in await _stored("p_count")] == [5, 6]
+        await sink.add(SuccessEvent(), 7)
+        await sink.close()
+        assert [e["__event_id"] for e in await _stored("p_count")] == [5, 6, 7]
+
+    async def test_flushes_on_bytes_and_merges_strings(self, machine):
+        sink = EventSink("agent", "p_bytes", max_bytes=4, max_delay=60)
+        for event_id, token in enumerate(["ab", "c", "de", "f"]):
+            await sink.add(StringOutputEvent(content=token), event_id)
+        await sink.add(SuccessEvent(), 4)
+        await sink.close()
+        assert [(e["__event_id"], e.get("__last_event_id"), e.get("content")) for e in await _stored("p_bytes")] == [
+            (0, 2, "abcde"),
+            (3, None, "f"),
+            (4, None, None),
+        ]
+        assert [e["event_type"] for e in await load_events("agent", "p_bytes")] == ["string", "success"]
+        assert (await load_events("agent", "p_bytes"))[0]["content"] == "abcdef"
+
+    async def test_resumes_ids_after_a_merged_last_event(self, machine):
+        sink = EventSink("agent", "p_resume", max_delay=60)
+        for event_id, token in enumerate(["a", "b", "c"]):
+            await sink.add(StringOutputEvent(content=token), event_id)
+        await sink.close()
+        assert await last_stored_event_id("agent", "p_resume") == 2
+
+    async def test_flushes_after_delay(self, machine):
+        sink = EventSink("agent", "p_delay", max_delay=0.01)
+        await sink.add(StringOutputEvent(content="slow"), 0)
+        await asyncio.sleep(0.1)
+        assert [e["content"] for e in await _stored("p_delay")] == ["slow"]
+        await sink.close()
+
+    async def test_does_not_mutate_yielded_events(self, machine):
+        sink = EventSink("agent", "p_copy")
+        first = StringOutputEvent(content="a")
+        await sink.add(first, 0)
+        await sink.add(StringOutputEvent(content="b"), 1)
+        await sink.close()
+        assert first.content == "a"
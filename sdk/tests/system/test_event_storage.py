@@ -0,0 +1,85 @@
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+import pytest
+
+from eidolon_ai_client.events import (
+    AgentStateEvent,
+    ObjectOutputEvent,
+    StartStreamContextEvent,
+    StringOutputEvent,
+    SuccessEvent,
+    UserInputEvent,
+)
+from eidolon_ai_sdk.system.processes import load_events, load_events_json, serialize_events, store_events
+
+
+def _legacy_serialize_events(agent, process_id, events):
+    # the per event serialization store_events used before the compact format, kept as the benchmark baseline
+    stored_events = []
+    for event_num, event in enumerate(events):
+        event_obj: Dict[str, Any] = {
+            **event.model_dump(),
+            "__process_id": process_id,
+            "__agent": agent,
+            "__create_time": datetime.now().timestamp(),
+            "__event_id": event_num,
+        }
+        event_obj["category"] = event_obj["category"].value
+        if hasattr(event_obj["event_type"], "value"):
+            event_obj["event_type"] = event_obj["event_type"].value
+        event_obj["category"] = str(event_obj["category"])
+        stored_events.append(event_obj)
+    return stored_events
+
+
+def _events_per_second(fn, events):
+    start = time.perf_counter()
+    fn("agent", "process", events)
+    return len(events) / (time.perf_counter() - start)
+
+
+class TestEventStorage:
+    async def test_round_trips_events(self, machine):
+        events = [
+            UserInputEvent(input=dict(name="world")),
+            StartStreamContextEvent(context_id="c1", title="child"),
+            StringOutputEvent(content="nested", stream_context="c1"),
+            StringOutputEvent(content="Hello, "),
+            StringOutputEvent(content="world!"),
+            ObjectOutputEvent(content=dict(a=[1, 2])),
+            AgentStateEvent(state="terminated", available_actions=[]),
+            SuccessEvent(),
+        ]
+        await store_events("agent", "p_round_trip", events)
+        expected = []
+        for event in events:
+            dumped = json.loads(event.model_dump_json())
+            if dumped["stream_context"] is None:
+                del dumped["stream_context"]
+            expected.append(dumped)
+        expected[3]["content"] = "Hello, world!"
+        del expected[4]
+
+        assert await load_events("agent", "p_round_trip") == expected
+        assert json.loads(await load_events_json("agent", "p_round_trip")) == expected
+
+    async def test_stores_large_batches_in_chunks(self, machine):
+        events = [StringOutputEvent(content=str(i), stream_context=f"c{i % 2}") for i in range(1203)]
+        await store_events("agent", "p_chunks", events)
+        loaded = await load_events("agent", "p_chunks")
+        assert [e["content"] for e in loaded] == [str(i) for i in range(1203)]
+
+    @pytest.mark.skipif(
+        "EIDOLON_EVENT_BENCHMARK_SIZE" not in os.environ, reason="set EIDOLON_EVENT_BENCHMARK_SIZE to run benchmarks"
+    )
+    def test_serialization_benchmark(self):
+        events = []
+        for i in range(int(os.environ["EIDOLON_EVENT_BENCHMARK_SIZE"])):
+            events.append(StringOutputEvent(content=f"token {i} "))
+            if i % 100 == 0:
+                events.append(ObjectOutputEvent(content=dict(step=i)))
+        assert _events_per_second(serialize_events, events) > _events_per_second(_legacy_serialize_events, events)
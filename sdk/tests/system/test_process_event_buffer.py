@@ -0,0 +1,162 @@
+import asyncio
+import json
+
+from eidolon_ai_client.events import StringOutputEvent, SuccessEvent, UserInputEvent
+from eidolon_ai_sdk.agent_os import AgentOS
+from eidolon_ai_sdk.security.user import User
+from eidolon_ai_sdk.system.agent_controller import AgentController
+from eidolon_ai_sdk.system.process_event_buffer import ProcessEventBuffer, ProcessEventBuffers
+from eidolon_ai_sdk.system.processes import store_events
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestProcessEventBuffer:
+    async def test_follow_replays_then_waits_for_new_events(self):
+        buffer = ProcessEventBuffer("p", next_id=10, capacity=10)
+        buffer.running = True
+        await buffer.publish(StringOutputEvent(content="a"))
+        await buffer.publish(StringOutputEvent(content="b"))
+        follower = asyncio.create_task(_collect(buffer.follow(10)))
+        await asyncio.sleep(0)
+        await buffer.publish(SuccessEvent())
+        buffer.finish()
+        assert [(i, e.event_type) for i, e in await follower] == [(11, "string"), (12, "success")]
+
+    async def test_evicts_oldest_events(self):
+        buffer = ProcessEventBuffer("p", next_id=0, capacity=2)
+        for content in "abc":
+            await buffer.publish(StringOutputEvent(content=content))
+        assert buffer.oldest_id == 1
+        assert [e.content for _, e in await _collect(buffer.follow(-1))] == ["b", "c"]
+
+    async def test_broadcasts_to_every_subscriber(self):
+        buffer = ProcessEventBuffer("p", next_id=0, capacity=10)
+        buffer.running = True
+        followers = [asyncio.create_task(_collect(buffer.follow(-1))) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert buffer.subscriber_count == 3
+        for content in "abc":
+            await buffer.publish(StringOutputEvent(content=content))
+        buffer.finish()
+        for follower in followers:
+            assert [e.content for _, e in await follower] == ["a", "b", "c"]
+
+    async def test_dropped_subscriber_catches_up_from_the_buffer(self):
+        buffer = ProcessEventBuffer("p", next_id=0, capacity=10, max_subscriber_queue=1)
+        buffer.running = True
+        stalled = buffer.follow(-1)
+        await buffer.publish(StringOutputEvent(content="a"))
+        assert (await stalled.__anext__())[0] == 0  # subscribes, then stops reading for a while
+        await buffer.publish(StringOutputEvent(content="b"))
+        await buffer.publish(StringOutputEvent(content="c"))
+        assert buffer.subscriber_count == 0
+        assert [e.content for _, e in [await stalled.__anext__() for _ in range(2)]] == ["b", "c"]
+        assert buffer.subscriber_count == 1
+        await buffer.publish(StringOutputEvent(content="d"))
+        buffer.finish()
+        assert [e.content for _, e in await _collect(stalled)] == ["d"]
+
+    async def test_dropped_subscriber_stops_at_evicted_events(self):
+        buffer = ProcessEventBuffer("p", next_id=0, capacity=2, max_subscriber_queue=1)
+        buffer.running = True
+        stalled = buffer.follow(-1)
+        await buffer.publish(StringOutputEvent(content="a"))
+        assert (await stalled.__anext__())[0] == 0
+        for content in "bcde":
+            await buffer.publish(StringOutputEvent(content=content))
+        assert [e.content for _, e in await _collect(stalled)] == ["b"]
+        assert buffer.subscriber_count == 0
+
+    async def test_keeps_recently_finished_buffers(self, machine):
+        buffers = ProcessEventBuffers("agent", max_finished=1)
+        first = await buffers.open("p1")
+        await first.publish(SuccessEvent())
+        buffers.close("p1")
+        await buffers.open("p2")
+        buffers.close("p2")
+        assert buffers.get("p1") is None
+        assert (await buffers.open("p2")).running
+
+    async def test_continues_ids_from_stored_events(self, machine):
+        await store_events("agent", "p_stored", [UserInputEvent(input="hi"), SuccessEvent()], [7, 8])
+        buffer = await ProcessEventBuffers("agent").open("p_stored")
+        assert await buffer.publish(UserInputEvent(input="again")) == 9
+
+
+class TestStreamProcessEvents:
+    async def test_slow_client_catches_up_from_stored_events(self, machine):
+        User.set_current(User(id="test"))
+        controller = AgentController("agent", object(), sse_coalesce_delay=0)
+        controller.security = AgentOS.security_manager
+        controller.event_buffers.capacity = 2
+        await AgentOS.security_manager.record_process("agent", "p_slow")
+        buffer = await controller.event_buffers.open("p_slow")
+        buffer.max_subscriber_queue = 1
+
+        async def publish(count):
+            for _ in range(count):
+                event = UserInputEvent(input=str(buffer.next_id))
+                await store_events("agent", "p_slow", [event], [await buffer.publish(event)])
+
+        await publish(1)
+        response = await controller.stream_process_events("p_slow")
+        received = [(await response.body_iterator.__anext__()).id]
+        await publish(5)  # the client is dropped while the buffer evicts the events it missed
+        received.append((await response.body_iterator.__anext__()).id)
+        await publish(1)
+        controller.event_buffers.close("p_slow")
+        received.extend([e.id async for e in response.body_iterator])
+        assert received == [str(i) for i in range(7)]
+
+    async def test_replays_a_merged_last_event(self, machine):
+        User.set_current(User(id="test"))
+        controller = AgentController("agent", object())
+        controller.security = AgentOS.security_manager
+        await AgentOS.security_manager.record_process("agent", "p_replay_last")
+        # the string event was streamed as three parts, ids 1 to 3
+        await store_events("agent", "p_replay_last", [StringOutputEvent(content="abc")], [1], [3])
+
+        response = await controller.stream_process_events("p_replay_last", last_event_id=0)
+        assert [e.id async for e in response.body_iterator] == ["3"]
+        response = await controller.stream_process_events("p_replay_last", last_event_id=3)
+        assert [e.id async for e in response.body_iterator] == []
+
+    async def test_replays_stored_events_after_last_event_id(self, machine):
+        User.set_current(User(id="test"))
+        controller = AgentController("agent", object())
+        controller.security = AgentOS.security_manager
+        await AgentOS.security_manager.record_process("agent", "p_replay")
+        events = [UserInputEvent(input="hi"), StringOutputEvent(content="ab"), SuccessEvent()]
+        # the string event was streamed as two parts, ids 1 and 2
+        await store_events("agent", "p_replay", events, [0, 1, 3])
+
+        response = await controller.stream_process_events("p_replay", last_event_id=0)
+        replayed = [(e.id, json.loads(e.data)) async for e in response.body_iterator]
+        assert [(i, e["event_type"]) for i, e in replayed] == [("2", "string"), ("3", "success")]
+
+
+class TestRunInBackground:
+    async def test_tracks_each_action_of_a_process(self):
+        controller = AgentController("agent", object())
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            yield SuccessEvent()
+
+        async def quick():
+            yield SuccessEvent()
+
+        controller.run_in_background("p", slow())
+        controller.run_in_background("p", quick())
+        assert len(controller.background_actions) == 2
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert len(controller.background_actions) == 1
+        release.set()
+        await asyncio.gather(*controller.background_actions)
+        await asyncio.sleep(0)
+        assert controller.background_actions == set()
@@ -6,11 +6,12 @@ from pytest_asyncio import fixture
 from starlette.requests import Request
 
 from eidolon_ai_client.client import Agent, Machine, Process
-from eidolon_ai_client.util.aiohttp import AgentError
+from eidolon_ai_client.util.aiohttp import AgentError, get_content
 from eidolon_ai_sdk.agent.agent import register_program
 from eidolon_ai_sdk.agent_os import AgentOS
 from eidolon_ai_sdk.security.functional_authorizer import FunctionalAuthorizer
 from eidolon_ai_sdk.security.permissions import PermissionException
+from eidolon_ai_sdk.security.process_authorizer import AuthDoc, ProcessAuthorizer
 from eidolon_ai_sdk.agent_os_interfaces import Permission
 from eidolon_ai_sdk.security.authentication_processor import AuthenticationProcessor
 from eidolon_ai_sdk.security.user import User
@@ -218,3 +219,36 @@ async def test_list_processes_filters_by_resource_perms(authentication, agent: A
     process_response_2 = await agent.processes()
     assert process_response_2.total == 0
     assert not process_response_2.processes
+
+
+async def test_list_child_processes_checks_each_process_with_the_default_authorizer(
+    authentication, agent: Agent, monkeypatch
+):
+    authorizer = AgentOS.security_manager.process_authorizer
+    monkeypatch.setattr(authorizer, "authorized_processes", ProcessAuthorizer.authorized_processes.__get__(authorizer))
+    parent = await agent.create_process()
+    child = await agent.create_process()
+    await AgentOS.symbolic_memory.insert_one(
+        "agent_logic_unit", dict(parent_process_id=parent.process_id, remote_process_id=child.process_id)
+    )
+    url = agent.machine + "/processes"
+    found = await get_content(url, params=dict(parent_process_id=parent.process_id))
+    assert [p["process_id"] for p in found["processes"]] == [child.process_id]
+
+    authentication.user.id = "somebody_else"
+    found = await get_content(url, params=dict(parent_process_id=parent.process_id))
+    assert found["processes"] == []
+
+
+async def test_list_processes_requires_permissions_on_the_process_agent(authentication, agent: Agent):
+    process = await agent.create_process()
+    authentication.user.id = "somebody_else"
+    await AuthDoc.create(
+        resource_type="OtherAgent/process",
+        resource_id=process.process_id,
+        subject_type="user",
+        subject_id="somebody_else",
+        permissions=["read"],
+    )
+    response = await Machine().processes()
+    assert response.total == 0
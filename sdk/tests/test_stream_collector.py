@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from eidolon_ai_client.events import (
@@ -7,7 +9,12 @@ from eidolon_ai_client.events import (
     EndStreamContextEvent,
     SuccessEvent,
 )
-from eidolon_ai_sdk.util.stream_collector import StreamCollector, ManagedContextError, stream_manager
+from eidolon_ai_sdk.util.stream_collector import (
+    StreamCollector,
+    ManagedContextError,
+    stream_manager,
+    coalesce_string_events,
+)
 
 
 async def raising_stream(error=None):
@@ -49,3 +56,67 @@ async def test_stream_manager_records_errors_and_reraises():
     ]
     assert e.value.args[0] == "Error in stream context foo"
     assert collector.get_content() == ["test", "RuntimeError: test error"]
+
+
+async def _identified(*events):
+    for event_id, event in enumerate(events):
+        yield event_id, event
+
+
+async def test_coalesces_string_deltas_per_context():
+    stream = _identified(
+        StringOutputEvent(content="a"),
+        StringOutputEvent(content="b"),
+        StringOutputEvent(content="c", stream_context="foo"),
+        StringOutputEvent(content="d", stream_context="foo"),
+        StringOutputEvent(content="e"),
+        SuccessEvent(),
+    )
+    assert [item async for item in coalesce_string_events(stream, max_delay=60, max_bytes=100)] == [
+        (1, StringOutputEvent(content="ab")),
+        (3, StringOutputEvent(content="cd", stream_context="foo")),
+        (4, StringOutputEvent(content="e")),
+        (5, SuccessEvent()),
+    ]
+
+
+async def test_coalescing_limits():
+    deltas = [StringOutputEvent(content="ab") for _ in range(5)]
+    by_size = [e.content async for _, e in coalesce_string_events(_identified(*deltas), max_delay=60, max_bytes=4)]
+    assert by_size == ["abab", "abab", "ab"]
+    disabled = [e.content async for _, e in coalesce_string_events(_identified(*deltas), max_delay=0, max_bytes=4)]
+    assert disabled == ["ab"] * 5
+    assert [d.content for d in deltas] == ["ab"] * 5
+
+
+async def test_coalescing_counts_bytes():
+    deltas = [StringOutputEvent(content="éé") for _ in range(3)]
+    merged = [e.content async for _, e in coalesce_string_events(_identified(*deltas), max_delay=60, max_bytes=4)]
+    assert merged == ["éé"] * 3
+
+
+async def test_coalesced_event_is_emitted_after_max_delay_while_stream_is_idle():
+    resume = asyncio.Event()
+
+    async def stream():
+        yield 0, StringOutputEvent(content="a")
+        yield 1, StringOutputEvent(content="b")
+        await resume.wait()
+        yield 2, StringOutputEvent(content="c")
+
+    coalesced = coalesce_string_events(stream(), max_delay=0.01, max_bytes=100)
+    assert await asyncio.wait_for(coalesced.__anext__(), 5) == (1, StringOutputEvent(content="ab"))
+    resume.set()
+    assert [item async for item in coalesced] == [(2, StringOutputEvent(content="c"))]
+
+
+async def test_coalescing_reraises_stream_errors_after_emitting_merged_parts():
+    async def stream():
+        yield 0, StringOutputEvent(content="a")
+        raise RuntimeError("test error")
+
+    received = []
+    with pytest.raises(RuntimeError):
+        async for _, event in coalesce_string_events(stream(), max_delay=60, max_bytes=100):
+            received.append(event.content)
+    assert received == ["a"]
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from eidolon_ai_sdk.util.single_flight import SingleFlight, request_key
+
+
+class TestSingleFlight:
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight("test_share")
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        results = await asyncio.gather(*[flight.do("k", fn) for _ in range(5)])
+        assert results == [1] * 5
+        assert flight.stats() == dict(calls=1, hits=4, in_flight=0)
+        assert await flight.do("k", fn) == 2  # finished calls are not reused
+
+    async def test_failures_are_shared_and_not_kept(self):
+        flight = SingleFlight("test_failure")
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.do("k", fn), flight.do("k", fn), return_exceptions=True)
+        assert [type(r) for r in results] == [ValueError, ValueError]
+        with pytest.raises(ValueError):
+            await flight.do("k", fn)
+        assert flight.calls == 2
+
+    async def test_cancelled_caller_does_not_cancel_followers(self):
+        flight = SingleFlight("test_cancel")
+
+        async def fn():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("k", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "done"
+
+    def test_request_key_is_canonical(self):
+        assert request_key(dict(a=1, b=[1, 2])) == request_key(dict(b=[1, 2], a=1))
+        assert request_key("m", "text") != request_key("m", "other")